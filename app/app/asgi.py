@@ -13,4 +13,11 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'app.settings')
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+# Imported once Django is set up
+from django.urls import reverse  # noqa: E402
+
+from core.handlers import route_streams  # noqa: E402
+
+application = route_streams(django_application, {reverse("recipe:async-events")})
@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.0/ref/settings/
 """
 
+from importlib.util import find_spec
 from pathlib import Path
 import os
 
@@ -49,7 +50,9 @@ INSTALLED_APPS = [
 
 
 MIDDLEWARE = [
+    "core.middleware.ServerTimingMiddleware",
     "django.middleware.security.SecurityMiddleware",
+    "core.middleware.ReplicaRoutingMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
@@ -92,6 +95,52 @@ DATABASES = {
     }
 }
 
+# Optional read replica. When DB_REPLICA_HOST is set, reads made while
+# handling GET, HEAD and OPTIONS requests go to it (see core.routers).
+# After a client writes, its reads stay on the primary for
+# REPLICA_STICKY_SECONDS so it reads its own writes; REPLICA_PIN_CACHE_ALIAS
+# names the CACHES entry remembering that, which must be shared by workers
+# (Redis or CACHE_DIR below): routing refuses to start with a memory cache.
+# REPLICA_ROUTING=0 keeps every read on the primary even with a replica
+# configured. Tests get a replica database of their own so they can tell
+# which database answered; CI runs them with routing off, and the routing
+# tests turn it on.
+
+if os.environ.get("DB_REPLICA_HOST"):
+    DATABASES["replica"] = {
+        "ENGINE": "django.db.backends.postgresql",
+        "HOST": os.environ.get("DB_REPLICA_HOST"),
+        "NAME": os.environ.get("DB_REPLICA_NAME", os.environ.get("DB_NAME")),
+        "USER": os.environ.get("DB_REPLICA_USER", os.environ.get("DB_USER")),
+        "PASSWORD": os.environ.get("DB_REPLICA_PASS", os.environ.get("DB_PASS")),
+        "TEST": {"NAME": os.environ.get("DB_REPLICA_TEST_NAME", "test_replica")},
+    }
+
+DATABASE_ROUTERS = ["core.routers.ReplicaRouter"]
+REPLICA_ROUTING = os.environ.get("REPLICA_ROUTING", "1") == "1"
+REPLICA_STICKY_SECONDS = int(os.environ.get("REPLICA_STICKY_SECONDS", 5))
+REPLICA_PIN_CACHE_ALIAS = os.environ.get("REPLICA_PIN_CACHE_ALIAS", "default")
+
+
+# Cache
+# CACHE_REDIS_URL selects Redis, shared by all workers; CACHE_DIR a file
+# cache for local use. Otherwise each process has its own memory cache.
+
+if os.environ.get("CACHE_REDIS_URL"):
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": os.environ["CACHE_REDIS_URL"],
+        }
+    }
+elif os.environ.get("CACHE_DIR"):
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+            "LOCATION": os.environ["CACHE_DIR"],
+        }
+    }
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.0/ref/settings/#auth-password-validators
@@ -134,6 +183,138 @@ STATIC_URL = "static/"
 
 DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 AUTH_USER_MODEL = "core.User"
+
+# Code version, such as the git commit, set by the deployment
+APP_VERSION = os.environ.get("APP_VERSION", "")
+
+# OpenAPI schema
+# SCHEMA_CACHE serves /api/schema/ generated once per process, or read from
+# SCHEMA_FILE when `manage.py build_schema` wrote it for this APP_VERSION.
+
+SCHEMA_CACHE = os.environ.get("SCHEMA_CACHE", "1") == "1"
+SCHEMA_FILE = os.environ.get("SCHEMA_FILE", str(BASE_DIR / "openapi.json"))
+
+# Client IPs, used by the per-IP throttles, are taken from X-Forwarded-For
+# only when NUM_PROXIES trusted proxies in front of the app append to it;
+# with the default of 0 the header is ignored so clients can't spoof it.
+
 REST_FRAMEWORK = {
     "DEFAULT_SCHEMA_CLASS": "drf_spectacular.openapi.AutoSchema",
+    "NUM_PROXIES": int(os.environ.get("NUM_PROXIES", 0)),
+    "DEFAULT_RENDERER_CLASSES": [
+        "core.renderers.ORJSONRenderer",
+        "rest_framework.renderers.BrowsableAPIRenderer",
+    ],
+    "DEFAULT_PARSER_CLASSES": [
+        "core.parsers.ORJSONParser",
+        "rest_framework.parsers.FormParser",
+        "rest_framework.parsers.MultiPartParser",
+    ],
 }
+# MessagePack responses for Accept: application/msgpack, when msgpack is
+# installed
+if find_spec("msgpack"):
+    REST_FRAMEWORK["DEFAULT_RENDERER_CLASSES"].append(
+        "core.renderers.MessagePackRenderer"
+    )
+
+# Pagination
+# PAGE_SIZE is the default page length, MAX_PAGE_SIZE caps ?page_size=
+
+PAGE_SIZE = int(os.environ.get("PAGE_SIZE", 100))
+MAX_PAGE_SIZE = int(os.environ.get("MAX_PAGE_SIZE", 1000))
+
+# Recipe reads
+# RECIPE_FAST_READS builds recipe list, detail and export responses from
+# .values() rows instead of RecipeSerializer; set it to 0 to turn it off.
+
+RECIPE_FAST_READS = os.environ.get("RECIPE_FAST_READS", "1") == "1"
+
+# Recipe bulk writes
+# RECIPE_BULK_MAX caps the operations in one /api/recipe/recipes/bulk/
+# request, which all run in one transaction.
+
+RECIPE_BULK_MAX = int(os.environ.get("RECIPE_BULK_MAX", 1000))
+
+# Token authentication cache
+# TOKEN_CACHE_ALIAS names a CACHES entry to share cached token user ids
+# between workers, so deleting a token revokes it everywhere at once. When
+# unset an in-process LRU cache is used: a deleted token or deactivated
+# user keeps working on the other workers for up to TOKEN_CACHE_TTL
+# seconds, so it defaults to 10 seconds instead of 5 minutes.
+
+TOKEN_CACHE_ALIAS = os.environ.get("TOKEN_CACHE_ALIAS") or None
+TOKEN_CACHE_MAX_SIZE = int(os.environ.get("TOKEN_CACHE_MAX_SIZE", 10000))
+TOKEN_CACHE_TTL = int(
+    os.environ.get("TOKEN_CACHE_TTL", 300 if TOKEN_CACHE_ALIAS else 10)
+)
+
+# Throttling
+# Login, signup and writes are throttled with token buckets of
+# THROTTLE_RATES ("count/period", refilled evenly over the period): login
+# per client IP and per email, signup per IP, writes per user. Buckets are
+# kept in-process, up to THROTTLE_MAX_SIZE of them; set THROTTLE_CACHE_ALIAS
+# to a shared CACHES entry to throttle across workers.
+
+THROTTLE = os.environ.get("THROTTLE", "1") == "1"
+THROTTLE_CACHE_ALIAS = os.environ.get("THROTTLE_CACHE_ALIAS") or None
+THROTTLE_MAX_SIZE = int(os.environ.get("THROTTLE_MAX_SIZE", 100000))
+THROTTLE_RATES = {
+    "login": os.environ.get("THROTTLE_LOGIN_RATE", "20/min"),
+    "login-account": os.environ.get("THROTTLE_LOGIN_ACCOUNT_RATE", "10/min"),
+    "signup": os.environ.get("THROTTLE_SIGNUP_RATE", "10/min"),
+    "write": os.environ.get("THROTTLE_WRITE_RATE", "300/min"),
+}
+
+# Read cache
+# READ_CACHE serves recipe details and tag lists from a per-user
+# read-through cache in the READ_CACHE_ALIAS entry of CACHES, which must be
+# shared by workers: writes invalidate the user's entries by bumping a
+# version the other workers have to see. It is on by default only with
+# CACHE_REDIS_URL. READ_CACHE_TTL bounds how long entries are kept.
+
+READ_CACHE = (
+    os.environ.get("READ_CACHE", "1" if os.environ.get("CACHE_REDIS_URL") else "0")
+    == "1"
+)
+READ_CACHE_ALIAS = os.environ.get("READ_CACHE_ALIAS", "default")
+READ_CACHE_TTL = int(os.environ.get("READ_CACHE_TTL", 300))
+
+# Request timing
+# SERVER_TIMING adds a Server-Timing header with total, SQL, serialize and
+# render durations to SERVER_TIMING_SAMPLE_RATE of the requests (0 to 1)
+# and logs them to the core.timing logger; requests taking at least
+# SERVER_TIMING_SLOW_MS also log their SQL statements as a warning. Read
+# cache hits and misses are reported as the description of the cache metric.
+# Off by default, since the header shows every client how the server works.
+
+SERVER_TIMING = os.environ.get("SERVER_TIMING", "0") == "1"
+SERVER_TIMING_SAMPLE_RATE = float(os.environ.get("SERVER_TIMING_SAMPLE_RATE", 1))
+SERVER_TIMING_SLOW_MS = float(os.environ.get("SERVER_TIMING_SLOW_MS", 500))
+
+# Delta sync
+# Sync tokens re-read changes from the last SYNC_OVERLAP_SECONDS to catch
+# writes that committed late. Tombstones of deleted recipes and tags are
+# kept for SYNC_TOMBSTONE_DAYS; run compact_tombstones daily to drop older
+# ones. Clients with older tokens get 410 Gone and must sync in full.
+# A sync returns at most SYNC_PAGE_SIZE recipes and tags at once; clients
+# sync again with the token while has_more is set.
+
+SYNC_OVERLAP_SECONDS = int(os.environ.get("SYNC_OVERLAP_SECONDS", 60))
+SYNC_TOMBSTONE_DAYS = int(os.environ.get("SYNC_TOMBSTONE_DAYS", 30))
+SYNC_PAGE_SIZE = int(os.environ.get("SYNC_PAGE_SIZE", 500))
+
+# Change events
+# /api/recipe/async/events/ streams recipe and tag changes under ASGI.
+# EVENTS_BROKER is "local" to reach the subscribers of this process only,
+# or "postgres" to fan out to all workers with LISTEN/NOTIFY. Each stream
+# buffers up to EVENTS_QUEUE_SIZE events before it's dropped for lagging,
+# and sends a heartbeat after EVENTS_HEARTBEAT_SECONDS without events.
+# Changes to many objects at once, such as the recipes of a renamed tag,
+# are sent as one event with up to EVENTS_MAX_IDS ids, or past that as a
+# "refetch" event.
+
+EVENTS_BROKER = os.environ.get("EVENTS_BROKER", "local")
+EVENTS_QUEUE_SIZE = int(os.environ.get("EVENTS_QUEUE_SIZE", 100))
+EVENTS_HEARTBEAT_SECONDS = float(os.environ.get("EVENTS_HEARTBEAT_SECONDS", 15))
+EVENTS_MAX_IDS = int(os.environ.get("EVENTS_MAX_IDS", 500))
@@ -1,12 +1,14 @@
 from django.contrib import admin
 from django.urls import path, include
 
-from drf_spectacular.views import SpectacularAPIView, SpectacularSwaggerView
+from drf_spectacular.views import SpectacularSwaggerView
+
+from core.schema import CachedSchemaView
 
 
 urlpatterns = [
     path('admin/', admin.site.urls),
-    path('api/schema/', SpectacularAPIView.as_view(
+    path('api/schema/', CachedSchemaView.as_view(
         api_version='v1'
     ),name='api-schema'),
     path('api/docs/', SpectacularSwaggerView.as_view(
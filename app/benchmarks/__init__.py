@@ -0,0 +1,84 @@
+"""
+Benchmarks for the recipe api.
+
+Run a benchmark from the app directory, for example:
+
+    python -m benchmarks.bench_token_auth
+
+Each benchmark creates and destroys its own test database, so it can be
+pointed at the development database server without touching its data.
+"""
+import os
+import random
+import time
+from contextlib import contextmanager
+from decimal import Decimal
+
+WORDS = (
+    "apple basil beef bread butter carrot cheese chicken chili chocolate "
+    "coconut cream curry egg garlic ginger honey lamb lemon lentil mango "
+    "mint mushroom noodle onion pasta peanut pepper pork potato rice salmon "
+    "sesame shrimp soup spinach steak tofu tomato vanilla yogurt"
+).split()
+BATCH_SIZE = 10000
+
+
+def setup():
+    """Configure Django for a standalone benchmark script"""
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "app.settings")
+    import django
+
+    django.setup()
+
+
+@contextmanager
+def test_database():
+    """Run the enclosed block against a throwaway test database"""
+    from django.db import connection
+    from django.test.utils import setup_test_environment, teardown_test_environment
+
+    setup_test_environment()
+    old_name = connection.settings_dict["NAME"]
+    connection.creation.create_test_db(verbosity=0)
+    try:
+        yield
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+        teardown_test_environment()
+
+
+@contextmanager
+def timer(label, count=None, unit="ops"):
+    """Print how long the enclosed block took, and its rate if count is set"""
+    start = time.perf_counter()
+    yield
+    elapsed = time.perf_counter() - start
+    line = f"{label}: {elapsed * 1000:,.1f} ms"
+    if count:
+        line += f" ({count / elapsed:,.0f} {unit}/s)"
+    print(line)
+
+
+def seed_recipes(user, count, tags_per_recipe=0, seed=0):
+    """Bulk create recipes with random words, linked to a few of WORDS as tags"""
+    from core.models import Recipe, Tag
+
+    rng = random.Random(seed)
+    tags = list(Tag.objects.get_or_create_many(user, WORDS).values())
+    RecipeTag = Recipe.tags.through
+    for start in range(0, count, BATCH_SIZE):
+        recipes = Recipe.objects.bulk_create(
+            Recipe(
+                user=user,
+                title=" ".join(rng.choices(WORDS, k=3)),
+                description=" ".join(rng.choices(WORDS, k=30)),
+                time_minutes=rng.randint(5, 180),
+                price=Decimal(rng.randint(100, 9999)) / 100,
+            )
+            for _ in range(min(BATCH_SIZE, count - start))
+        )
+        RecipeTag.objects.bulk_create(
+            RecipeTag(recipe=recipe, tag=tag)
+            for recipe in recipes
+            for tag in rng.sample(tags, tags_per_recipe)
+        )
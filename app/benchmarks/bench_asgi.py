@@ -0,0 +1,95 @@
+"""
+Compare latency and throughput of the async recipe views under ASGI with
+the sync views under WSGI at high concurrency.
+
+    python -m benchmarks.bench_asgi [requests] [concurrency]
+
+Sends the requests (2,000 by default) from that many concurrent clients
+(100 by default) through Django's ASGI and WSGI handlers in-process, so
+the numbers compare the request paths rather than a particular server.
+"""
+import asyncio
+import statistics
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks import seed_recipes, setup, test_database
+
+
+def report(label, latencies, elapsed):
+    p50, p99 = (statistics.quantiles(latencies, n=100)[i] for i in (49, 98))
+    print(
+        f"  {label}: p50 {p50 * 1000:,.1f} ms, p99 {p99 * 1000:,.1f} ms, "
+        f"{len(latencies) / elapsed:,.0f} requests/s"
+    )
+
+
+def run_wsgi(url, headers, count, concurrency):
+    from django.test import Client
+
+    def request(_):
+        start = time.perf_counter()
+        res = Client(headers=headers).get(url)
+        assert res.status_code == 200, res.status_code
+        return time.perf_counter() - start
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(concurrency) as pool:
+        latencies = list(pool.map(request, range(count)))
+    return latencies, time.perf_counter() - start
+
+
+async def run_asgi(url, headers, count, concurrency):
+    from django.test import AsyncClient
+
+    latencies = []
+    queue = asyncio.Queue()
+    for i in range(count):
+        queue.put_nowait(i)
+
+    async def worker():
+        client = AsyncClient()
+        while not queue.empty():
+            queue.get_nowait()
+            start = time.perf_counter()
+            res = await client.get(url, headers=headers)
+            assert res.status_code == 200, res.status_code
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return latencies, time.perf_counter() - start
+
+
+def run(count, concurrency):
+    from django.contrib.auth import get_user_model
+    from django.urls import reverse
+    from rest_framework.authtoken.models import Token
+
+    user = get_user_model().objects.create_user(
+        email="bench@example.com", password="password123"
+    )
+    seed_recipes(user, 1000, tags_per_recipe=3)
+    headers = {"Authorization": f"Token {Token.objects.create(user=user).key}"}
+
+    for sync_name, async_name in [
+        ("recipe:recipe-list", "recipe:async-recipe-list"),
+        ("recipe:tag-list", "recipe:async-tag-list"),
+    ]:
+        print(f"{count:,} requests from {concurrency} clients, {sync_name}")
+        latencies, elapsed = run_wsgi(reverse(sync_name), headers, count, concurrency)
+        report("wsgi", latencies, elapsed)
+        latencies, elapsed = asyncio.run(
+            run_asgi(reverse(async_name), headers, count, concurrency)
+        )
+        report("asgi", latencies, elapsed)
+
+
+if __name__ == "__main__":
+    setup()
+    with test_database():
+        run(
+            int(sys.argv[1]) if len(sys.argv) > 1 else 2_000,
+            int(sys.argv[2]) if len(sys.argv) > 2 else 100,
+        )
@@ -0,0 +1,44 @@
+"""
+Measure peak memory of the streaming NDJSON recipe export.
+
+    python -m benchmarks.bench_export [recipes]
+
+Exports a tenth of the recipes and then all of them (500,000 by default);
+peak memory should stay flat while the row count grows tenfold.
+"""
+import sys
+import tracemalloc
+
+from benchmarks import seed_recipes, setup, test_database, timer
+
+
+def export(client, url, count):
+    tracemalloc.start()
+    with timer(f"export {count:,} recipes", count, "recipes"):
+        res = client.get(url)
+        size = sum(len(chunk) for chunk in res.streaming_content)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    print(f"  {size / 2**20:,.1f} MiB streamed, peak memory {peak / 2**20:,.1f} MiB")
+
+
+def run(count):
+    from django.contrib.auth import get_user_model
+    from django.urls import reverse
+    from rest_framework.test import APIClient
+
+    client = APIClient()
+    url = reverse("recipe:recipe-export")
+    for size in (count // 10, count):
+        user = get_user_model().objects.create_user(
+            email=f"bench{size}@example.com", password="password123"
+        )
+        seed_recipes(user, size, tags_per_recipe=3)
+        client.force_authenticate(user)
+        export(client, url, size)
+
+
+if __name__ == "__main__":
+    setup()
+    with test_database():
+        run(int(sys.argv[1]) if len(sys.argv) > 1 else 500_000)
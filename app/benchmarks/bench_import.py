@@ -0,0 +1,63 @@
+"""
+Compare the import_recipes command with creating recipes one at a time
+through RecipeSerializer.
+
+    python -m benchmarks.bench_import [records]
+
+The serializer path is timed on a sample of up to 2,000 records.
+"""
+import io
+import json
+import os
+import random
+import sys
+import tempfile
+from types import SimpleNamespace
+
+from benchmarks import WORDS, setup, test_database, timer
+
+SERIALIZER_SAMPLE = 2000
+
+
+def records(count, rng):
+    for _ in range(count):
+        yield {
+            "title": " ".join(rng.choices(WORDS, k=3)),
+            "description": " ".join(rng.choices(WORDS, k=30)),
+            "time_minutes": rng.randint(5, 180),
+            "price": f"{rng.randint(100, 9999) / 100:.2f}",
+            "tags": [{"name": name} for name in rng.sample(WORDS, 3)],
+        }
+
+
+def run(count):
+    from django.contrib.auth import get_user_model
+    from django.core.management import call_command
+    from recipe.serializers import RecipeSerializer
+
+    User = get_user_model()
+    sample = min(count, SERIALIZER_SAMPLE)
+    user = User.objects.create_user(email="serializer@example.com")
+    context = {"request": SimpleNamespace(user=user)}
+    with timer(f"serializer, {sample:,} records", sample, "records"):
+        for record in records(sample, random.Random(0)):
+            serializer = RecipeSerializer(data=record, context=context)
+            serializer.is_valid(raise_exception=True)
+            serializer.save(user=user)
+
+    user = User.objects.create_user(email="import@example.com")
+    with tempfile.TemporaryDirectory() as tmpdir:
+        path = os.path.join(tmpdir, "recipes.ndjson")
+        with open(path, "w") as file:
+            for record in records(count, random.Random(0)):
+                file.write(json.dumps(record) + "\n")
+        with timer(f"import_recipes, {count:,} records", count, "records"):
+            call_command(
+                "import_recipes", path, user=user.email, stdout=io.StringIO()
+            )
+
+
+if __name__ == "__main__":
+    setup()
+    with test_database():
+        run(int(sys.argv[1]) if len(sys.argv) > 1 else 200_000)
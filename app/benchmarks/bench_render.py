@@ -0,0 +1,46 @@
+"""
+Compare render time and payload size of the response renderers.
+
+    python -m benchmarks.bench_render [recipes]
+
+Renders a list of recipes with three tags each (10,000 by default) with
+DRF's JSONRenderer, the orjson renderer and, if msgpack is installed, the
+MessagePack renderer.
+"""
+import sys
+
+from benchmarks import seed_recipes, setup, test_database, timer
+
+
+def run(count):
+    from core.models import Recipe
+    from core.renderers import MessagePackRenderer, ORJSONRenderer, msgpack
+    from django.contrib.auth import get_user_model
+    from recipe.serializers import recipe_values, serialize_recipe_rows
+    from rest_framework.renderers import JSONRenderer
+
+    user = get_user_model().objects.create_user(
+        email="bench@example.com", password="password123"
+    )
+    seed_recipes(user, count, tags_per_recipe=3)
+    data = {
+        "next": None,
+        "previous": None,
+        "results": serialize_recipe_rows(
+            recipe_values(Recipe.objects.filter(user=user).order_by("-id"))
+        ),
+    }
+
+    renderers = [JSONRenderer(), ORJSONRenderer()]
+    if msgpack:
+        renderers.append(MessagePackRenderer())
+    for renderer in renderers:
+        with timer(f"{type(renderer).__name__} {count:,} recipes", count, "recipes"):
+            content = renderer.render(data, renderer.media_type)
+        print(f"  {len(content) / 2**20:,.2f} MiB")
+
+
+if __name__ == "__main__":
+    setup()
+    with test_database():
+        run(int(sys.argv[1]) if len(sys.argv) > 1 else 10_000)
@@ -0,0 +1,54 @@
+"""
+Compare full-text recipe search with a naive icontains scan.
+
+    python -m benchmarks.bench_search [recipes]
+
+Seeds the given number of recipes (1,000,000 by default) and times a few
+searches both ways. Full-text search needs a Postgres database.
+"""
+import sys
+
+from benchmarks import seed_recipes, setup, test_database, timer
+
+QUERIES = ["pasta", "coconut curry", "chocolate -vanilla", "saffron"]
+REPEAT = 5
+
+
+def run(count):
+    from core.models import Recipe
+    from django.contrib.auth import get_user_model
+    from django.db import connection
+    from django.db.models import Q
+
+    user = get_user_model().objects.create_user(
+        email="bench@example.com", password="password123"
+    )
+    with timer(f"seed {count:,} recipes", count, "recipes"):
+        seed_recipes(user, count)
+    full_text = connection.vendor == "postgresql"
+    if full_text:
+        with connection.cursor() as cursor:
+            cursor.execute("ANALYZE core_recipe")
+    else:
+        print("not running on Postgres, only timing icontains")
+
+    recipes = Recipe.objects.filter(user=user).defer("search_vector")
+    for text in QUERIES:
+        print(f"q={text!r}")
+        if full_text:
+            with timer("  full-text, first page", REPEAT, "queries"):
+                for _ in range(REPEAT):
+                    list(recipes.search(text).order_by("-rank", "-id")[:100])
+        with timer("  icontains, first page", REPEAT, "queries"):
+            for _ in range(REPEAT):
+                list(
+                    recipes.filter(
+                        Q(title__icontains=text) | Q(description__icontains=text)
+                    ).order_by("-id")[:100]
+                )
+
+
+if __name__ == "__main__":
+    setup()
+    with test_database():
+        run(int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000)
@@ -0,0 +1,51 @@
+"""
+Compare recipe serialization through RecipeSerializer and the .values()
+read path used when RECIPE_FAST_READS is on.
+
+    python -m benchmarks.bench_serialize [recipes ...]
+
+Reads and serializes 1,000, 10,000 and 100,000 recipes with three tags each
+by default, including the queries each path makes.
+"""
+import sys
+
+from benchmarks import seed_recipes, setup, test_database, timer
+
+
+def run(counts):
+    from core.models import Recipe, Tag
+    from django.contrib.auth import get_user_model
+    from django.db.models import Prefetch
+    from recipe.serializers import (
+        RecipeSerializer,
+        recipe_values,
+        serialize_recipe_rows,
+    )
+
+    for count in counts:
+        user = get_user_model().objects.create_user(
+            email=f"bench{count}@example.com", password="password123"
+        )
+        seed_recipes(user, count, tags_per_recipe=3)
+        recipes = (
+            Recipe.objects.filter(user=user)
+            .defer("search_vector")
+            .prefetch_related(
+                Prefetch(
+                    "tags", queryset=Tag.objects.only("id", "name").order_by("id")
+                )
+            )
+            .order_by("-id")
+        )
+
+        with timer(f"serializer {count:,} recipes", count, "recipes"):
+            slow = RecipeSerializer(recipes, many=True).data
+        with timer(f"values    {count:,} recipes", count, "recipes"):
+            fast = serialize_recipe_rows(recipe_values(recipes))
+        assert [dict(item) for item in slow] == fast
+
+
+if __name__ == "__main__":
+    setup()
+    with test_database():
+        run([int(arg) for arg in sys.argv[1:]] or [1_000, 10_000, 100_000])
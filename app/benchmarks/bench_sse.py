@@ -0,0 +1,126 @@
+"""
+Hold idle Server-Sent Events connections on one worker.
+
+    python -m benchmarks.bench_sse [connections] [users]
+
+Opens that many event streams (10,000 by default) for that many users
+(1,000 by default) through app.asgi in-process, publishes one event to
+every user and waits until each stream got it, then disconnects them
+all. Prints the setup time, the threads and memory held by the idle
+streams and the fan-out latency.
+"""
+import asyncio
+import resource
+import sys
+import threading
+import time
+
+from benchmarks import setup, test_database
+
+
+class Connection:
+    """An ASGI HTTP connection that stays open until told to disconnect"""
+
+    def __init__(self, path, token, disconnected):
+        self.scope = {
+            "type": "http",
+            "asgi": {"version": "3.0"},
+            "http_version": "1.1",
+            "method": "GET",
+            "scheme": "http",
+            "path": path,
+            "raw_path": path.encode(),
+            "query_string": b"",
+            "root_path": "",
+            "headers": [
+                (b"host", b"testserver"),
+                (b"authorization", f"Token {token}".encode()),
+            ],
+            "client": ("127.0.0.1", 0),
+            "server": ("testserver", 80),
+        }
+        self.disconnected = disconnected
+        self.requested = False
+        self.opened = asyncio.Event()
+        self.chunks = asyncio.Queue()
+
+    async def receive(self):
+        if not self.requested:
+            self.requested = True
+            return {"type": "http.request", "body": b"", "more_body": False}
+        await self.disconnected.wait()
+        return {"type": "http.disconnect"}
+
+    async def send(self, message):
+        if message["type"] == "http.response.start":
+            assert message["status"] == 200, message["status"]
+        elif message.get("body"):
+            if not self.opened.is_set():
+                self.opened.set()
+            else:
+                self.chunks.put_nowait(message["body"])
+
+
+def max_rss_mib():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+async def run(count, user_count):
+    from app.asgi import application
+    from asgiref.sync import sync_to_async
+    from core.events import get_broker
+    from django.contrib.auth import get_user_model
+    from django.urls import reverse
+    from rest_framework.authtoken.models import Token
+
+    def create_users():
+        users = []
+        for number in range(user_count):
+            user = get_user_model().objects.create_user(
+                email=f"user{number}@example.com"
+            )
+            users.append((user.id, Token.objects.create(user=user).key))
+        return users
+
+    users = await sync_to_async(create_users)()
+    path = reverse("recipe:async-events")
+    disconnected = asyncio.Event()
+    connections = [
+        Connection(path, users[number % user_count][1], disconnected)
+        for number in range(count)
+    ]
+    threads, rss = threading.active_count(), max_rss_mib()
+
+    start = time.perf_counter()
+    tasks = [
+        asyncio.create_task(application(conn.scope, conn.receive, conn.send))
+        for conn in connections
+    ]
+    await asyncio.gather(*(conn.opened.wait() for conn in connections))
+    print(f"Opened {count:,} streams in {time.perf_counter() - start:,.2f} s")
+    print(f"  threads: {threads} -> {threading.active_count()}")
+    print(f"  max RSS: {rss:,.0f} MiB -> {max_rss_mib():,.0f} MiB")
+    print(f"  subscribers: {get_broker().subscriber_count():,}")
+
+    start = time.perf_counter()
+    for user_id, _ in users:
+        get_broker().publish(user_id, {"type": "recipe", "op": "updated", "id": 1})
+    await asyncio.gather(*(conn.chunks.get() for conn in connections))
+    print(f"Fanned out one event per user in {time.perf_counter() - start:,.3f} s")
+
+    start = time.perf_counter()
+    disconnected.set()
+    await asyncio.gather(*tasks)
+    print(f"Closed all streams in {time.perf_counter() - start:,.2f} s")
+    print(f"  subscribers left: {get_broker().subscriber_count():,}")
+
+
+if __name__ == "__main__":
+    setup()
+    with test_database():
+        asyncio.run(
+            run(
+                int(sys.argv[1]) if len(sys.argv) > 1 else 10_000,
+                int(sys.argv[2]) if len(sys.argv) > 2 else 1_000,
+            )
+        )
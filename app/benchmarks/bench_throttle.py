@@ -0,0 +1,69 @@
+"""
+Measure the overhead of the token bucket throttle per request.
+
+    python -m benchmarks.bench_throttle [requests] [clients]
+
+Times WriteRateThrottle.allow_request() for that many requests (100,000
+by default) spread over that many users (10,000 by default), with the
+in-process store and with a local memory cache store, then the same
+number of authenticated recipe reads and writes through the API with
+throttling off and on.
+"""
+import sys
+
+from benchmarks import setup, test_database, timer
+
+
+def run(requests, clients):
+    from core.throttling import WriteRateThrottle, get_throttle_store
+    from django.contrib.auth import get_user_model
+    from django.test import override_settings
+    from django.urls import reverse
+    from rest_framework.request import Request
+    from rest_framework.test import APIClient, APIRequestFactory
+
+    factory = APIRequestFactory()
+    rates = {"write": f"{requests}/min"}
+    local_cache = {
+        "default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}
+    }
+    throttled_requests = []
+    for number in range(clients):
+        request = Request(factory.post("/"))
+        request.user = get_user_model()(pk=number)
+        throttled_requests.append(request)
+    batch = [throttled_requests[n % clients] for n in range(requests)]
+
+    for label, extra in (
+        ("in-process buckets", {}),
+        ("cache buckets", {"CACHES": local_cache, "THROTTLE_CACHE_ALIAS": "default"}),
+    ):
+        with override_settings(THROTTLE=True, THROTTLE_RATES=rates, **extra):
+            get_throttle_store().clear()
+            throttle = WriteRateThrottle()
+            with timer(f"allow_request, {label}", requests, "calls"):
+                for request in batch:
+                    throttle.allow_request(request, None)
+
+    user = get_user_model().objects.create_user(email="bench@example.com")
+    client = APIClient()
+    client.force_authenticate(user)
+    url = reverse("recipe:recipe-list")
+    payload = {"title": "Soup", "time_minutes": 10, "price": "5.00"}
+    count = min(requests, 2000)
+    for enabled in (False, True):
+        with override_settings(
+            THROTTLE=enabled, THROTTLE_RATES={"write": f"{count * 2}/min"}
+        ):
+            with timer(f"POST recipes, THROTTLE={enabled}", count, "requests"):
+                for _ in range(count):
+                    client.post(url, payload, format="json")
+
+
+if __name__ == "__main__":
+    setup()
+    with test_database():
+        run(
+            int(sys.argv[1]) if len(sys.argv) > 1 else 100_000,
+            int(sys.argv[2]) if len(sys.argv) > 2 else 10_000,
+        )
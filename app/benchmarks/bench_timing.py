@@ -0,0 +1,61 @@
+"""
+Measure the overhead of the Server-Timing middleware.
+
+    python -m benchmarks.bench_timing [requests]
+
+Fetches a 100 recipe list page (500 requests by default) with the
+middleware timing every request and with it turned off, alternating
+rounds to even out noise, and prints the overhead of timing.
+"""
+import sys
+import time
+
+from benchmarks import seed_recipes, setup, test_database
+
+ROUNDS = 5
+
+
+def client_for(user, enabled):
+    from django.test import override_settings
+    from django.urls import reverse
+    from rest_framework.test import APIClient
+
+    client = APIClient()
+    client.force_authenticate(user)
+    # The middleware chain is built on the first request
+    with override_settings(SERVER_TIMING=enabled, SERVER_TIMING_SAMPLE_RATE=1):
+        client.get(reverse("recipe:recipe-list"))
+    return client
+
+
+def run(count):
+    import logging
+
+    from django.contrib.auth import get_user_model
+    from django.urls import reverse
+
+    logging.getLogger("core.timing").setLevel(logging.WARNING)
+    user = get_user_model().objects.create_user(
+        email="bench@example.com", password="password123"
+    )
+    seed_recipes(user, 1000, tags_per_recipe=3)
+    url = reverse("recipe:recipe-list")
+    clients = {enabled: client_for(user, enabled) for enabled in (False, True)}
+    totals = dict.fromkeys(clients, 0.0)
+    for _ in range(ROUNDS):
+        for enabled, client in clients.items():
+            start = time.perf_counter()
+            for _ in range(count // ROUNDS):
+                client.get(url)
+            totals[enabled] += time.perf_counter() - start
+
+    for enabled, total in totals.items():
+        label = "timed" if enabled else "untimed"
+        print(f"{label}: {total / count * 1000:.3f} ms/request")
+    print(f"overhead: {(totals[True] / totals[False] - 1) * 100:+.2f}%")
+
+
+if __name__ == "__main__":
+    setup()
+    with test_database():
+        run(int(sys.argv[1]) if len(sys.argv) > 1 else 500)
@@ -0,0 +1,44 @@
+"""
+Compare DRF's TokenAuthentication with CachedTokenAuthentication.
+
+    python -m benchmarks.bench_token_auth [requests]
+"""
+import sys
+
+from benchmarks import setup, test_database, timer
+
+
+def run(requests):
+    from core.authentication import CachedTokenAuthentication, get_token_cache
+    from django.contrib.auth import get_user_model
+    from django.db import connection
+    from django.test.utils import CaptureQueriesContext
+    from django.urls import reverse
+    from rest_framework.authentication import TokenAuthentication
+    from rest_framework.authtoken.models import Token
+    from rest_framework.test import APIClient
+    from user.views import ManageUserView
+
+    user = get_user_model().objects.create_user(
+        email="bench@example.com", password="password123"
+    )
+    token = Token.objects.create(user=user)
+    client = APIClient()
+    client.credentials(HTTP_AUTHORIZATION=f"Token {token.key}")
+    url = reverse("user:me")
+
+    for authentication_class in (TokenAuthentication, CachedTokenAuthentication):
+        ManageUserView.authentication_classes = [authentication_class]
+        get_token_cache().clear()
+        client.get(url)
+        with CaptureQueriesContext(connection) as queries:
+            with timer(authentication_class.__name__, requests, "requests"):
+                for _ in range(requests):
+                    client.get(url)
+        print(f"  queries per request: {len(queries) / requests:.2f}")
+
+
+if __name__ == "__main__":
+    setup()
+    with test_database():
+        run(int(sys.argv[1]) if len(sys.argv) > 1 else 2000)
@@ -0,0 +1,184 @@
+"""
+Token authentication with a cache in front of the token lookup
+"""
+import copy
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from rest_framework import exceptions
+from rest_framework.authentication import TokenAuthentication, get_authorization_header
+from rest_framework.authtoken.models import Token
+
+
+def _copy_token(token):
+    token = copy.copy(token)
+    token.user = copy.copy(token.user)
+    return token
+
+
+class LRUTokenCache:
+    """
+    Bounded in-process LRU cache of token key -> token with a TTL.
+
+    Deleting a token or deactivating a user only drops the entries of the
+    worker that handled it; the other workers accept the token until their
+    entry expires, so the TTL is the revocation window and is kept short.
+    """
+
+    def __init__(self, max_size, ttl):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    async def aget(self, key):
+        return self.get(key)
+
+    async def aset(self, key, token):
+        self.set(key, token)
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, token = entry
+            if expires_at <= time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+        # Hand out copies so a view mutating request.user can't leak the
+        # change to other requests sharing the cached instance
+        return _copy_token(token)
+
+    def set(self, key, token):
+        token = _copy_token(token)
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, token)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+class DjangoTokenCache:
+    """
+    Token cache stored in one of the CACHES backends, shared by workers, so
+    a revoked token is dropped for all of them at once. Only the user id of
+    each token key is cached, never the user with its password hash; a hit
+    loads the active user by primary key with one query.
+    """
+
+    key_prefix = "auth-token:"
+
+    def __init__(self, alias, ttl):
+        self.cache = caches[alias]
+        self.ttl = ttl
+
+    def _active_users(self, user_id):
+        return get_user_model().objects.filter(pk=user_id, is_active=True)
+
+    def get(self, key):
+        user_id = self.cache.get(self.key_prefix + key)
+        if user_id is None:
+            return None
+        user = self._active_users(user_id).first()
+        return None if user is None else Token(key=key, user=user)
+
+    async def aget(self, key):
+        user_id = await self.cache.aget(self.key_prefix + key)
+        if user_id is None:
+            return None
+        user = await self._active_users(user_id).afirst()
+        return None if user is None else Token(key=key, user=user)
+
+    async def aset(self, key, token):
+        await self.cache.aset(self.key_prefix + key, token.user_id, self.ttl)
+
+    def set(self, key, token):
+        self.cache.set(self.key_prefix + key, token.user_id, self.ttl)
+
+    def delete(self, key):
+        self.cache.delete(self.key_prefix + key)
+
+    def clear(self):
+        self.cache.clear()
+
+
+_token_cache = None
+
+
+def get_token_cache():
+    """Return the token cache configured by the TOKEN_CACHE_* settings"""
+    global _token_cache
+    if _token_cache is None:
+        if settings.TOKEN_CACHE_ALIAS:
+            _token_cache = DjangoTokenCache(
+                settings.TOKEN_CACHE_ALIAS, settings.TOKEN_CACHE_TTL
+            )
+        else:
+            _token_cache = LRUTokenCache(
+                settings.TOKEN_CACHE_MAX_SIZE, settings.TOKEN_CACHE_TTL
+            )
+    return _token_cache
+
+
+@receiver(setting_changed)
+def reset_token_cache(setting, **kwargs):
+    global _token_cache
+    if setting.startswith("TOKEN_CACHE_"):
+        _token_cache = None
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """
+    Drop-in TokenAuthentication that caches the token and its user,
+    so warm requests authenticate without touching the database.
+    """
+
+    def authenticate_credentials(self, key):
+        token_cache = get_token_cache()
+        token = token_cache.get(key)
+        if token is not None:
+            return (token.user, token)
+
+        user, token = super().authenticate_credentials(key)
+        token_cache.set(key, token)
+        return (user, token)
+
+    async def aauthenticate(self, request):
+        """authenticate() for async Django views, taking an HttpRequest"""
+        auth = get_authorization_header(request).split()
+        if not auth or auth[0].lower() != self.keyword.lower().encode():
+            return None
+        if len(auth) != 2:
+            raise exceptions.AuthenticationFailed("Invalid token header.")
+        try:
+            key = auth[1].decode()
+        except UnicodeError:
+            raise exceptions.AuthenticationFailed("Invalid token header.")
+
+        token_cache = get_token_cache()
+        token = await token_cache.aget(key)
+        if token is None:
+            try:
+                token = await Token.objects.select_related("user").aget(key=key)
+            except Token.DoesNotExist:
+                raise exceptions.AuthenticationFailed("Invalid token.")
+            if not token.user.is_active:
+                raise exceptions.AuthenticationFailed("User inactive or deleted.")
+            await token_cache.aset(key, token)
+        return (token.user, token)
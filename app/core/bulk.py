@@ -0,0 +1,26 @@
+"""
+Helpers for loading rows in bulk
+"""
+import csv
+import io
+
+
+def copy_rows(cursor, table, columns, rows):
+    """Load rows into a table with Postgres COPY ... FROM STDIN"""
+    buffer = io.StringIO()
+    # Quote every value so empty strings aren't read back as NULL
+    csv.writer(buffer, quoting=csv.QUOTE_ALL).writerows(rows)
+    buffer.seek(0)
+    cursor.copy_expert(
+        f"COPY {table} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv)", buffer
+    )
+
+
+def allocate_ids(cursor, table, count):
+    """Reserve count ids from a Postgres table's id sequence, return them"""
+    cursor.execute(
+        f"SELECT nextval(pg_get_serial_sequence('{table}', 'id')) "
+        "FROM generate_series(1, %s)",
+        [count],
+    )
+    return [row[0] for row in cursor.fetchall()]
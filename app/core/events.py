@@ -0,0 +1,196 @@
+"""
+Publish/subscribe of per-user recipe and tag change events
+"""
+import asyncio
+import json
+import logging
+import threading
+from collections import defaultdict
+
+import psycopg2
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.db import connection, transaction
+from django.dispatch import receiver
+
+logger = logging.getLogger(__name__)
+
+# Handed to a subscriber that fell too far behind, in place of its events
+OVERFLOW = object()
+
+
+class Subscription:
+    """
+    Bounded queue of one user's events for a consumer in an event loop.
+    A consumer that lets the queue fill up loses its queued events and
+    gets OVERFLOW instead, so it can resync rather than slow everyone down.
+    """
+
+    def __init__(self, broker, user_id, max_size):
+        self.broker = broker
+        self.user_id = user_id
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue(max_size)
+        self.overflowed = False
+
+    async def get(self):
+        return await self.queue.get()
+
+    def put(self, event):
+        """Queue an event, called in the subscriber's event loop"""
+        if self.overflowed:
+            return
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            self.overflow()
+
+    def overflow(self):
+        self.overflowed = True
+        while not self.queue.empty():
+            self.queue.get_nowait()
+        self.queue.put_nowait(OVERFLOW)
+
+    def close(self):
+        self.broker.unsubscribe(self)
+
+
+class LocalBroker:
+    """Fan events out to the subscribers in this process"""
+
+    def __init__(self):
+        self._subscriptions = defaultdict(set)
+        self._lock = threading.Lock()
+
+    def subscribe(self, user_id):
+        """Return a Subscription to a user's events, from an event loop"""
+        subscription = Subscription(self, user_id, settings.EVENTS_QUEUE_SIZE)
+        with self._lock:
+            self._subscriptions[user_id].add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            subscriptions = self._subscriptions.get(subscription.user_id)
+            if subscriptions is not None:
+                subscriptions.discard(subscription)
+                if not subscriptions:
+                    del self._subscriptions[subscription.user_id]
+
+    def publish(self, user_id, event):
+        """Send an event to a user's subscribers, from any thread"""
+        self.deliver(user_id, event)
+
+    def deliver(self, user_id, event):
+        with self._lock:
+            subscriptions = list(self._subscriptions.get(user_id, ()))
+        for subscription in subscriptions:
+            subscription.loop.call_soon_threadsafe(subscription.put, event)
+
+    def overflow_all(self):
+        """Make every subscriber resync, after events may have been lost"""
+        with self._lock:
+            subscriptions = [
+                subscription
+                for group in self._subscriptions.values()
+                for subscription in group
+            ]
+        for subscription in subscriptions:
+            subscription.loop.call_soon_threadsafe(subscription.overflow)
+
+    def subscriber_count(self):
+        with self._lock:
+            return sum(len(group) for group in self._subscriptions.values())
+
+
+class PostgresBroker(LocalBroker):
+    """
+    Send events through Postgres NOTIFY so the subscribers of every worker
+    get them. Each process LISTENs on its own connection, watched by the
+    event loop of its first subscriber, and hands notifications to its
+    local subscribers.
+    """
+
+    channel = "recipe_events"
+
+    def __init__(self):
+        super().__init__()
+        self._listener = None
+
+    def subscribe(self, user_id):
+        if self._listener is None:
+            self._listen(asyncio.get_running_loop())
+        return super().subscribe(user_id)
+
+    def publish(self, user_id, event):
+        payload = json.dumps({"user": user_id, "event": event})
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT pg_notify(%s, %s)", [self.channel, payload])
+
+    def _listen(self, loop):
+        listener = psycopg2.connect(**connection.get_connection_params())
+        listener.autocommit = True
+        with listener.cursor() as cursor:
+            cursor.execute(f"LISTEN {self.channel}")
+        loop.add_reader(listener.fileno(), self._read, loop)
+        self._listener = listener
+
+    def _read(self, loop):
+        listener = self._listener
+        try:
+            listener.poll()
+        except psycopg2.Error:
+            logger.exception("Lost the %s listener connection", self.channel)
+            loop.remove_reader(listener.fileno())
+            listener.close()
+            self._listener = None
+            # Notifications sent until the next subscriber listens again
+            # are lost, so everyone has to resync
+            self.overflow_all()
+            return
+        while listener.notifies:
+            message = json.loads(listener.notifies.pop(0).payload)
+            self.deliver(message["user"], message["event"])
+
+
+BROKERS = {"local": LocalBroker, "postgres": PostgresBroker}
+
+_broker = None
+
+
+def get_broker():
+    """Return the broker configured by the EVENTS_BROKER setting"""
+    global _broker
+    if _broker is None:
+        _broker = BROKERS[settings.EVENTS_BROKER]()
+    return _broker
+
+
+@receiver(setting_changed)
+def reset_broker(setting, **kwargs):
+    global _broker
+    if setting == "EVENTS_BROKER":
+        _broker = None
+
+
+def publish_change(user_id, kind, op, object_id):
+    """Publish that a user's recipe or tag was created, updated or deleted"""
+    event = {"type": kind, "op": op, "id": object_id}
+    # Subscribers shouldn't hear about changes that get rolled back
+    transaction.on_commit(lambda: get_broker().publish(user_id, event))
+
+
+def publish_changes(user_id, kind, op, object_ids):
+    """
+    Publish that several of a user's recipes or tags changed as one event
+    with their ids. Past EVENTS_MAX_IDS ids the event only tells clients
+    to refetch, which keeps it within a NOTIFY payload (8000 bytes).
+    """
+    object_ids = list(object_ids)
+    if not object_ids:
+        return
+    if len(object_ids) > settings.EVENTS_MAX_IDS:
+        event = {"type": kind, "op": "refetch"}
+    else:
+        event = {"type": kind, "op": op, "ids": object_ids}
+    transaction.on_commit(lambda: get_broker().publish(user_id, event))
@@ -0,0 +1,44 @@
+"""
+ASGI handler for long-lived event streams
+"""
+from django.core.handlers.asgi import ASGIHandler
+from django.core.handlers.exception import convert_exception_to_response
+
+
+class StreamASGIHandler(ASGIHandler):
+    """
+    Serve long-lived streams such as Server-Sent Events without an idle
+    thread per open connection.
+
+    Django's handler gives each request a sync thread of its own for the
+    sync middleware and signal receivers, and keeps it until the response
+    ends. This handler skips the middleware and runs the little sync work a
+    stream needs on the process-wide sync thread.
+    """
+
+    def load_middleware(self, is_async=False):
+        self._view_middleware = []
+        self._template_response_middleware = []
+        self._exception_middleware = []
+        self._middleware_chain = convert_exception_to_response(
+            self._get_response_async
+        )
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            raise ValueError(
+                f"Django can only handle ASGI/HTTP connections, not {scope['type']}."
+            )
+        await self.handle(scope, receive, send)
+
+
+def route_streams(application, paths):
+    """Serve the stream paths with StreamASGIHandler, the rest with application"""
+    streams = StreamASGIHandler()
+
+    async def router(scope, receive, send):
+        if scope["type"] == "http" and scope["path"] in paths:
+            return await streams(scope, receive, send)
+        return await application(scope, receive, send)
+
+    return router
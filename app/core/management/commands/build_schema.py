@@ -0,0 +1,38 @@
+"""
+Django command to prebuild the OpenAPI schema served at /api/schema/
+"""
+import json
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.urls import resolve, reverse
+
+
+class Command(BaseCommand):
+    """Django command to write the OpenAPI schema to SCHEMA_FILE"""
+
+    help = (
+        "Generate the OpenAPI schema into SCHEMA_FILE, tagged with APP_VERSION. "
+        "Workers running the same APP_VERSION serve it instead of generating "
+        "the schema themselves. Run it as a build step after setting APP_VERSION."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--url-name", default="api-schema")
+
+    def handle(self, *args, **options):
+        if not settings.APP_VERSION:
+            raise CommandError("Set APP_VERSION to the code version first")
+        view = resolve(reverse(options["url_name"])).func
+        schema_view = view.view_class(**view.view_initkwargs)
+        data = {
+            "app_version": settings.APP_VERSION,
+            "api_version": schema_view.api_version,
+            "schema": schema_view.build_schema(),
+        }
+        path = Path(settings.SCHEMA_FILE)
+        path.write_text(json.dumps(data))
+        self.stdout.write(
+            self.style.SUCCESS(f"Wrote the {settings.APP_VERSION} schema to {path}")
+        )
@@ -0,0 +1,33 @@
+"""
+Django command to delete old tombstones of deleted recipes and tags
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from core.models import Tombstone
+
+
+class Command(BaseCommand):
+    """Django command to compact the delta sync tombstones"""
+
+    help = (
+        "Delete tombstones older than SYNC_TOMBSTONE_DAYS, after which sync "
+        "tokens expire anyway. Meant to be run daily, e.g. from cron."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--days",
+            type=int,
+            help="Keep this many days of tombstones instead of SYNC_TOMBSTONE_DAYS",
+        )
+
+    def handle(self, *args, **options):
+        days = options["days"]
+        if days is None:
+            days = settings.SYNC_TOMBSTONE_DAYS
+        count = Tombstone.objects.compact(timezone.now() - timedelta(days=days))
+        self.stdout.write(self.style.SUCCESS(f"Deleted {count:,} tombstones"))
@@ -0,0 +1,266 @@
+"""
+Django command to import recipes in bulk from a CSV or NDJSON file
+"""
+import csv
+import json
+import os
+import time
+from collections import Counter, defaultdict
+from decimal import Decimal, InvalidOperation
+from itertools import islice
+
+from django.contrib.auth import get_user_model
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from core.bulk import allocate_ids, copy_rows
+from core.models import ImportCheckpoint, Recipe, Tag
+from core.read_cache import invalidate_user
+
+TAG_SEPARATOR = "|"
+RECIPE_FIELDS = ["title", "description", "time_minutes", "price", "link"]
+
+STAGING_SQL = """
+CREATE TEMPORARY TABLE IF NOT EXISTS import_recipe (
+    id bigint,
+    user_id bigint,
+    title text,
+    description text,
+    time_minutes integer,
+    price numeric(5, 2),
+    link text
+);
+CREATE TEMPORARY TABLE IF NOT EXISTS import_recipe_tag (
+    recipe_id bigint,
+    user_id bigint,
+    name text
+);
+"""
+
+INSERT_RECIPES_SQL = """
+INSERT INTO core_recipe
+    (id, user_id, title, description, time_minutes, price, link, updated_at)
+SELECT id, user_id, title, description, time_minutes, price, link, now()
+FROM import_recipe
+"""
+
+INSERT_TAGS_SQL = """
+INSERT INTO core_tag (user_id, name, recipe_count, updated_at)
+SELECT DISTINCT s.user_id, s.name, 0, now()
+FROM import_recipe_tag s
+ON CONFLICT DO NOTHING
+"""
+
+INSERT_RECIPE_TAGS_SQL = """
+INSERT INTO core_recipe_tags (recipe_id, tag_id)
+SELECT DISTINCT s.recipe_id, t.id
+FROM import_recipe_tag s
+JOIN core_tag t ON t.user_id = s.user_id AND lower(t.name) = lower(s.name)
+"""
+
+COUNT_TAG_RECIPES_SQL = """
+UPDATE core_tag t
+SET recipe_count = t.recipe_count + c.count, updated_at = now()
+FROM (
+    SELECT rt.tag_id, COUNT(*) AS count
+    FROM core_recipe_tags rt
+    JOIN import_recipe r ON r.id = rt.recipe_id
+    GROUP BY rt.tag_id
+) c
+WHERE t.id = c.tag_id
+"""
+
+
+def read_csv(file):
+    for row in csv.DictReader(file):
+        tags = row.get("tags") or ""
+        row["tags"] = [name for name in tags.split(TAG_SEPARATOR) if name]
+        yield row
+
+
+def read_ndjson(file):
+    for line in file:
+        if line.strip():
+            yield json.loads(line)
+
+
+READERS = {"csv": read_csv, "ndjson": read_ndjson}
+
+
+class Command(BaseCommand):
+    """Django command to import recipes in bulk"""
+
+    help = (
+        "Import recipes from a CSV or NDJSON file. Records have title, "
+        "description, time_minutes, price, link and tags fields and an "
+        "optional user email; CSV tags are separated by '|'. Batches are "
+        "committed one at a time and a rerun resumes after the last one."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("path")
+        parser.add_argument("--format", choices=sorted(READERS))
+        parser.add_argument(
+            "--user", help="Email of the owner of records without a user field"
+        )
+        parser.add_argument("--batch-size", type=int, default=5000)
+        parser.add_argument(
+            "--restart",
+            action="store_true",
+            help="Start from the first record instead of resuming",
+        )
+
+    def handle(self, *args, **options):
+        path = options["path"]
+        file_format = options["format"] or (
+            "csv" if path.lower().endswith(".csv") else "ndjson"
+        )
+        self.default_email = options["user"]
+        use_copy = connection.vendor == "postgresql"
+        if use_copy:
+            with connection.cursor() as cursor:
+                cursor.execute(STAGING_SQL)
+
+        checkpoint, _ = ImportCheckpoint.objects.get_or_create(
+            source=os.path.abspath(path)
+        )
+        start = 0 if options["restart"] else checkpoint.position
+        if start:
+            self.stdout.write(f"Resuming after record {start:,}")
+
+        position = start
+        began = time.monotonic()
+        with open(path, newline="") as file:
+            records = islice(READERS[file_format](file), start, None)
+            while batch := list(islice(records, options["batch_size"])):
+                batch = [
+                    self._clean(record, number)
+                    for number, record in enumerate(batch, start=position + 1)
+                ]
+                with transaction.atomic():
+                    self._resolve_users(batch)
+                    if use_copy:
+                        self._copy_batch(batch)
+                    else:
+                        self._create_batch(batch)
+                    position += len(batch)
+                    ImportCheckpoint.objects.filter(pk=checkpoint.pk).update(
+                        position=position
+                    )
+                    # COPY and bulk_create send no signals to do this
+                    for user_id in {record["user_id"] for record in batch}:
+                        invalidate_user(user_id)
+                rate = (position - start) / (time.monotonic() - began)
+                self.stdout.write(
+                    f"Imported {position:,} records ({rate:,.0f} records/s)"
+                )
+
+        self.stdout.write(
+            self.style.SUCCESS(f"Imported {position - start:,} recipes from {path}")
+        )
+
+    def _clean(self, record, number):
+        """Return the record with its values converted, or fail on its number"""
+        try:
+            cleaned = {
+                "email": record.get("user") or self.default_email,
+                "title": record["title"],
+                "description": record.get("description") or "",
+                "time_minutes": int(record["time_minutes"]),
+                "price": Decimal(str(record["price"])).quantize(Decimal("0.01")),
+                "link": record.get("link") or "",
+                "tags": list(
+                    dict.fromkeys(
+                        tag["name"] if isinstance(tag, dict) else tag
+                        for tag in record.get("tags") or []
+                    )
+                ),
+            }
+            # Check the model limits here, COPY would fail the whole batch
+            for name in RECIPE_FIELDS:
+                field = Recipe._meta.get_field(name)
+                cleaned[name] = field.clean(cleaned[name], None)
+            return cleaned
+        except (KeyError, TypeError, ValueError, InvalidOperation) as exc:
+            raise CommandError(f"Invalid record {number}: {exc!r}")
+        except ValidationError as exc:
+            raise CommandError(f"Invalid record {number}: {' '.join(exc.messages)}")
+
+    def _resolve_users(self, batch):
+        emails = {record["email"] for record in batch}
+        if None in emails:
+            raise CommandError("Records without a user field need --user")
+        user_ids = dict(
+            get_user_model()
+            .objects.filter(email__in=emails)
+            .values_list("email", "id")
+        )
+        missing = emails - user_ids.keys()
+        if missing:
+            raise CommandError(f"Unknown users: {', '.join(sorted(missing))}")
+        for record in batch:
+            record["user_id"] = user_ids[record["email"]]
+
+    def _copy_batch(self, batch):
+        """COPY the batch into staging tables and insert it set-wise"""
+        with connection.cursor() as cursor:
+            cursor.execute("TRUNCATE import_recipe, import_recipe_tag")
+            ids = allocate_ids(cursor, "core_recipe", len(batch))
+            for record, recipe_id in zip(batch, ids):
+                record["id"] = recipe_id
+            copy_rows(
+                cursor,
+                "import_recipe",
+                ["id", "user_id"] + RECIPE_FIELDS,
+                (
+                    [record["id"], record["user_id"]]
+                    + [record[field] for field in RECIPE_FIELDS]
+                    for record in batch
+                ),
+            )
+            copy_rows(
+                cursor,
+                "import_recipe_tag",
+                ["recipe_id", "user_id", "name"],
+                (
+                    (record["id"], record["user_id"], name)
+                    for record in batch
+                    for name in record["tags"]
+                ),
+            )
+            cursor.execute(INSERT_RECIPES_SQL)
+            cursor.execute(INSERT_TAGS_SQL)
+            cursor.execute(INSERT_RECIPE_TAGS_SQL)
+            cursor.execute(COUNT_TAG_RECIPES_SQL)
+
+    def _create_batch(self, batch):
+        """Insert the batch with bulk_create where COPY isn't available"""
+        recipes = Recipe.objects.bulk_create(
+            Recipe(
+                user_id=record["user_id"],
+                **{field: record[field] for field in RECIPE_FIELDS},
+            )
+            for record in batch
+        )
+        names = defaultdict(list)
+        for record in batch:
+            names[record["user_id"]].extend(record["tags"])
+        User = get_user_model()
+        tags = {
+            (user_id, name): tag
+            for user_id, user_names in names.items()
+            for name, tag in Tag.objects.get_or_create_many(
+                User(pk=user_id), user_names
+            ).items()
+        }
+        RecipeTag = Recipe.tags.through
+        links = RecipeTag.objects.bulk_create(
+            RecipeTag(recipe=recipe, tag_id=tag_id)
+            for recipe, record in zip(recipes, batch)
+            # Names differing only in case share a tag
+            for tag_id in dict.fromkeys(
+                tags[(record["user_id"], name)].id for name in record["tags"]
+            )
+        )
+        Tag.objects.adjust_recipe_counts(Counter(link.tag_id for link in links))
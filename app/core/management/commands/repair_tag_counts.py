@@ -0,0 +1,19 @@
+"""
+Django command to recount the recipes of every tag
+"""
+from django.core.management.base import BaseCommand
+
+from core.models import Tag
+
+
+class Command(BaseCommand):
+    """Django command to repair Tag.recipe_count"""
+
+    help = (
+        "Recount the recipes of each tag and fix the tags whose stored "
+        "recipe_count has drifted, for example after raw SQL writes."
+    )
+
+    def handle(self, *args, **options):
+        stale = Tag.objects.repair_recipe_counts()
+        self.stdout.write(self.style.SUCCESS(f"Repaired {len(stale):,} tag counts"))
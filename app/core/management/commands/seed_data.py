@@ -0,0 +1,247 @@
+"""
+Django command to generate a synthetic dataset for load and scale testing
+"""
+import math
+import os
+import random
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from decimal import Decimal
+from itertools import accumulate, product
+from multiprocessing import get_context
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections, transaction
+from django.utils import timezone
+
+from core.bulk import allocate_ids, copy_rows
+from core.models import Recipe, Tag
+
+WORDS = (
+    "apple basil beef bread butter carrot cheese chicken chili chocolate "
+    "coconut cream curry egg garlic ginger honey lamb lemon lentil mango "
+    "mint mushroom noodle onion pasta peanut pepper pork potato rice salmon "
+    "sesame shrimp soup spinach steak tofu tomato vanilla yogurt"
+).split()
+STYLES = (
+    "baked braised creamy crispy easy fried grilled healthy quick roasted "
+    "smoky spicy sweet vegan vegetarian"
+).split()
+# Tag names in decreasing popularity: styles, then ingredients, then pairs
+TAG_NAMES = STYLES + WORDS + [f"{a} {b}" for a, b in product(STYLES, WORDS)]
+# How many tags a recipe has, and how often
+TAGS_PER_RECIPE = [0, 1, 2, 3, 4, 5]
+TAGS_PER_RECIPE_WEIGHTS = [10, 25, 30, 20, 10, 5]
+ZIPF_EXPONENT = 1.1
+RECIPE_FIELDS = ["title", "description", "time_minutes", "price", "link"]
+
+
+def zipf_weights(count):
+    """Cumulative Zipf weights for ranks 1 to count"""
+    return list(accumulate(1 / rank**ZIPF_EXPONENT for rank in range(1, count + 1)))
+
+
+def lognormal(rng, mean, sigma):
+    """A lognormal sample with the given mean"""
+    return rng.lognormvariate(math.log(mean) - sigma**2 / 2, sigma)
+
+
+TAG_NAME_WEIGHTS = zipf_weights(len(TAG_NAMES))
+
+
+def generate_user(seed, index, options):
+    """
+    Return the user, tag names and recipes of user number index. Each user
+    has its own random stream, so the data doesn't depend on how users are
+    split between workers.
+    """
+    rng = random.Random(f"{seed}-{index}")
+    # Few users have many recipes, most have a handful
+    recipe_count = round(lognormal(rng, options["recipes"], 1.0))
+    vocabulary = {}
+    while len(vocabulary) < options["tags"]:
+        [name] = rng.choices(TAG_NAMES, cum_weights=TAG_NAME_WEIGHTS)
+        vocabulary.setdefault(name, None)
+    vocabulary = list(vocabulary)
+    user_weights = zipf_weights(len(vocabulary))
+
+    recipes = []
+    for _ in range(recipe_count):
+        [tag_count] = rng.choices(TAGS_PER_RECIPE, TAGS_PER_RECIPE_WEIGHTS)
+        tags = dict.fromkeys(
+            rng.choices(vocabulary, cum_weights=user_weights, k=tag_count)
+        )
+        price = min(lognormal(rng, 12, 0.6), 999.99)
+        recipes.append(
+            {
+                "title": " ".join(rng.choices(WORDS, k=rng.randint(2, 5))),
+                "description": " ".join(rng.choices(WORDS, k=rng.randint(0, 60))),
+                "time_minutes": max(5, min(round(lognormal(rng, 40, 0.6)), 480)),
+                "price": Decimal(f"{price:.2f}"),
+                "link": (
+                    f"https://example.com/recipes/{index}-{len(recipes)}"
+                    if rng.random() < 0.3
+                    else ""
+                ),
+                "tags": list(tags),
+            }
+        )
+    user = {
+        "email": f"seed{seed}-user{index}@example.com",
+        "name": f"Seed User {index}",
+    }
+    return user, vocabulary, recipes
+
+
+def seed_users(seed, start, stop, options):
+    """Generate and insert users start to stop - 1, return the recipe count"""
+    users = [generate_user(seed, index, options) for index in range(start, stop)]
+    now = timezone.now()
+    with transaction.atomic():
+        created = get_user_model().objects.bulk_create(
+            get_user_model()(password=options["password"], **user)
+            for user, _, _ in users
+        )
+        tags = []
+        for user, (_, vocabulary, recipes) in zip(created, users):
+            counts = Counter(name for recipe in recipes for name in recipe["tags"])
+            tags.extend(
+                Tag(user=user, name=name, recipe_count=counts[name])
+                for name in vocabulary
+            )
+        tag_ids = {
+            (tag.user_id, tag.name): tag.id for tag in Tag.objects.bulk_create(tags)
+        }
+        recipes = [
+            (user.id, recipe)
+            for user, (_, _, user_recipes) in zip(created, users)
+            for recipe in user_recipes
+        ]
+        if connection.vendor == "postgresql":
+            copy_recipes(recipes, tag_ids, now)
+        else:
+            create_recipes(recipes, tag_ids)
+    return len(recipes)
+
+
+def copy_recipes(recipes, tag_ids, now):
+    """COPY the recipes and their tag links in with preallocated ids"""
+    with connection.cursor() as cursor:
+        ids = allocate_ids(cursor, "core_recipe", len(recipes))
+        copy_rows(
+            cursor,
+            "core_recipe",
+            ["id", "user_id", *RECIPE_FIELDS, "updated_at"],
+            (
+                [recipe_id, user_id]
+                + [recipe[field] for field in RECIPE_FIELDS]
+                + [now.isoformat()]
+                for recipe_id, (user_id, recipe) in zip(ids, recipes)
+            ),
+        )
+        copy_rows(
+            cursor,
+            "core_recipe_tags",
+            ["recipe_id", "tag_id"],
+            (
+                (recipe_id, tag_ids[(user_id, name)])
+                for recipe_id, (user_id, recipe) in zip(ids, recipes)
+                for name in recipe["tags"]
+            ),
+        )
+
+
+def create_recipes(recipes, tag_ids):
+    """Insert the recipes with bulk_create where COPY isn't available"""
+    created = Recipe.objects.bulk_create(
+        Recipe(user_id=user_id, **{field: recipe[field] for field in RECIPE_FIELDS})
+        for user_id, recipe in recipes
+    )
+    RecipeTag = Recipe.tags.through
+    RecipeTag.objects.bulk_create(
+        RecipeTag(recipe_id=obj.id, tag_id=tag_ids[(user_id, name)])
+        for obj, (user_id, recipe) in zip(created, recipes)
+        for name in recipe["tags"]
+    )
+
+
+class Command(BaseCommand):
+    """Django command to generate a synthetic dataset"""
+
+    help = (
+        "Generate users with a lognormal number of recipes around --recipes "
+        "each, tagged from per-user vocabularies with Zipf-like reuse. The "
+        "data only depends on --seed; users are inserted in batches by "
+        "--workers processes, with COPY on Postgres."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, default=100)
+        parser.add_argument(
+            "--recipes", type=int, default=100, help="Mean recipes per user"
+        )
+        parser.add_argument(
+            "--tags", type=int, default=30, help="Tag vocabulary size per user"
+        )
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+        parser.add_argument(
+            "--batch-size", type=int, default=10000, help="Recipes per transaction"
+        )
+        parser.add_argument(
+            "--password", default="password123", help="Password of every user"
+        )
+
+    def handle(self, *args, **options):
+        if options["recipes"] < 1:
+            raise CommandError("--recipes must be positive")
+        if not 0 < options["tags"] <= len(TAG_NAMES):
+            raise CommandError(f"--tags must be between 1 and {len(TAG_NAMES)}")
+        seed = options["seed"]
+        if get_user_model().objects.filter(
+            email__startswith=f"seed{seed}-user"
+        ).exists():
+            raise CommandError(f"Seed {seed} was already generated")
+
+        config = {
+            "recipes": options["recipes"],
+            "tags": options["tags"],
+            # Hashing once keeps password hashing out of the hot loop
+            "password": make_password(options["password"]),
+        }
+        per_batch = max(1, options["batch_size"] // options["recipes"])
+        batches = [
+            (seed, start, min(start + per_batch, options["users"]), config)
+            for start in range(0, options["users"], per_batch)
+        ]
+
+        began = time.monotonic()
+        users = recipes = 0
+        for (_, start, stop, _), count in zip(batches, self.run(batches, options)):
+            users += stop - start
+            recipes += count
+            rate = recipes / (time.monotonic() - began)
+            self.stdout.write(
+                f"Generated {users:,} users, {recipes:,} recipes "
+                f"({rate:,.0f} recipes/s)"
+            )
+        self.stdout.write(
+            self.style.SUCCESS(f"Generated {users:,} users and {recipes:,} recipes")
+        )
+
+    def run(self, batches, options):
+        """Yield the recipe count of each batch, in order"""
+        if options["workers"] <= 1 or len(batches) <= 1:
+            for batch in batches:
+                yield seed_users(*batch)
+            return
+        # Forked workers inherit the configured Django; close the connections
+        # first so each worker opens its own instead of sharing a socket
+        connections.close_all()
+        with ProcessPoolExecutor(
+            options["workers"], mp_context=get_context("fork")
+        ) as executor:
+            yield from executor.map(seed_users, *zip(*batches))
@@ -0,0 +1,183 @@
+"""
+Middleware routing reads to the read replica and timing requests
+"""
+import hashlib
+import logging
+import random
+import time
+from contextlib import contextmanager
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.exceptions import ImproperlyConfigured, MiddlewareNotUsed
+
+from core.routers import REPLICA, replica_reads
+from core.timing import RequestTiming
+
+logger = logging.getLogger("core.timing")
+
+SAFE_METHODS = ("GET", "HEAD", "OPTIONS")
+
+
+class ReplicaRoutingMiddleware:
+    """
+    Read from the replica for safe requests, except for clients that wrote
+    in the last REPLICA_STICKY_SECONDS, whose reads stay on the primary so
+    they see their own writes. The pins are kept in the
+    REPLICA_PIN_CACHE_ALIAS cache, which must be shared by the workers.
+    """
+
+    sync_capable = True
+    async_capable = True
+    key_prefix = "replica-pin:"
+
+    def __init__(self, get_response):
+        if REPLICA not in settings.DATABASES or not settings.REPLICA_ROUTING:
+            raise MiddlewareNotUsed
+        pins = caches[settings.REPLICA_PIN_CACHE_ALIAS]
+        if isinstance(pins, (LocMemCache, DummyCache)):
+            # A pin only the worker that took the write can see would send
+            # the client's next read to the replica on every other worker
+            raise ImproperlyConfigured(
+                "Replica routing needs REPLICA_PIN_CACHE_ALIAS to name a cache "
+                "shared by all workers, such as Redis."
+            )
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def get_client_key(self, request):
+        """Return a cache key identifying the client, or None if anonymous"""
+        credentials = request.META.get("HTTP_AUTHORIZATION") or request.COOKIES.get(
+            settings.SESSION_COOKIE_NAME
+        )
+        if not credentials:
+            return None
+        return self.key_prefix + hashlib.sha256(credentials.encode()).hexdigest()
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        cache = caches[settings.REPLICA_PIN_CACHE_ALIAS]
+        key = self.get_client_key(request)
+        if request.method not in SAFE_METHODS:
+            response = self.get_response(request)
+            # Start the window once the write has been committed
+            if key:
+                cache.set(key, True, settings.REPLICA_STICKY_SECONDS)
+            return response
+
+        enabled = not (key and cache.get(key))
+        with replica_reads(enabled):
+            response = self.get_response(request)
+        return self.route_stream(response, enabled)
+
+    async def __acall__(self, request):
+        cache = caches[settings.REPLICA_PIN_CACHE_ALIAS]
+        key = self.get_client_key(request)
+        if request.method not in SAFE_METHODS:
+            response = await self.get_response(request)
+            if key:
+                await cache.aset(key, True, settings.REPLICA_STICKY_SECONDS)
+            return response
+
+        enabled = not (key and await cache.aget(key))
+        with replica_reads(enabled):
+            response = await self.get_response(request)
+        return self.route_stream(response, enabled)
+
+    def route_stream(self, response, enabled):
+        if response.streaming and not response.is_async:
+            response.streaming_content = self.stream(
+                response.streaming_content, enabled
+            )
+        return response
+
+    def stream(self, content, enabled):
+        """Read streamed chunks, which are built after the view returned"""
+        chunks = iter(content)
+        while True:
+            with replica_reads(enabled):
+                chunk = next(chunks, None)
+            if chunk is None:
+                return
+            yield chunk
+
+
+class ServerTimingMiddleware:
+    """
+    Time a sample of requests and report the total, SQL, serialize and
+    render durations in a Server-Timing header and a log line. Requests
+    slower than SERVER_TIMING_SLOW_MS also log their SQL statements.
+    Streamed content is built after the header is sent and isn't counted.
+    Runs natively in both sync and async chains, so async views aren't
+    pushed back onto a thread.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not settings.SERVER_TIMING:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if random.random() >= settings.SERVER_TIMING_SAMPLE_RATE:
+            return self.get_response(request)
+        with self.timing() as (timing, start):
+            response = self.get_response(request)
+        return self.report(request, response, timing, start)
+
+    async def __acall__(self, request):
+        if random.random() >= settings.SERVER_TIMING_SAMPLE_RATE:
+            return await self.get_response(request)
+        # Sync code the view runs with sync_to_async copies the context, so
+        # its queries are recorded too
+        with self.timing() as (timing, start):
+            response = await self.get_response(request)
+        return self.report(request, response, timing, start)
+
+    @contextmanager
+    def timing(self):
+        """Record timings and queries made within the block"""
+        with RequestTiming().activate() as timing:
+            yield timing, time.perf_counter()
+
+    def report(self, request, response, timing, start):
+        total = time.perf_counter() - start
+        metrics = timing.metrics(total)
+        response["Server-Timing"] = ", ".join(
+            f'{name};dur={duration:.1f};desc="{desc}"'
+            if desc
+            else f"{name};dur={duration:.1f}"
+            for name, duration, desc in metrics
+        )
+        self.log(request, response, timing, metrics, total)
+        return response
+
+    def log(self, request, response, timing, metrics, total):
+        line = " ".join(
+            [
+                f"method={request.method}",
+                f"path={request.path}",
+                f"status={response.status_code}",
+                f"queries={timing.query_count}",
+            ]
+            + [f"{name}_ms={duration:.1f}" for name, duration, _ in metrics]
+            + [f"{name}={text}" for name, text in timing.descriptions.items()]
+        )
+        if total * 1000 < settings.SERVER_TIMING_SLOW_MS:
+            logger.info(line)
+            return
+        statements = "".join(
+            f"\n  {duration * 1000:.1f}ms {sql}" for sql, duration in timing.statements
+        )
+        logger.warning("slow request %s%s", line, statements)
@@ -0,0 +1,38 @@
+# Generated by Django 5.0.14 on 2026-10-18 01:58
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def count_tag_recipes(apps, schema_editor):
+    Recipe = apps.get_model("core", "Recipe")
+    Tag = apps.get_model("core", "Tag")
+    counts = (
+        Recipe.tags.through.objects.filter(tag=OuterRef("pk"))
+        .order_by()
+        .values("tag")
+        .annotate(count=Count("*"))
+        .values("count")
+    )
+    Tag.objects.update(recipe_count=Coalesce(Subquery(counts), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0008_importcheckpoint'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='tag',
+            name='recipe_count',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(count_tag_recipes, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='tag',
+            index=models.Index(fields=['user', '-recipe_count', '-id'], name='tag_user_count_desc_idx'),
+        ),
+    ]
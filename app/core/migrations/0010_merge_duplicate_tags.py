@@ -0,0 +1,61 @@
+# Generated by Django 5.0.14 on 2026-10-18 02:02
+
+from django.db import migrations
+from django.db.models import Count, Min
+from django.db.models.functions import Lower
+from django.utils import timezone
+
+
+def merge_duplicate_tags(apps, schema_editor):
+    """
+    Merge tags of a user whose names only differ in case into the oldest
+    one, moving their recipe links over, ahead of the unique index in 0011.
+    """
+    Recipe = apps.get_model("core", "Recipe")
+    Tag = apps.get_model("core", "Tag")
+    RecipeTag = Recipe.tags.through
+    tags = Tag.objects.annotate(lower_name=Lower("name"))
+    duplicates = (
+        tags.order_by()
+        .values("user_id", "lower_name")
+        .annotate(keep_id=Min("id"), count=Count("id"))
+        .filter(count__gt=1)
+    )
+    for group in list(duplicates):
+        keep_id = group["keep_id"]
+        merged_ids = list(
+            tags.filter(user_id=group["user_id"], lower_name=group["lower_name"])
+            .exclude(id=keep_id)
+            .values_list("id", flat=True)
+        )
+        linked = set(
+            RecipeTag.objects.filter(tag_id=keep_id).values_list(
+                "recipe_id", flat=True
+            )
+        )
+        moved = set(
+            RecipeTag.objects.filter(tag_id__in=merged_ids).values_list(
+                "recipe_id", flat=True
+            )
+        )
+        RecipeTag.objects.bulk_create(
+            RecipeTag(recipe_id=recipe_id, tag_id=keep_id)
+            for recipe_id in moved - linked
+        )
+        Tag.objects.filter(id__in=merged_ids).delete()
+        Tag.objects.filter(id=keep_id).update(
+            recipe_count=len(linked | moved), updated_at=timezone.now()
+        )
+        # Their nested tags changed, so change their ETags too
+        Recipe.objects.filter(id__in=moved).update(updated_at=timezone.now())
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0009_tag_recipe_count'),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_duplicate_tags, migrations.RunPython.noop),
+    ]
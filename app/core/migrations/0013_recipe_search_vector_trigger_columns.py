@@ -0,0 +1,53 @@
+# Generated by Django 5.0.14 on 2026-10-18 03:02
+
+from django.db import migrations
+
+# Only rebuild the search vector when a recipe is inserted or its title or
+# description changes, not on the updated_at-only writes of tag renames and
+# bulk updates. Postgres only, like 0005.
+NARROW_TRIGGER_SQL = """
+DROP TRIGGER IF EXISTS core_recipe_search_vector_trigger ON core_recipe;
+
+CREATE TRIGGER core_recipe_search_vector_trigger
+    BEFORE INSERT ON core_recipe
+    FOR EACH ROW EXECUTE FUNCTION core_recipe_search_vector_update();
+
+CREATE TRIGGER core_recipe_search_vector_update_trigger
+    BEFORE UPDATE OF title, description ON core_recipe
+    FOR EACH ROW
+    WHEN (
+        OLD.title IS DISTINCT FROM NEW.title
+        OR OLD.description IS DISTINCT FROM NEW.description
+    )
+    EXECUTE FUNCTION core_recipe_search_vector_update();
+"""
+
+WIDE_TRIGGER_SQL = """
+DROP TRIGGER IF EXISTS core_recipe_search_vector_update_trigger ON core_recipe;
+DROP TRIGGER IF EXISTS core_recipe_search_vector_trigger ON core_recipe;
+
+CREATE TRIGGER core_recipe_search_vector_trigger
+    BEFORE INSERT OR UPDATE ON core_recipe
+    FOR EACH ROW EXECUTE FUNCTION core_recipe_search_vector_update();
+"""
+
+
+def narrow_search_trigger(apps, schema_editor):
+    if schema_editor.connection.vendor == "postgresql":
+        schema_editor.execute(NARROW_TRIGGER_SQL)
+
+
+def widen_search_trigger(apps, schema_editor):
+    if schema_editor.connection.vendor == "postgresql":
+        schema_editor.execute(WIDE_TRIGGER_SQL)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0012_tombstone'),
+    ]
+
+    operations = [
+        migrations.RunPython(narrow_search_trigger, widen_search_trigger),
+    ]
@@ -1,10 +1,19 @@
+from collections import defaultdict
+
 from django.conf import settings
 from django.contrib.auth.models import (
     AbstractBaseUser,
     BaseUserManager,
     PermissionsMixin,
 )
-from django.db import models
+from django.contrib.postgres.search import SearchQuery, SearchRank, SearchVectorField
+from django.db import connections, models, transaction
+from django.db.models import Count, F, FloatField, OuterRef, Q, Subquery
+from django.db.models.functions import Cast, Coalesce, Lower
+from django.utils import timezone
+
+from core.events import publish_change
+from core.read_cache import invalidate_user
 
 
 class UserManager(BaseUserManager):
@@ -39,6 +48,33 @@ class User(AbstractBaseUser, PermissionsMixin):
     USERNAME_FIELD = "email"
 
 
+class RecipeQuerySet(models.QuerySet):
+    """Queryset for recipes"""
+
+    def search(self, text):
+        """
+        Filter recipes matching the search text on title and description.
+        On Postgres this uses the search_vector column and annotates a rank,
+        elsewhere it falls back to a case-insensitive substring match.
+        """
+        if connections[self.db].vendor != "postgresql":
+            return self.filter(
+                Q(title__icontains=text) | Q(description__icontains=text)
+            )
+        query = SearchQuery(text, config="english", search_type="websearch")
+        # Cast the rank to double precision so it round-trips exactly
+        # through the pagination cursor
+        return self.filter(search_vector=query).annotate(
+            rank=Cast(SearchRank(F("search_vector"), query), FloatField())
+        )
+
+    def delete(self):
+        """Delete the recipes, taking them off their tags' counts first"""
+        with transaction.atomic():
+            Tag.objects.uncount_recipes(self.values("id"))
+            return super().delete()
+
+
 class Recipe(models.Model):
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
     title = models.CharField(max_length=255)
@@ -49,14 +85,213 @@ class Recipe(models.Model):
     tags = models.ManyToManyField(
         "Tag",
     )
+    # Weighted title/description tsvector, kept up to date by a trigger and
+    # GIN-indexed on Postgres (see migration 0005)
+    search_vector = SearchVectorField(null=True, editable=False)
+    updated_at = models.DateTimeField(auto_now=True)
+    objects = RecipeQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["user", "-id"], name="recipe_user_id_desc_idx"),
+            models.Index(
+                fields=["user", "updated_at"], name="recipe_user_updated_idx"
+            ),
+            models.Index(fields=["user", "price"], name="recipe_user_price_idx"),
+            models.Index(
+                fields=["user", "time_minutes"], name="recipe_user_time_idx"
+            ),
+        ]
 
     def __str__(self):
         return self.title
 
+    def delete(self, *args, **kwargs):
+        with transaction.atomic():
+            Tag.objects.uncount_recipes([self.pk])
+            return super().delete(*args, **kwargs)
+
+
+class TagManager(models.Manager):
+    """Manager for tags"""
+
+    def get_or_create_many(self, user, names):
+        """
+        Return a name -> tag mapping, matching names case-insensitively and
+        creating the missing tags in bulk. Inserts skip names a concurrent
+        request created first (INSERT ... ON CONFLICT DO NOTHING), and those
+        tags are read back, so racing requests share one tag per name.
+        """
+        names = list(dict.fromkeys(names))
+        tags = self._get_by_lower_name(user, names)
+        missing = {}
+        for name in names:
+            if name.lower() not in tags:
+                missing.setdefault(name.lower(), name)
+        if missing:
+            self.bulk_create(
+                [self.model(user=user, name=name) for name in missing.values()],
+                ignore_conflicts=True,
+            )
+            created = self._get_by_lower_name(user, missing.values())
+            tags.update(created)
+            # bulk_create sends no post_save. A tag a racing request created
+            # is published twice, which subscribers treat as an upsert.
+            for tag in created.values():
+                publish_change(user.pk, "tag", "created", tag.id)
+        return {name: tags[name.lower()] for name in names}
+
+    def _get_by_lower_name(self, user, names):
+        tags = self.annotate(lower_name=Lower("name")).filter(
+            user=user, lower_name__in={name.lower() for name in names}
+        )
+        return {tag.name.lower(): tag for tag in tags}
+
+    def adjust_recipe_counts(self, deltas):
+        """Add a tag id -> delta mapping to the recipe counts"""
+        tag_ids = defaultdict(list)
+        for tag_id, delta in deltas.items():
+            if delta:
+                tag_ids[delta].append(tag_id)
+        now = timezone.now()
+        # One update per distinct delta, usually just +1 and -1
+        for delta, ids in tag_ids.items():
+            self.filter(id__in=ids).update(
+                recipe_count=F("recipe_count") + delta, updated_at=now
+            )
+        if tag_ids:
+            self.publish_updated([id for ids in tag_ids.values() for id in ids])
+
+    def uncount_recipes(self, recipe_ids):
+        """
+        Take recipes about to be deleted off the recipe counts of their
+        tags, in one UPDATE whatever the number of recipes. Deleting
+        recipes cascades to their links without m2m_changed, so
+        Recipe.delete() and RecipeQuerySet.delete() call this first.
+        """
+        links = Recipe.tags.through.objects.filter(recipe_id__in=recipe_ids)
+        removed = (
+            links.filter(tag=OuterRef("pk"))
+            .order_by()
+            .values("tag")
+            .annotate(count=Count("*"))
+            .values("count")
+        )
+        tags = self.filter(id__in=links.values("tag_id"))
+        tags.update(
+            recipe_count=F("recipe_count") - Subquery(removed),
+            updated_at=timezone.now(),
+        )
+        self.publish_updated(tags.values("id"))
+
+    def publish_updated(self, ids):
+        """Publish tags changed with .update(), which sends no post_save"""
+        tags = self.filter(id__in=ids).order_by("id").values_list("id", "user_id")
+        for tag_id, user_id in tags:
+            publish_change(user_id, "tag", "updated", tag_id)
+
+    def repair_recipe_counts(self):
+        """Recount the recipes of the tags whose count is wrong, return them"""
+        RecipeTag = Recipe.tags.through
+        counts = (
+            RecipeTag.objects.filter(tag=OuterRef("pk"))
+            .order_by()
+            .values("tag")
+            .annotate(count=Count("*"))
+            .values("count")
+        )
+        actual = Coalesce(Subquery(counts), 0)
+        stale = list(
+            self.annotate(actual=actual)
+            .exclude(recipe_count=F("actual"))
+            .values_list("id", flat=True)
+        )
+        if stale:
+            self.filter(id__in=stale).update(
+                recipe_count=actual, updated_at=timezone.now()
+            )
+            self.publish_updated(stale)
+            user_ids = self.filter(id__in=stale).values_list("user_id", flat=True)
+            for user_id in user_ids.distinct().order_by():
+                invalidate_user(user_id)
+        return stale
+
 
 class Tag(models.Model):
     name = models.CharField(max_length=255)
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
+    # Number of recipes with this tag, kept up to date by core.signals, the
+    # bulk tagging paths and Recipe deletes; deleting a user deletes their
+    # tags along with their recipes. repair_tag_counts fixes any drift
+    recipe_count = models.IntegerField(default=0, editable=False)
+    updated_at = models.DateTimeField(auto_now=True)
+    objects = TagManager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["user", "updated_at"], name="tag_user_updated_idx"),
+            models.Index(
+                fields=["user", "-name", "-id"], name="tag_user_name_desc_idx"
+            ),
+            models.Index(
+                fields=["user", "-recipe_count", "-id"], name="tag_user_count_desc_idx"
+            ),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                F("user"), Lower("name"), name="tag_user_lower_name_uniq"
+            ),
+        ]
 
     def __str__(self):
         return self.name
+
+
+class TombstoneManager(models.Manager):
+    """Manager for tombstones"""
+
+    def record(self, user, kind, ids):
+        """Record the deletion of the user's objects of a kind"""
+        self.bulk_create(
+            self.model(user=user, kind=kind, object_id=object_id) for object_id in ids
+        )
+
+    def compact(self, before):
+        """Delete the tombstones recorded before a time, return how many"""
+        count, _ = self.filter(deleted_at__lt=before).delete()
+        return count
+
+
+class Tombstone(models.Model):
+    """A deleted recipe or tag, kept so delta sync can report the deletion"""
+
+    RECIPE = "recipe"
+    TAG = "tag"
+    KIND_CHOICES = [(RECIPE, "Recipe"), (TAG, "Tag")]
+
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
+    kind = models.CharField(max_length=10, choices=KIND_CHOICES)
+    object_id = models.BigIntegerField()
+    deleted_at = models.DateTimeField(default=timezone.now, db_index=True)
+    objects = TombstoneManager()
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["user", "deleted_at"], name="tombstone_user_deleted_idx"
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.kind} {self.object_id}"
+
+
+class ImportCheckpoint(models.Model):
+    """Records committed so far by a bulk import of a source file"""
+
+    source = models.CharField(max_length=1024, unique=True)
+    position = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.source} @ {self.position}"
@@ -0,0 +1,110 @@
+"""
+Per-user read-through cache of serialized API responses
+"""
+import hashlib
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+
+from core.timing import describe, timed
+
+VERSION_PREFIX = "read-cache:version:"
+KEY_PREFIX = "read-cache:"
+
+
+class Stats:
+    """
+    Hits and misses of the read cache in this process only. Each worker
+    counts its own lookups, so add the counts of all workers up for the
+    overall hit rate.
+    """
+
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def record(self, hit):
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def as_dict(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else None,
+            }
+
+    def reset(self):
+        with self._lock:
+            self.hits = self.misses = 0
+
+
+stats = Stats()
+
+
+def get_cache():
+    return caches[settings.READ_CACHE_ALIAS]
+
+
+def new_version():
+    # Never reuse a version whose entries may still be cached
+    return time.time_ns()
+
+
+def get_version(user_id):
+    cache = get_cache()
+    version = cache.get(f"{VERSION_PREFIX}{user_id}")
+    if version is None:
+        version = new_version()
+        if not cache.add(f"{VERSION_PREFIX}{user_id}", version, None):
+            # Another request set it first
+            version = cache.get(f"{VERSION_PREFIX}{user_id}", version)
+    return version
+
+
+def invalidate_user(user_id):
+    """
+    Drop everything cached for a user now and again once the transaction
+    commits, as reads in between may cache the data from before the write.
+    """
+    bump_version(user_id)
+    transaction.on_commit(lambda: bump_version(user_id))
+
+
+def bump_version(user_id):
+    cache = get_cache()
+    try:
+        cache.incr(f"{VERSION_PREFIX}{user_id}")
+    except ValueError:
+        cache.set(f"{VERSION_PREFIX}{user_id}", new_version(), None)
+
+
+def lookup(user_id, name):
+    """
+    Return (key, data) for the user's entry called name, with data None on
+    a miss. Store the data built on a miss with store(key, data); the key
+    holds the version read before building, so data built while a write
+    was invalidating the user is never stored under the new version.
+    """
+    with timed("cache"):
+        digest = hashlib.md5(name.encode()).hexdigest()
+        key = f"{KEY_PREFIX}{user_id}:{get_version(user_id)}:{digest}"
+        data = get_cache().get(key)
+    hit = data is not None
+    stats.record(hit)
+    describe("cache", "hit" if hit else "miss")
+    return key, data
+
+
+def store(key, data):
+    with timed("cache"):
+        get_cache().set(key, data, settings.READ_CACHE_TTL)
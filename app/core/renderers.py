@@ -0,0 +1,49 @@
+"""
+Response renderers backed by orjson and MessagePack
+"""
+import orjson
+from rest_framework import renderers
+from rest_framework.utils.encoders import JSONEncoder
+
+from core.timing import timed
+
+try:
+    import msgpack
+except ImportError:  # pragma: no cover
+    msgpack = None
+
+_encoder = JSONEncoder()
+
+
+def encode_default(obj):
+    """Encode the types orjson and msgpack don't handle the way DRF does"""
+    return _encoder.default(obj)
+
+
+class ORJSONRenderer(renderers.JSONRenderer):
+    """JSONRenderer that serializes with orjson"""
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b""
+        renderer_context = renderer_context or {}
+        with timed("render"):
+            if self.get_indent(accepted_media_type, renderer_context):
+                # orjson only indents by two spaces, leave other layouts to DRF
+                return super().render(data, accepted_media_type, renderer_context)
+            return orjson.dumps(data, default=encode_default)
+
+
+class MessagePackRenderer(renderers.BaseRenderer):
+    """Render responses as MessagePack for clients that accept it"""
+
+    media_type = "application/msgpack"
+    format = "msgpack"
+    charset = None
+    render_style = "binary"
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b""
+        with timed("render"):
+            return msgpack.packb(data, default=encode_default)
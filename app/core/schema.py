@@ -0,0 +1,118 @@
+"""
+OpenAPI schema generated once per code version and served precompressed
+"""
+import gzip
+import hashlib
+import json
+import re
+import threading
+from pathlib import Path
+
+from django.conf import settings
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from drf_spectacular.renderers import OpenApiJsonRenderer
+from drf_spectacular.utils import extend_schema
+from drf_spectacular.views import SCHEMA_KWARGS, SpectacularAPIView
+
+accepts_gzip = re.compile(r"\bgzip\b").search
+
+
+class SchemaDocument:
+    """The schema rendered in one format, plain and gzipped, with ETags"""
+
+    def __init__(self, content, media_type):
+        self.content = content
+        self.media_type = media_type
+        # mtime=0 keeps the compressed bytes the same on every worker
+        self.gzipped = gzip.compress(content, mtime=0)
+        digest = hashlib.sha256(content).hexdigest()[:32]
+        self.etag = f'"{digest}"'
+        self.gzip_etag = f'"{digest}-gzip"'
+
+
+class CachedSchemaView(SpectacularAPIView):
+    """
+    SpectacularAPIView generating the schema once per process, or loading
+    it from SCHEMA_FILE when build_schema wrote it for this APP_VERSION.
+    Each format is rendered and gzipped once and served with a strong
+    ETag. Requests the cache can't answer, such as ?lang=, are generated
+    as usual.
+    """
+
+    _schemas = {}
+    _documents = {}
+    _lock = threading.Lock()
+
+    @extend_schema(**SCHEMA_KWARGS)
+    def get(self, request, *args, **kwargs):
+        if (
+            not settings.SCHEMA_CACHE
+            or not self.serve_public
+            or request.query_params.keys() - {"format"}
+        ):
+            return super().get(request, *args, **kwargs)
+
+        document = self.get_document(request.accepted_renderer)
+        if accepts_gzip(request.META.get("HTTP_ACCEPT_ENCODING", "")):
+            response = HttpResponse(document.gzipped, content_type=document.media_type)
+            response["Content-Encoding"] = "gzip"
+            response["ETag"] = document.gzip_etag
+        else:
+            response = HttpResponse(document.content, content_type=document.media_type)
+            response["ETag"] = document.etag
+        response["Content-Disposition"] = (
+            f'inline; filename="{self._get_filename(request, self.api_version)}"'
+        )
+        # Clients and the gateway revalidate, getting 304s while it's unchanged
+        response["Cache-Control"] = "no-cache"
+        patch_vary_headers(response, ["Accept", "Accept-Encoding"])
+        return get_conditional_response(
+            request, etag=response["ETag"], response=response
+        )
+
+    def get_document(self, renderer):
+        key = (self.api_version, renderer.media_type)
+        with self._lock:
+            if key not in self._documents:
+                content = renderer.render(self.get_schema(), renderer.media_type)
+                media_type = renderer.media_type
+                if renderer.charset:
+                    media_type += f"; charset={renderer.charset}"
+                self._documents[key] = SchemaDocument(content, media_type)
+            return self._documents[key]
+
+    def get_schema(self):
+        if self.api_version not in self._schemas:
+            self._schemas[self.api_version] = (
+                self.load_schema() or self.build_schema()
+            )
+        return self._schemas[self.api_version]
+
+    def load_schema(self):
+        """Return the schema from SCHEMA_FILE if it's for this code version"""
+        path = Path(settings.SCHEMA_FILE)
+        if not settings.APP_VERSION or not path.exists():
+            return None
+        data = json.loads(path.read_bytes())
+        if (data["app_version"], data["api_version"]) != (
+            settings.APP_VERSION,
+            self.api_version,
+        ):
+            return None
+        return data["schema"]
+
+    def build_schema(self):
+        """Generate the schema as plain JSON data"""
+        generator = self.generator_class(
+            urlconf=self.urlconf, api_version=self.api_version, patterns=self.patterns
+        )
+        schema = generator.get_schema(request=None, public=True)
+        # Round trip through JSON so built and loaded schemas render the same
+        return json.loads(OpenApiJsonRenderer().render(schema))
+
+    @classmethod
+    def clear(cls):
+        with cls._lock:
+            cls._schemas.clear()
+            cls._documents.clear()
@@ -0,0 +1,109 @@
+"""
+Signal handlers for the core models
+"""
+from django.conf import settings
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete
+from django.dispatch import receiver
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+
+from core.authentication import get_token_cache
+from core.events import publish_change, publish_changes
+from core.read_cache import bump_version, invalidate_user
+from core.models import Recipe, Tag
+
+
+@receiver(post_save, sender=Token)
+@receiver(post_delete, sender=Token)
+def invalidate_cached_token(sender, instance, **kwargs):
+    """Drop a saved or deleted token from the token cache"""
+    get_token_cache().delete(instance.key)
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+def invalidate_cached_user_tokens(sender, instance, created, **kwargs):
+    """Drop the tokens of an edited or deactivated user from the token cache"""
+    if created:
+        return
+    token_cache = get_token_cache()
+    for key in Token.objects.filter(user=instance).values_list("key", flat=True):
+        token_cache.delete(key)
+
+
+@receiver(post_save, sender=Tag)
+@receiver(pre_delete, sender=Tag)
+def touch_tagged_recipes(sender, instance, created=False, **kwargs):
+    """Mark the recipes of an edited or deleted tag as updated"""
+    if created:
+        return
+    recipes = Recipe.objects.filter(tags=instance)
+    recipes.update(updated_at=timezone.now())
+    # .update() sends no post_save, so publish the touched recipes here, in
+    # one event however many recipes have the tag
+    publish_changes(
+        instance.user_id,
+        "recipe",
+        "updated",
+        recipes.order_by("id").values_list("id", flat=True),
+    )
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+def count_tag_links(sender, instance, action, reverse, pk_set, **kwargs):
+    """Keep Tag.recipe_count in step with links added or removed via the ORM"""
+    if action == "post_add" and pk_set:
+        if reverse:
+            Tag.objects.adjust_recipe_counts({instance.pk: len(pk_set)})
+        else:
+            Tag.objects.adjust_recipe_counts(dict.fromkeys(pk_set, 1))
+    elif action in ("pre_remove", "pre_clear"):
+        # pk_set may name unlinked objects, count the links that exist
+        if reverse:
+            links = sender.objects.filter(tag=instance)
+            if pk_set is not None:
+                links = links.filter(recipe_id__in=pk_set)
+            Tag.objects.adjust_recipe_counts({instance.pk: -links.count()})
+        else:
+            links = sender.objects.filter(recipe=instance)
+            if pk_set is not None:
+                links = links.filter(tag_id__in=pk_set)
+            tag_ids = links.values_list("tag_id", flat=True)
+            Tag.objects.adjust_recipe_counts(dict.fromkeys(tag_ids, -1))
+
+
+@receiver(post_save, sender=Recipe)
+@receiver(post_save, sender=Tag)
+def publish_saved(sender, instance, created, **kwargs):
+    """Publish a created or edited recipe or tag to its user's subscribers"""
+    op = "created" if created else "updated"
+    publish_change(instance.user_id, sender._meta.model_name, op, instance.pk)
+
+
+@receiver(post_delete, sender=Recipe)
+@receiver(post_delete, sender=Tag)
+def publish_deleted(sender, instance, **kwargs):
+    """Publish a deleted recipe or tag to its user's subscribers"""
+    publish_change(instance.user_id, sender._meta.model_name, "deleted", instance.pk)
+
+
+@receiver(post_save, sender=Recipe)
+@receiver(post_save, sender=Tag)
+@receiver(post_delete, sender=Recipe)
+@receiver(post_delete, sender=Tag)
+def invalidate_read_cache(sender, instance, **kwargs):
+    """Drop the cached reads of the user whose recipe or tag changed"""
+    invalidate_user(instance.user_id)
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+def invalidate_new_user_read_cache(sender, instance, created, **kwargs):
+    """Make sure a new user whose id was used before starts uncached"""
+    if created:
+        bump_version(instance.pk)
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+def invalidate_read_cache_links(sender, instance, action, **kwargs):
+    """Drop the cached reads of the user whose recipe tags changed"""
+    if action in ("post_add", "post_remove", "post_clear"):
+        invalidate_user(instance.user_id)
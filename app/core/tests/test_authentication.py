@@ -0,0 +1,162 @@
+from unittest.mock import patch
+
+from core.authentication import LRUTokenCache, get_token_cache
+from django.contrib.auth import get_user_model
+from django.test import AsyncClient, TestCase, override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+ME_URL = reverse("user:me")
+ASYNC_TAGS_URL = reverse("recipe:async-tag-list")
+
+
+class LRUTokenCacheTests(TestCase):
+    """Tests for the in-process token cache"""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            email="user@example.com", password="password123"
+        )
+        self.token = Token.objects.create(user=self.user)
+
+    def test_evicts_least_recently_used(self):
+        """Test the oldest untouched entry is evicted when the cache is full"""
+        token_cache = LRUTokenCache(max_size=2, ttl=60)
+        token_cache.set("a", self.token)
+        token_cache.set("b", self.token)
+        token_cache.get("a")
+        token_cache.set("c", self.token)
+
+        self.assertIsNotNone(token_cache.get("a"))
+        self.assertIsNone(token_cache.get("b"))
+        self.assertIsNotNone(token_cache.get("c"))
+
+    @patch("core.authentication.time.monotonic")
+    def test_entries_expire(self, patched_monotonic):
+        """Test entries are dropped once their TTL has passed"""
+        patched_monotonic.return_value = 100
+        token_cache = LRUTokenCache(max_size=2, ttl=60)
+        token_cache.set("a", self.token)
+
+        patched_monotonic.return_value = 159
+        self.assertIsNotNone(token_cache.get("a"))
+        patched_monotonic.return_value = 160
+        self.assertIsNone(token_cache.get("a"))
+
+    def test_returns_copies(self):
+        """Test changing a cached user doesn't leak into the cache"""
+        token_cache = LRUTokenCache(max_size=2, ttl=60)
+        token_cache.set("a", self.token)
+
+        token_cache.get("a").user.name = "changed"
+
+        self.assertEqual(token_cache.get("a").user.name, "")
+
+
+class CachedTokenAuthenticationTests(TestCase):
+    """Test authenticating api requests through the token cache"""
+
+    def setUp(self):
+        get_token_cache().clear()
+        self.user = get_user_model().objects.create_user(
+            email="user@example.com", password="password123", name="Name"
+        )
+        self.token = Token.objects.create(user=self.user)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f"Token {self.token.key}")
+
+    def test_warm_cache_skips_database(self):
+        """Test a warm cache authenticates without any query"""
+        with self.assertNumQueries(1):
+            res = self.client.get(ME_URL)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+        with self.assertNumQueries(0):
+            res = self.client.get(ME_URL)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data["email"], self.user.email)
+
+    def test_invalid_token_rejected(self):
+        """Test an unknown token is rejected and not cached"""
+        self.client.credentials(HTTP_AUTHORIZATION="Token invalid")
+
+        res = self.client.get(ME_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertIsNone(get_token_cache().get("invalid"))
+
+    def test_deleted_token_invalidated(self):
+        """Test deleting a token drops it from the cache"""
+        self.client.get(ME_URL)
+
+        self.token.delete()
+        res = self.client.get(ME_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_deactivated_user_invalidated(self):
+        """Test deactivating a user drops their token from the cache"""
+        self.client.get(ME_URL)
+
+        self.user.is_active = False
+        self.user.save()
+        res = self.client.get(ME_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_edited_user_invalidated(self):
+        """Test editing a user through the api refreshes the cached user"""
+        self.client.get(ME_URL)
+
+        res = self.client.patch(ME_URL, {"name": "New Name"})
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        res = self.client.get(ME_URL)
+
+        self.assertEqual(res.data["name"], "New Name")
+
+    @override_settings(TOKEN_CACHE_ALIAS="default")
+    def test_django_cache_backend(self):
+        """Test the token cache can be backed by a Django cache"""
+        get_token_cache().clear()
+        self.client.get(ME_URL)
+
+        with self.assertNumQueries(1):
+            res = self.client.get(ME_URL)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data["email"], self.user.email)
+
+        self.token.delete()
+        res = self.client.get(ME_URL)
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    @override_settings(TOKEN_CACHE_ALIAS="default")
+    def test_django_cache_stores_user_id(self):
+        """Test only the user id is cached, and the user is loaded fresh"""
+        token_cache = get_token_cache()
+        token_cache.clear()
+        self.client.get(ME_URL)
+
+        self.assertEqual(
+            token_cache.cache.get(token_cache.key_prefix + self.token.key),
+            self.user.id,
+        )
+        # A queryset update sends no signal, the cached id is still there
+        get_user_model().objects.filter(id=self.user.id).update(is_active=False)
+        res = self.client.get(ME_URL)
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    @override_settings(TOKEN_CACHE_ALIAS="default")
+    async def test_django_cache_backend_async(self):
+        """Test async views authenticate through the Django cache backend"""
+        get_token_cache().clear()
+        headers = {"Authorization": f"Token {self.token.key}"}
+
+        for _ in range(2):
+            res = await AsyncClient().get(ASYNC_TAGS_URL, headers=headers)
+            self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+        await self.token.adelete()
+        res = await AsyncClient().get(ASYNC_TAGS_URL, headers=headers)
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
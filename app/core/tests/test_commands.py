@@ -1,9 +1,23 @@
+import io
+import json
+import os
+import tempfile
+from datetime import timedelta
+from decimal import Decimal
 from unittest.mock import patch
 from psycopg2 import OperationalError as Psycopg2Error
 
+from core.models import ImportCheckpoint, Recipe, Tag, Tombstone
+from django.contrib.auth import get_user_model
 from django.core.management import call_command
+from django.core.management.base import CommandError
 from django.db.utils import OperationalError
-from django.test import SimpleTestCase
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+TAGS_URL = reverse("recipe:tag-list")
 
 
 @patch("core.management.commands.wait_for_db.Command.check")
@@ -25,3 +39,257 @@ class CommandsTests(SimpleTestCase):
         call_command("wait_for_db")
         self.assertEqual(patched_check.call_count, 6)
         patched_check.assert_called_with(databases=["default"])
+
+
+class ImportRecipesCommandTests(TestCase):
+    """Tests for the import_recipes command"""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            email="user@example.com", password="password123"
+        )
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmpdir.cleanup)
+
+    def write(self, name, content):
+        path = os.path.join(self.tmpdir.name, name)
+        with open(path, "w", newline="") as file:
+            file.write(content)
+        return path
+
+    def write_ndjson(self, records):
+        return self.write(
+            "recipes.ndjson", "".join(json.dumps(record) + "\n" for record in records)
+        )
+
+    def import_recipes(self, path, **options):
+        call_command("import_recipes", path, stdout=io.StringIO(), **options)
+
+    def test_import_ndjson(self):
+        """Test importing recipes and tags from NDJSON, reusing existing tags"""
+        existing = Tag.objects.create(user=self.user, name="Dinner")
+        path = self.write_ndjson(
+            [
+                {
+                    "title": "Curry",
+                    "time_minutes": 30,
+                    "price": "5.50",
+                    "tags": [{"name": "Dinner"}, {"name": "Spicy"}],
+                },
+                {"title": "Toast", "time_minutes": 5, "price": 1, "tags": ["Dinner"]},
+            ]
+        )
+
+        self.import_recipes(path, user=self.user.email)
+
+        curry = Recipe.objects.get(user=self.user, title="Curry")
+        self.assertEqual(curry.price, Decimal("5.50"))
+        self.assertCountEqual(
+            curry.tags.values_list("name", flat=True), ["Dinner", "Spicy"]
+        )
+        toast = Recipe.objects.get(user=self.user, title="Toast")
+        self.assertEqual(list(toast.tags.all()), [existing])
+        self.assertEqual(Tag.objects.filter(user=self.user).count(), 2)
+        self.assertEqual(
+            dict(Tag.objects.values_list("name", "recipe_count")),
+            {"Dinner": 2, "Spicy": 1},
+        )
+
+    def test_import_csv_per_record_users(self):
+        """Test importing CSV records owned by the users they name"""
+        other = get_user_model().objects.create_user(
+            email="other@example.com", password="password123"
+        )
+        path = self.write(
+            "recipes.csv",
+            "user,title,description,time_minutes,price,link,tags\n"
+            "user@example.com,Curry,,30,5.50,,Dinner|Spicy\n"
+            "other@example.com,Salad,Fresh,10,3.00,http://example.com,\n",
+        )
+
+        self.import_recipes(path, batch_size=1)
+
+        curry = Recipe.objects.get(title="Curry")
+        self.assertEqual(curry.user, self.user)
+        self.assertEqual(curry.tags.count(), 2)
+        salad = Recipe.objects.get(title="Salad")
+        self.assertEqual(salad.user, other)
+        self.assertEqual(salad.link, "http://example.com")
+        self.assertEqual(salad.tags.count(), 0)
+
+    def test_import_resumes_after_failure(self):
+        """Test a failed import keeps committed batches and resumes after them"""
+        records = [
+            {"title": f"Recipe {i}", "time_minutes": 5, "price": "1.00"}
+            for i in range(5)
+        ]
+        records[3]["time_minutes"] = "soon"
+        path = self.write_ndjson(records)
+
+        with self.assertRaisesMessage(CommandError, "Invalid record 4"):
+            self.import_recipes(path, user=self.user.email, batch_size=2)
+        self.assertEqual(Recipe.objects.count(), 2)
+        self.assertEqual(ImportCheckpoint.objects.get().position, 2)
+
+        records[3]["time_minutes"] = 5
+        self.write_ndjson(records)
+        self.import_recipes(path, user=self.user.email, batch_size=2)
+
+        self.assertEqual(
+            sorted(Recipe.objects.values_list("title", flat=True)),
+            [f"Recipe {i}" for i in range(5)],
+        )
+        self.import_recipes(path, user=self.user.email)
+        self.assertEqual(Recipe.objects.count(), 5)
+
+    def test_import_over_model_limits(self):
+        """Test records over the field limits fail with their number"""
+        valid = {"title": "Soup", "time_minutes": 5, "price": "1.00"}
+        for record in [
+            {**valid, "price": "1000.00"},
+            {**valid, "title": "x" * 256},
+        ]:
+            with self.subTest(record=record):
+                path = self.write_ndjson([valid, record])
+
+                with self.assertRaisesMessage(CommandError, "Invalid record 2"):
+                    self.import_recipes(path, user=self.user.email, restart=True)
+                self.assertFalse(Recipe.objects.exists())
+
+    @override_settings(READ_CACHE=True)
+    def test_import_invalidates_read_cache(self):
+        """Test imported recipes and tags show up in cached reads"""
+        client = APIClient()
+        client.force_authenticate(self.user)
+        self.assertEqual(client.get(TAGS_URL).data["results"], [])
+        path = self.write_ndjson(
+            [{"title": "Curry", "time_minutes": 30, "price": 5, "tags": ["Dinner"]}]
+        )
+
+        self.import_recipes(path, user=self.user.email)
+
+        res = client.get(TAGS_URL)
+        self.assertEqual(
+            [(tag["name"], tag["recipe_count"]) for tag in res.data["results"]],
+            [("Dinner", 1)],
+        )
+
+    def test_import_unknown_user(self):
+        """Test records of unknown users fail the import"""
+        path = self.write_ndjson(
+            [{"user": "nobody@example.com", "title": "x", "time_minutes": 1, "price": 1}]
+        )
+
+        with self.assertRaisesMessage(CommandError, "nobody@example.com"):
+            self.import_recipes(path)
+        self.assertFalse(Recipe.objects.exists())
+
+
+class RepairTagCountsCommandTests(TestCase):
+    """Tests for the repair_tag_counts command"""
+
+    def test_repair_tag_counts(self):
+        """Test drifted tag counts are recounted from the recipe links"""
+        user = get_user_model().objects.create_user(
+            email="user@example.com", password="password123"
+        )
+        recipe = Recipe.objects.create(
+            user=user, title="Curry", time_minutes=30, price=Decimal("5.50")
+        )
+        dinner = Tag.objects.create(user=user, name="Dinner")
+        spicy = Tag.objects.create(user=user, name="Spicy")
+        unused = Tag.objects.create(user=user, name="Unused")
+        recipe.tags.add(dinner, spicy)
+        Tag.objects.filter(id=dinner.id).update(recipe_count=7)
+        Tag.objects.filter(id=unused.id).update(recipe_count=-1)
+        out = io.StringIO()
+
+        call_command("repair_tag_counts", stdout=out)
+
+        self.assertIn("Repaired 2 tag counts", out.getvalue())
+        self.assertEqual(
+            dict(Tag.objects.values_list("name", "recipe_count")),
+            {"Dinner": 1, "Spicy": 1, "Unused": 0},
+        )
+
+    @override_settings(READ_CACHE=True)
+    def test_repair_invalidates_read_cache(self):
+        """Test repaired counts show up in cached tag lists"""
+        user = get_user_model().objects.create_user(email="user@example.com")
+        tag = Tag.objects.create(user=user, name="Dinner")
+        Tag.objects.filter(id=tag.id).update(recipe_count=7)
+        client = APIClient()
+        client.force_authenticate(user)
+        client.get(TAGS_URL)
+
+        call_command("repair_tag_counts", stdout=io.StringIO())
+
+        res = client.get(TAGS_URL)
+        self.assertEqual(res.data["results"][0]["recipe_count"], 0)
+
+
+class SeedDataCommandTests(TestCase):
+    """Tests for the seed_data command"""
+
+    def seed_data(self, **options):
+        options = {"users": 5, "recipes": 20, "tags": 10, "workers": 1, **options}
+        call_command("seed_data", stdout=io.StringIO(), **options)
+
+    def snapshot(self):
+        return sorted(
+            Recipe.objects.values_list(
+                "user__email", "title", "price", "time_minutes", "tags__name"
+            )
+        )
+
+    def test_seed_data(self):
+        """Test users get recipes tagged from their vocabulary"""
+        self.seed_data(batch_size=30)
+
+        users = get_user_model().objects.filter(email__startswith="seed0-")
+        self.assertEqual(users.count(), 5)
+        self.assertTrue(users[0].check_password("password123"))
+        self.assertTrue(Recipe.objects.exists())
+        self.assertEqual(Tag.objects.filter(user=users[0]).count(), 10)
+        self.assertEqual(Tag.objects.repair_recipe_counts(), [])
+
+    def test_seed_data_deterministic(self):
+        """Test the same seed generates the same data in any batch size"""
+        self.seed_data(batch_size=10000)
+        first = self.snapshot()
+        get_user_model().objects.all().delete()
+
+        self.seed_data(batch_size=20)
+
+        self.assertEqual(self.snapshot(), first)
+
+    def test_seed_data_twice(self):
+        """Test generating the same seed twice fails"""
+        self.seed_data()
+
+        with self.assertRaisesMessage(CommandError, "already generated"):
+            self.seed_data()
+        self.seed_data(seed=1)
+
+
+class CompactTombstonesCommandTests(TestCase):
+    """Tests for the compact_tombstones command"""
+
+    def test_compact_tombstones(self):
+        """Test tombstones older than the retention are deleted"""
+        user = get_user_model().objects.create_user(
+            email="user@example.com", password="password123"
+        )
+        Tombstone.objects.record(user, Tombstone.RECIPE, [1, 2])
+        Tombstone.objects.record(user, Tombstone.TAG, [3])
+        Tombstone.objects.filter(object_id__in=[1, 3]).update(
+            deleted_at=timezone.now() - timedelta(days=8)
+        )
+        out = io.StringIO()
+
+        call_command("compact_tombstones", days=7, stdout=out)
+
+        self.assertIn("Deleted 2 tombstones", out.getvalue())
+        self.assertEqual(
+            list(Tombstone.objects.values_list("object_id", flat=True)), [2]
+        )
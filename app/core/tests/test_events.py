@@ -0,0 +1,194 @@
+import threading
+from decimal import Decimal
+
+from asgiref.sync import sync_to_async
+from core.events import OVERFLOW, LocalBroker, get_broker
+from core.models import Recipe, Tag
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+
+class BrokerTests(TestCase):
+    """Tests for the in-process event broker"""
+
+    async def test_publish_from_other_thread(self):
+        """Test events published by worker threads reach the event loop"""
+        broker = LocalBroker()
+        subscription = broker.subscribe(1)
+        other = broker.subscribe(2)
+
+        thread = threading.Thread(target=broker.publish, args=(1, {"id": 1}))
+        thread.start()
+        thread.join()
+
+        self.assertEqual(await subscription.get(), {"id": 1})
+        self.assertTrue(other.queue.empty())
+
+    @override_settings(EVENTS_QUEUE_SIZE=2)
+    async def test_overflow(self):
+        """Test a full queue is replaced by the overflow marker"""
+        subscription = LocalBroker().subscribe(1)
+
+        for event_id in range(3):
+            subscription.put({"id": event_id})
+        subscription.put({"id": 4})
+
+        self.assertIs(await subscription.get(), OVERFLOW)
+        self.assertTrue(subscription.queue.empty())
+
+    async def test_unsubscribe(self):
+        """Test closed subscriptions stop getting events"""
+        broker = LocalBroker()
+        subscription = broker.subscribe(1)
+
+        subscription.close()
+        broker.publish(1, {"id": 1})
+
+        self.assertEqual(broker.subscriber_count(), 0)
+
+
+class ChangeEventTests(TestCase):
+    """Tests for publishing recipe and tag changes"""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            email="user@example.com", password="password123"
+        )
+
+    async def collect(self, change):
+        """Return the events published by the change once it commits"""
+        subscription = get_broker().subscribe(self.user.id)
+        self.addCleanup(subscription.close)
+
+        def run():
+            with self.captureOnCommitCallbacks(execute=True):
+                change()
+
+        await sync_to_async(run)()
+        events = []
+        while not subscription.queue.empty():
+            events.append(await subscription.get())
+        return events
+
+    async def test_model_changes(self):
+        """Test saving and deleting recipes and tags publishes events"""
+        ids = {}
+
+        def change():
+            recipe = Recipe.objects.create(
+                user=self.user, title="Soup", time_minutes=5, price=Decimal("1.00")
+            )
+            tag = Tag.objects.create(user=self.user, name="Dinner")
+            recipe.title = "Stew"
+            recipe.save()
+            ids.update(recipe=recipe.id, tag=tag.id)
+            recipe.delete()
+
+        events = await self.collect(change)
+
+        self.assertEqual(
+            events,
+            [
+                {"type": "recipe", "op": "created", "id": ids["recipe"]},
+                {"type": "tag", "op": "created", "id": ids["tag"]},
+                {"type": "recipe", "op": "updated", "id": ids["recipe"]},
+                {"type": "recipe", "op": "deleted", "id": ids["recipe"]},
+            ],
+        )
+
+    async def test_recipe_with_new_tags(self):
+        """Test creating a recipe with new tags publishes the tags too"""
+        client = APIClient()
+        client.force_authenticate(self.user)
+        payload = {
+            "title": "Soup",
+            "time_minutes": 5,
+            "price": "1.00",
+            "tags": [{"name": "Dinner"}, {"name": "Quick"}],
+        }
+        responses = []
+
+        def change():
+            responses.append(
+                client.post(reverse("recipe:recipe-list"), payload, format="json")
+            )
+
+        events = await self.collect(change)
+
+        recipe_id = responses[0].data["id"]
+        tag_ids = await sync_to_async(list)(
+            Tag.objects.order_by("id").values_list("id", flat=True)
+        )
+        self.assertEqual(
+            events,
+            [{"type": "recipe", "op": "created", "id": recipe_id}]
+            + [{"type": "tag", "op": "created", "id": tag_id} for tag_id in tag_ids]
+            + [{"type": "tag", "op": "updated", "id": tag_id} for tag_id in tag_ids],
+        )
+
+    async def test_tag_edit_touches_recipes(self):
+        """Test editing a tag publishes its recipes, whose tags changed"""
+        recipe = await Recipe.objects.acreate(
+            user=self.user, title="Soup", time_minutes=5, price=Decimal("1.00")
+        )
+        tag = await Tag.objects.acreate(user=self.user, name="Dinner")
+        await recipe.tags.aadd(tag)
+
+        def change():
+            tag.name = "Supper"
+            tag.save()
+
+        events = await self.collect(change)
+
+        self.assertEqual(
+            events,
+            [
+                {"type": "recipe", "op": "updated", "ids": [recipe.id]},
+                {"type": "tag", "op": "updated", "id": tag.id},
+            ],
+        )
+
+    @override_settings(EVENTS_MAX_IDS=2)
+    async def test_tag_edit_many_recipes(self):
+        """Test a tag on many recipes publishes one event, or a refetch"""
+        tag = await Tag.objects.acreate(user=self.user, name="Dinner")
+        recipes = [
+            await Recipe.objects.acreate(
+                user=self.user, title="Soup", time_minutes=5, price=Decimal("1.00")
+            )
+            for _ in range(3)
+        ]
+        await tag.recipe_set.aadd(*recipes[:2])
+
+        def rename(name):
+            def change():
+                tag.name = name
+                tag.save()
+
+            return change
+
+        events = await self.collect(rename("Supper"))
+        self.assertEqual(
+            events[0],
+            {"type": "recipe", "op": "updated", "ids": [r.id for r in recipes[:2]]},
+        )
+
+        await tag.recipe_set.aadd(recipes[2])
+        events = await self.collect(rename("Lunch"))
+        self.assertEqual(events[0], {"type": "recipe", "op": "refetch"})
+
+    async def test_rolled_back_changes(self):
+        """Test changes that are rolled back are not published"""
+
+        def change():
+            try:
+                with transaction.atomic():
+                    Tag.objects.create(user=self.user, name="Dinner")
+                    raise ValueError
+            except ValueError:
+                pass
+
+        self.assertEqual(await self.collect(change), [])
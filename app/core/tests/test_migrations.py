@@ -0,0 +1,51 @@
+from django.db import connection
+from django.db.migrations.executor import MigrationExecutor
+from django.test import TransactionTestCase
+
+from core.models import Recipe, Tag
+
+
+class MergeDuplicateTagsMigrationTests(TransactionTestCase):
+    """Test merging tags that only differ in case before the unique index"""
+
+    migrate_from = [("core", "0009_tag_recipe_count")]
+    migrate_to = [("core", "0011_tag_user_lower_name_uniq")]
+
+    def migrate(self, targets):
+        executor = MigrationExecutor(connection)
+        executor.migrate(targets)
+        return executor.loader.project_state(targets).apps
+
+    def tearDown(self):
+        executor = MigrationExecutor(connection)
+        self.migrate(executor.loader.graph.leaf_nodes())
+
+    def test_merge_duplicate_tags(self):
+        """Test duplicates merge into the oldest tag, keeping every link"""
+        apps = self.migrate(self.migrate_from)
+        User = apps.get_model("core", "User")
+        OldRecipe = apps.get_model("core", "Recipe")
+        OldTag = apps.get_model("core", "Tag")
+        user = User.objects.create(email="user@example.com")
+        other = User.objects.create(email="other@example.com")
+        vegan, vegan_lower, vegan_upper = (
+            OldTag.objects.create(user=user, name=name)
+            for name in ["Vegan", "vegan", "VEGAN"]
+        )
+        OldTag.objects.create(user=other, name="vegan")
+        both, upper = (
+            OldRecipe.objects.create(
+                user=user, title=title, time_minutes=5, price="1.00"
+            )
+            for title in ["Both", "Upper"]
+        )
+        both.tags.add(vegan, vegan_lower)
+        upper.tags.add(vegan_upper)
+
+        self.migrate(self.migrate_to)
+
+        tag = Tag.objects.get(user_id=user.id)
+        self.assertEqual((tag.id, tag.name, tag.recipe_count), (vegan.id, "Vegan", 2))
+        self.assertEqual(list(Recipe.objects.get(id=both.id).tags.all()), [tag])
+        self.assertEqual(list(Recipe.objects.get(id=upper.id).tags.all()), [tag])
+        self.assertEqual(Tag.objects.filter(user_id=other.id).count(), 1)
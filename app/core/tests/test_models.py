@@ -1,7 +1,9 @@
 from decimal import Decimal
+from unittest.mock import patch
 
 from core import models
 from django.contrib.auth import get_user_model
+from django.db import IntegrityError, transaction
 from django.test import TestCase
 
 
@@ -68,3 +70,101 @@ class TestModels(TestCase):
         tag = models.Tag.objects.create(user=user, name="name 1")
 
         self.assertEqual(str(tag), tag.name)
+
+    def test_get_or_create_many_tags(self):
+        """Test resolving tags by name creates only the missing ones"""
+        user = create_user()
+        existing = models.Tag.objects.create(user=user, name="Vegan")
+
+        tags = models.Tag.objects.get_or_create_many(user, ["Vegan", "Dinner"])
+
+        self.assertEqual(list(tags), ["Vegan", "Dinner"])
+        self.assertEqual(tags["Vegan"], existing)
+        self.assertIsNotNone(tags["Dinner"].pk)
+        self.assertEqual(models.Tag.objects.filter(user=user).count(), 2)
+
+    def test_tag_names_unique_per_user_ignoring_case(self):
+        """Test a user can't have two tags whose names only differ in case"""
+        user = create_user()
+        models.Tag.objects.create(user=user, name="Vegan")
+        other = get_user_model().objects.create_user("other@example.com", "pass")
+        models.Tag.objects.create(user=other, name="vegan")
+
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            models.Tag.objects.create(user=user, name="VEGAN")
+
+    def test_get_or_create_many_tags_ignores_case(self):
+        """Test names are matched to existing tags case-insensitively"""
+        user = create_user()
+        existing = models.Tag.objects.create(user=user, name="Vegan")
+
+        tags = models.Tag.objects.get_or_create_many(
+            user, ["vegan", "Quick", "QUICK"]
+        )
+
+        self.assertEqual(tags["vegan"], existing)
+        self.assertEqual(tags["Quick"], tags["QUICK"])
+        self.assertEqual(tags["Quick"].name, "Quick")
+        self.assertEqual(models.Tag.objects.filter(user=user).count(), 2)
+
+    def test_get_or_create_many_tags_race(self):
+        """Test a tag created by a concurrent request is picked up, not duplicated"""
+        user = create_user()
+        lookup = models.TagManager._get_by_lower_name
+
+        def racing_lookup(manager, user, names):
+            # The first lookup misses a tag another request inserts just after
+            if not models.Tag.objects.filter(name="Dinner").exists():
+                models.Tag.objects.create(user=user, name="Dinner")
+                return {}
+            return lookup(manager, user, names)
+
+        with patch.object(models.TagManager, "_get_by_lower_name", racing_lookup):
+            tags = models.Tag.objects.get_or_create_many(user, ["dinner"])
+
+        self.assertEqual(tags["dinner"].name, "Dinner")
+        self.assertEqual(models.Tag.objects.filter(user=user).count(), 1)
+
+    def test_tag_recipe_counts(self):
+        """Test tag recipe counts follow links made and removed via the ORM"""
+        user = create_user()
+        recipes = [
+            models.Recipe.objects.create(
+                user=user, title=f"Recipe {i}", time_minutes=5, price=Decimal("1")
+            )
+            for i in range(3)
+        ]
+        vegan = models.Tag.objects.create(user=user, name="Vegan")
+        quick = models.Tag.objects.create(user=user, name="Quick")
+
+        def counts():
+            return dict(models.Tag.objects.values_list("name", "recipe_count"))
+
+        recipes[0].tags.add(vegan, quick)
+        vegan.recipe_set.add(recipes[1], recipes[2])
+        self.assertEqual(counts(), {"Vegan": 3, "Quick": 1})
+
+        recipes[0].tags.remove(vegan, vegan)
+        vegan.recipe_set.remove(recipes[0], recipes[1])
+        self.assertEqual(counts(), {"Vegan": 1, "Quick": 1})
+
+        recipes[0].tags.clear()
+        recipes[2].delete()
+        self.assertEqual(counts(), {"Vegan": 0, "Quick": 0})
+
+    def test_queryset_delete_recipe_counts(self):
+        """Test any queryset delete takes recipes off their tags' counts"""
+        user = create_user()
+        tag = models.Tag.objects.create(user=user, name="Vegan")
+        for i in range(3):
+            recipe = models.Recipe.objects.create(
+                user=user, title=f"Recipe {i}", time_minutes=5, price=Decimal("1")
+            )
+            recipe.tags.add(tag)
+
+        models.Recipe.objects.filter(title__in=["Recipe 0", "Recipe 1"]).delete()
+
+        tag.refresh_from_db()
+        self.assertEqual(tag.recipe_count, 1)
+        user.delete()
+        self.assertFalse(models.Tag.objects.exists())
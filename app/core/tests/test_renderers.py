@@ -0,0 +1,107 @@
+import io
+from decimal import Decimal
+from unittest import skipUnless
+
+from core.parsers import ORJSONParser
+from core.renderers import MessagePackRenderer, ORJSONRenderer, msgpack
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.exceptions import ParseError
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+
+RECIPES_LIST_URL = reverse("recipe:recipe-list")
+
+PAYLOAD = {
+    "results": [
+        {
+            "id": 1,
+            "title": "Crème brûlée",
+            "price": "5.50",
+            "tags": [{"id": 2, "name": "Dessert"}],
+        }
+    ],
+    "next": None,
+}
+
+
+class RendererTests(TestCase):
+    """Tests for the orjson and MessagePack renderers and parser"""
+
+    def test_orjson_renderer_matches_json_renderer(self):
+        """Test orjson renders the same bytes as DRF's JSONRenderer"""
+        self.assertEqual(
+            ORJSONRenderer().render(PAYLOAD), JSONRenderer().render(PAYLOAD)
+        )
+
+    def test_orjson_renderer_encodes_decimals(self):
+        """Test types orjson doesn't know are encoded like DRF does"""
+        data = {"price": Decimal("3.50")}
+
+        self.assertEqual(ORJSONRenderer().render(data), JSONRenderer().render(data))
+
+    def test_orjson_renderer_indent(self):
+        """Test an indent in the Accept header is still honoured"""
+        media_type = "application/json; indent=4"
+
+        self.assertEqual(
+            ORJSONRenderer().render(PAYLOAD, media_type),
+            JSONRenderer().render(PAYLOAD, media_type),
+        )
+
+    def test_orjson_parser(self):
+        """Test the parser reads JSON and rejects malformed bodies"""
+        parser = ORJSONParser()
+
+        self.assertEqual(parser.parse(io.BytesIO(b'{"a": [1, "b"]}')), {"a": [1, "b"]})
+        with self.assertRaises(ParseError):
+            parser.parse(io.BytesIO(b'{"a": '))
+
+    @skipUnless(msgpack, "msgpack is not installed")
+    def test_msgpack_renderer(self):
+        """Test MessagePack output round-trips to the same data"""
+        data = dict(PAYLOAD, price=Decimal("3.50"))
+
+        content = MessagePackRenderer().render(data)
+
+        self.assertEqual(msgpack.unpackb(content), dict(PAYLOAD, price=3.5))
+
+
+class NegotiationTests(TestCase):
+    """Tests for choosing the renderer through the Accept header"""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            email="user@example.com", password="password123"
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_json_by_default(self):
+        """Test JSON is returned when any media type is accepted"""
+        res = self.client.get(RECIPES_LIST_URL, HTTP_ACCEPT="*/*")
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res["Content-Type"], "application/json")
+
+    @skipUnless(msgpack, "msgpack is not installed")
+    def test_msgpack_accepted(self):
+        """Test MessagePack is returned to clients that ask for it"""
+        res = self.client.get(RECIPES_LIST_URL, HTTP_ACCEPT="application/msgpack")
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res["Content-Type"], "application/msgpack")
+        self.assertEqual(msgpack.unpackb(res.content)["results"], [])
+
+    def test_json_request_body(self):
+        """Test JSON request bodies go through the orjson parser"""
+        res = self.client.post(
+            reverse("recipe:recipe-list"),
+            '{"title": "Soup", "time_minutes": 10, "price": "2.00"}',
+            content_type="application/json",
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(res.json()["title"], "Soup")
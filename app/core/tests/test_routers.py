@@ -0,0 +1,150 @@
+from decimal import Decimal
+from unittest import skipUnless
+
+from asgiref.sync import iscoroutinefunction
+from core.middleware import ReplicaRoutingMiddleware
+from core.models import Recipe
+from core.routers import ReplicaRouter, replica_reads
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.core.exceptions import ImproperlyConfigured
+from django.http import HttpResponse
+from django.test import AsyncClient, SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+RECIPES_LIST_URL = reverse("recipe:recipe-list")
+RECIPES_EXPORT_URL = reverse("recipe:recipe-export")
+ASYNC_RECIPES_URL = reverse("recipe:async-recipe-list")
+
+
+class ReplicaRouterTests(SimpleTestCase):
+    """Tests for the database router"""
+
+    def test_reads_default_to_primary(self):
+        """Test reads outside replica_reads() and all writes use the primary"""
+        router = ReplicaRouter()
+
+        self.assertEqual(router.db_for_read(Recipe), "default")
+        with replica_reads():
+            self.assertEqual(router.db_for_write(Recipe), "default")
+            with replica_reads(False):
+                self.assertEqual(router.db_for_read(Recipe), "default")
+
+    def test_replica_reads(self):
+        """Test reads use the replica inside replica_reads() when configured"""
+        with replica_reads():
+            db = ReplicaRouter().db_for_read(Recipe)
+
+        expected = "replica" if "replica" in settings.DATABASES else "default"
+        self.assertEqual(db, expected)
+
+
+@skipUnless("replica" in settings.DATABASES, "needs a separate replica database")
+@override_settings(REPLICA_ROUTING=True)
+class ReplicaRoutingTests(TestCase):
+    """
+    Test request routing against two databases. Users and tokens exist on
+    both, recipes only on the primary, so reads show which one answered.
+    """
+
+    databases = "__all__"
+
+    def setUp(self):
+        caches[settings.REPLICA_PIN_CACHE_ALIAS].clear()
+        self.client = self.create_client("user@example.com")
+
+    def create_client(self, email):
+        user = get_user_model().objects.create_user(email=email, password="test123")
+        token = Token.objects.create(user=user)
+        user.save(using="replica")
+        token.save(using="replica")
+        Recipe.objects.create(
+            user=user, title="Soup", time_minutes=5, price=Decimal("1.00")
+        )
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f"Token {token.key}")
+        return client
+
+    def list_titles(self, client):
+        res = client.get(RECIPES_LIST_URL)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        return [recipe["title"] for recipe in res.data["results"]]
+
+    def test_safe_requests_read_replica(self):
+        """Test GET requests read from the replica"""
+        self.assertEqual(self.list_titles(self.client), [])
+
+        res = self.client.get(RECIPES_EXPORT_URL)
+        self.assertEqual(b"".join(res.streaming_content), b"")
+
+    def test_reads_stick_to_primary_after_write(self):
+        """Test a client reads from the primary right after it wrote"""
+        other_client = self.create_client("other@example.com")
+        payload = {"title": "Stew", "time_minutes": 30, "price": "4.00"}
+
+        res = self.client.post(RECIPES_LIST_URL, payload)
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(self.list_titles(self.client), ["Stew", "Soup"])
+        self.assertEqual(self.list_titles(other_client), [])
+
+    @override_settings(REPLICA_STICKY_SECONDS=0)
+    def test_sticky_window_expires(self):
+        """Test reads go back to the replica once the window has passed"""
+        payload = {"title": "Stew", "time_minutes": 30, "price": "4.00"}
+
+        self.client.post(RECIPES_LIST_URL, payload)
+
+        self.assertEqual(self.list_titles(self.client), [])
+
+    @override_settings(READ_CACHE=True)
+    def test_read_cache_misses_read_primary(self):
+        """Test the read cache never stores what the replica returned"""
+        recipe = Recipe.objects.get(user__email="user@example.com")
+        url = reverse("recipe:recipe-detail", args=[recipe.id])
+
+        for _ in range(2):
+            res = self.client.get(url)
+            self.assertEqual(res.status_code, status.HTTP_200_OK)
+            self.assertEqual(res.data["title"], "Soup")
+
+    async def test_async_requests_routed(self):
+        """Test async views read the replica until the client writes"""
+        client = AsyncClient()
+        token = await Token.objects.aget(user__email="user@example.com")
+        headers = {"Authorization": f"Token {token.key}"}
+
+        res = await client.get(ASYNC_RECIPES_URL, headers=headers)
+        self.assertEqual(res.json()["results"], [])
+
+        await client.post(
+            RECIPES_LIST_URL,
+            {"title": "Stew", "time_minutes": 30, "price": "4.00"},
+            headers=headers,
+        )
+        res = await client.get(ASYNC_RECIPES_URL, headers=headers)
+        titles = [recipe["title"] for recipe in res.json()["results"]]
+        self.assertEqual(titles, ["Stew", "Soup"])
+
+    def test_sync_and_async_capable(self):
+        """Test the middleware takes the mode of the rest of the chain"""
+
+        async def get_async_response(request):
+            return HttpResponse()
+
+        self.assertFalse(iscoroutinefunction(ReplicaRoutingMiddleware(HttpResponse)))
+        self.assertTrue(
+            iscoroutinefunction(ReplicaRoutingMiddleware(get_async_response))
+        )
+
+    @override_settings(
+        CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}
+    )
+    def test_requires_shared_pin_cache(self):
+        """Test routing refuses to start when pins would be per worker"""
+        with self.assertRaises(ImproperlyConfigured):
+            ReplicaRoutingMiddleware(HttpResponse)
@@ -0,0 +1,102 @@
+import gzip
+import io
+import json
+import os
+import tempfile
+from unittest.mock import patch
+
+from core.schema import CachedSchemaView
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework import status
+
+SCHEMA_URL = reverse("api-schema")
+
+
+class CachedSchemaViewTests(TestCase):
+    """Tests for serving the precomputed OpenAPI schema"""
+
+    def setUp(self):
+        CachedSchemaView.clear()
+        self.addCleanup(CachedSchemaView.clear)
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmpdir.cleanup)
+        self.schema_file = os.path.join(self.tmpdir.name, "openapi.json")
+
+    def test_matches_generated_schema(self):
+        """Test the cached schema is the one generated per request"""
+        for params in ({}, {"format": "json"}):
+            res = self.client.get(SCHEMA_URL, params)
+            with override_settings(SCHEMA_CACHE=False):
+                generated = self.client.get(SCHEMA_URL, params)
+
+            self.assertEqual(res.status_code, status.HTTP_200_OK)
+            self.assertEqual(res["Content-Type"], generated["Content-Type"])
+            self.assertEqual(res.content, generated.content)
+
+    def test_generated_once(self):
+        """Test the schema is generated by the first request only"""
+        with patch.object(
+            CachedSchemaView, "build_schema", autospec=True, return_value={}
+        ) as build_schema:
+            self.client.get(SCHEMA_URL)
+            self.client.get(SCHEMA_URL, {"format": "json"})
+
+        build_schema.assert_called_once()
+
+    def test_gzip_and_etag(self):
+        """Test gzip is served to clients accepting it, each with an ETag"""
+        plain = self.client.get(SCHEMA_URL)
+        res = self.client.get(SCHEMA_URL, HTTP_ACCEPT_ENCODING="gzip, br")
+
+        self.assertEqual(res["Content-Encoding"], "gzip")
+        self.assertEqual(gzip.decompress(res.content), plain.content)
+        self.assertNotEqual(res["ETag"], plain["ETag"])
+        self.assertIn("Accept-Encoding", res["Vary"])
+
+        res = self.client.get(
+            SCHEMA_URL, HTTP_ACCEPT_ENCODING="gzip", HTTP_IF_NONE_MATCH=res["ETag"]
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(res.content, b"")
+
+    def test_schema_file(self):
+        """Test a schema file built for this code version is served"""
+        with open(self.schema_file, "w") as file:
+            json.dump(
+                {
+                    "app_version": "abc123",
+                    "api_version": "v1",
+                    "schema": {"openapi": "3.0.3", "info": {"title": "Built"}},
+                },
+                file,
+            )
+
+        with override_settings(APP_VERSION="abc123", SCHEMA_FILE=self.schema_file):
+            res = self.client.get(SCHEMA_URL, {"format": "json"})
+        self.assertEqual(res.json()["info"], {"title": "Built"})
+
+        CachedSchemaView.clear()
+        with override_settings(APP_VERSION="def456", SCHEMA_FILE=self.schema_file):
+            res = self.client.get(SCHEMA_URL, {"format": "json"})
+        self.assertIn("/api/recipe/recipes/", res.json()["paths"])
+
+    def test_build_schema_command(self):
+        """Test build_schema writes the schema for the code version"""
+        with override_settings(APP_VERSION="abc123", SCHEMA_FILE=self.schema_file):
+            call_command("build_schema", stdout=io.StringIO())
+            res = self.client.get(SCHEMA_URL, {"format": "json"})
+
+        with open(self.schema_file) as file:
+            data = json.load(file)
+        self.assertEqual(data["app_version"], "abc123")
+        self.assertEqual(data["schema"], res.json())
+
+    @override_settings(APP_VERSION="")
+    def test_build_schema_needs_version(self):
+        """Test build_schema refuses to write a schema without a version"""
+        with self.assertRaisesMessage(CommandError, "APP_VERSION"):
+            call_command("build_schema", stdout=io.StringIO())
@@ -0,0 +1,213 @@
+from unittest.mock import patch
+
+from core.throttling import (
+    CacheBucketStore,
+    LocalBucketStore,
+    get_throttle_store,
+    parse_rate,
+)
+from django.contrib.auth import get_user_model
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+CREATE_USER_URL = reverse("user:create")
+TOKEN_URL = reverse("user:token")
+RECIPES_URL = reverse("recipe:recipe-list")
+
+RATES = {
+    "login": "4/min",
+    "login-account": "2/min",
+    "signup": "2/min",
+    "write": "2/min",
+}
+
+
+class BucketStoreTests(SimpleTestCase):
+    """Tests for the token bucket stores"""
+
+    def test_parse_rate(self):
+        """Test rates are parsed into a bucket size and period"""
+        self.assertEqual(parse_rate("10/min"), (10, 60))
+        self.assertEqual(parse_rate("5/s"), (5, 1))
+        self.assertEqual(parse_rate("100/day"), (100, 86400))
+
+    @patch("core.throttling.time.monotonic")
+    def test_bucket_empties_and_refills(self, patched_monotonic):
+        """Test a bucket allows a burst, then one request per interval"""
+        patched_monotonic.return_value = 1000
+        store = LocalBucketStore(max_size=10)
+
+        self.assertEqual([store.take("a", 3, 60) for _ in range(3)], [0, 0, 0])
+        self.assertEqual(store.take("a", 3, 60), 20)
+        self.assertEqual(store.take("b", 3, 60), 0)
+
+        patched_monotonic.return_value = 1015
+        self.assertEqual(store.take("a", 3, 60), 5)
+        patched_monotonic.return_value = 1020
+        self.assertEqual(store.take("a", 3, 60), 0)
+        self.assertEqual(store.take("a", 3, 60), 20)
+
+    @patch("core.throttling.time.monotonic")
+    def test_prunes_full_buckets(self, patched_monotonic):
+        """Test buckets that refilled are dropped once the store is full"""
+        patched_monotonic.return_value = 1000
+        store = LocalBucketStore(max_size=4)
+        for key in "abcd":
+            store.take(key, 1, 60)
+
+        patched_monotonic.return_value = 1061
+        store.take("e", 1, 60)
+
+        self.assertEqual(list(store._buckets), ["e"])
+
+    @patch("core.throttling.time.monotonic")
+    def test_prune_caps_live_buckets(self, patched_monotonic):
+        """Test the most recent half is kept when every bucket is live"""
+        patched_monotonic.return_value = 1000
+        store = LocalBucketStore(max_size=4)
+        for key in "abcde":
+            store.take(key, 1, 60)
+
+        self.assertEqual(list(store._buckets), ["d", "e"])
+
+    @override_settings(
+        CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}
+    )
+    def test_cache_store(self):
+        """Test buckets can be shared through a cache backend"""
+        store = CacheBucketStore("default")
+        store.clear()
+
+        self.assertEqual(store.take("a", 2, 60), 0)
+        self.assertEqual(store.take("a", 2, 60), 0)
+        self.assertGreater(store.take("a", 2, 60), 29)
+        self.assertEqual(CacheBucketStore("default").take("b", 2, 60), 0)
+
+
+@override_settings(THROTTLE=True, THROTTLE_RATES=RATES)
+class ThrottleApiTests(TestCase):
+    """Test throttling the login, signup and write endpoints"""
+
+    def setUp(self):
+        get_throttle_store().clear()
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            email="user@example.com", password="password123"
+        )
+
+    def test_login_throttled_per_account(self):
+        """Test failed logins to one account are throttled with Retry-After"""
+        payload = {"email": "user@example.com", "password": "wrong"}
+        for _ in range(2):
+            res = self.client.post(TOKEN_URL, payload)
+            self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+        res = self.client.post(TOKEN_URL, payload)
+
+        self.assertEqual(res.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertEqual(res["Retry-After"], "30")
+        res = self.client.post(TOKEN_URL, {**payload, "email": "other@example.com"})
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_login_throttled_per_ip(self):
+        """Test logins from one IP are throttled across accounts"""
+        for number in range(4):
+            res = self.client.post(
+                TOKEN_URL, {"email": f"user{number}@example.com", "password": "x"}
+            )
+            self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+        res = self.client.post(
+            TOKEN_URL, {"email": "user@example.com", "password": "password123"}
+        )
+        self.assertEqual(res.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+
+        res = self.client.post(
+            TOKEN_URL,
+            {"email": "user@example.com", "password": "password123"},
+            REMOTE_ADDR="10.0.0.2",
+        )
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+    def test_login_body_not_an_object(self):
+        """Test login bodies that aren't objects are rejected, then throttled"""
+        for body in ([], "x"):
+            res = self.client.post(TOKEN_URL, body, format="json")
+            self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+        res = self.client.post(TOKEN_URL, [], format="json")
+
+        self.assertEqual(res.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+
+    def test_spoofed_forwarded_for_throttled(self):
+        """Test a new X-Forwarded-For per request doesn't get a new bucket"""
+        statuses = [
+            self.client.post(
+                CREATE_USER_URL,
+                {
+                    "email": f"new{number}@example.com",
+                    "password": "password123",
+                    "name": "New",
+                },
+                HTTP_X_FORWARDED_FOR=f"10.0.0.{number}",
+            ).status_code
+            for number in range(4)
+        ]
+
+        self.assertEqual(statuses, [201, 201, 429, 429])
+
+    def test_signup_throttled_per_ip(self):
+        """Test signups from one IP are throttled"""
+        for number in range(2):
+            res = self.client.post(
+                CREATE_USER_URL,
+                {
+                    "email": f"new{number}@example.com",
+                    "password": "password123",
+                    "name": "New",
+                },
+            )
+            self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+
+        res = self.client.post(
+            CREATE_USER_URL,
+            {"email": "new2@example.com", "password": "password123", "name": "New"},
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertFalse(
+            get_user_model().objects.filter(email="new2@example.com").exists()
+        )
+
+    def test_writes_throttled_per_user(self):
+        """Test writes are throttled per user while reads are not"""
+        other = get_user_model().objects.create_user(email="other@example.com")
+        self.client.force_authenticate(self.user)
+        payload = {"title": "Soup", "time_minutes": 10, "price": "5.00"}
+        for _ in range(2):
+            res = self.client.post(RECIPES_URL, payload, format="json")
+            self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+
+        res = self.client.post(RECIPES_URL, payload, format="json")
+        self.assertEqual(res.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertEqual(self.client.get(RECIPES_URL).status_code, status.HTTP_200_OK)
+
+        self.client.force_authenticate(other)
+        res = self.client.post(RECIPES_URL, payload, format="json")
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+
+    @override_settings(THROTTLE=False)
+    def test_disabled(self):
+        """Test nothing is throttled with THROTTLE off"""
+        for number in range(3):
+            res = self.client.post(
+                CREATE_USER_URL,
+                {
+                    "email": f"new{number}@example.com",
+                    "password": "password123",
+                    "name": "New",
+                },
+            )
+            self.assertEqual(res.status_code, status.HTTP_201_CREATED)
@@ -0,0 +1,136 @@
+from decimal import Decimal
+
+from asgiref.sync import iscoroutinefunction
+from core.middleware import ServerTimingMiddleware
+from core.models import Recipe
+from core.timing import RequestTiming, timed
+from django.contrib.auth import get_user_model
+from django.http import HttpResponse
+from django.test import AsyncClient, TestCase, override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+RECIPES_LIST_URL = reverse("recipe:recipe-list")
+ASYNC_RECIPES_URL = reverse("recipe:async-recipe-list")
+
+
+def metric_names(header):
+    return [metric.split(";")[0] for metric in header.split(", ")]
+
+
+class RequestTimingTests(TestCase):
+    """Tests for collecting request timings"""
+
+    def test_timed_outside_request(self):
+        """Test timed blocks outside a timed request are not recorded"""
+        with timed("serialize"):
+            pass
+
+        timing = RequestTiming()
+        with timing.activate():
+            with timed("serialize"):
+                pass
+            with timed("serialize"):
+                pass
+
+        self.assertEqual(list(timing.durations), ["serialize"])
+
+    def test_metrics(self):
+        """Test metrics are reported in milliseconds with the query count"""
+        timing = RequestTiming()
+        timing.query_count = 2
+        timing.query_time = 0.004
+        timing.add("render", 0.001)
+
+        self.assertEqual(
+            timing.metrics(0.01),
+            [("total", 10, None), ("sql", 4, "2 queries"), ("render", 1, None)],
+        )
+
+
+@override_settings(SERVER_TIMING=True)
+class ServerTimingMiddlewareTests(TestCase):
+    """Tests for the Server-Timing middleware"""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            email="user@example.com", password="password123"
+        )
+        Recipe.objects.create(
+            user=self.user, title="Soup", time_minutes=10, price=Decimal("2.00")
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_server_timing_header(self):
+        """Test responses report total, SQL, serialize and render durations"""
+        res = self.client.get(RECIPES_LIST_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        header = res["Server-Timing"]
+        self.assertEqual(
+            metric_names(header), ["total", "sql", "serialize", "render"]
+        )
+        self.assertIn('desc="3 queries"', header)
+
+    async def test_async_request(self):
+        """Test async views are timed without adapting the middleware"""
+        token = await Token.objects.acreate(user=self.user)
+        res = await AsyncClient().get(
+            ASYNC_RECIPES_URL, headers={"Authorization": f"Token {token.key}"}
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(metric_names(res["Server-Timing"])[:2], ["total", "sql"])
+        self.assertNotIn('desc="0 queries"', res["Server-Timing"])
+
+    def test_sync_and_async_capable(self):
+        """Test the middleware takes the mode of the rest of the chain"""
+
+        async def get_async_response(request):
+            return HttpResponse()
+
+        self.assertFalse(iscoroutinefunction(ServerTimingMiddleware(HttpResponse)))
+        self.assertTrue(
+            iscoroutinefunction(ServerTimingMiddleware(get_async_response))
+        )
+
+    @override_settings(SERVER_TIMING_SAMPLE_RATE=0)
+    def test_unsampled_request(self):
+        """Test requests left out of the sample are not timed"""
+        res = self.client.get(RECIPES_LIST_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertNotIn("Server-Timing", res)
+
+    @override_settings(SERVER_TIMING=False)
+    def test_disabled(self):
+        """Test the middleware is left out when SERVER_TIMING is off"""
+        client = APIClient()
+        client.force_authenticate(self.user)
+
+        res = client.get(RECIPES_LIST_URL)
+
+        self.assertNotIn("Server-Timing", res)
+
+    def test_log_line(self):
+        """Test each timed request is logged with its metrics"""
+        with self.assertLogs("core.timing", "INFO") as logs:
+            self.client.get(RECIPES_LIST_URL)
+
+        [record] = logs.records
+        self.assertEqual(record.levelname, "INFO")
+        self.assertIn(f"path={RECIPES_LIST_URL}", record.getMessage())
+        self.assertIn("queries=3", record.getMessage())
+
+    @override_settings(SERVER_TIMING_SLOW_MS=0)
+    def test_slow_request_logs_statements(self):
+        """Test slow requests log their SQL statements as a warning"""
+        with self.assertLogs("core.timing", "WARNING") as logs:
+            self.client.get(RECIPES_LIST_URL)
+
+        [message] = logs.output
+        self.assertIn("slow request", message)
+        self.assertIn('FROM "core_recipe"', message)
@@ -0,0 +1,189 @@
+"""
+Token bucket throttling of the endpoints that hash passwords or write
+"""
+import math
+import time
+from collections.abc import Mapping
+from functools import lru_cache
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework.throttling import BaseThrottle
+
+PERIODS = {"s": 1, "m": 60, "h": 3600, "d": 86400}
+
+
+@lru_cache
+def parse_rate(rate):
+    """Return the bucket size and refill period in seconds of "10/min" etc."""
+    count, period = rate.split("/")
+    return int(count), PERIODS[period[0]]
+
+
+def spend(tat, now, capacity, period):
+    """
+    Take a token from a bucket holding capacity tokens refilled over
+    period, stored as the time it will be full again (GCRA). Return the
+    new time and how long to wait if the bucket was empty, else 0.
+    """
+    tat = max(tat, now) + period / capacity
+    return tat, max(tat - now - period, 0)
+
+
+class LocalBucketStore:
+    """
+    Buckets of this process in a plain dict. Each request does one dict
+    read and one write and never waits on a lock; concurrent requests for
+    the same bucket may race and let an extra request through, which is
+    fine for a throttle.
+    """
+
+    def __init__(self, max_size):
+        self.max_size = max_size
+        self._buckets = {}
+
+    def take(self, key, capacity, period):
+        now = time.monotonic()
+        tat, wait = spend(self._buckets.get(key, now), now, capacity, period)
+        if not wait:
+            self._buckets[key] = tat
+            if len(self._buckets) > self.max_size:
+                self.prune(now)
+        return wait
+
+    def prune(self, now):
+        # Full buckets are the same as missing ones. If that isn't enough,
+        # the least recently created buckets are refilled early, keeping
+        # at most half so pruning stays rare.
+        live = [(key, tat) for key, tat in list(self._buckets.items()) if tat > now]
+        self._buckets = dict(live[-(self.max_size // 2):])
+
+    def clear(self):
+        self._buckets = {}
+
+
+class CacheBucketStore:
+    """Buckets stored in one of the CACHES backends, shared by workers"""
+
+    key_prefix = "throttle:"
+
+    def __init__(self, alias):
+        self.cache = caches[alias]
+
+    def take(self, key, capacity, period):
+        key = self.key_prefix + key
+        now = time.time()
+        tat, wait = spend(self.cache.get(key, now), now, capacity, period)
+        if not wait:
+            self.cache.set(key, tat, math.ceil(tat - now))
+        return wait
+
+    def clear(self):
+        self.cache.clear()
+
+
+_throttle_store = None
+
+
+def get_throttle_store():
+    """Return the bucket store configured by the THROTTLE_* settings"""
+    global _throttle_store
+    if _throttle_store is None:
+        if settings.THROTTLE_CACHE_ALIAS:
+            _throttle_store = CacheBucketStore(settings.THROTTLE_CACHE_ALIAS)
+        else:
+            _throttle_store = LocalBucketStore(settings.THROTTLE_MAX_SIZE)
+    return _throttle_store
+
+
+@receiver(setting_changed)
+def reset_throttle_store(setting, **kwargs):
+    global _throttle_store
+    if setting.startswith("THROTTLE"):
+        _throttle_store = None
+
+
+class TokenBucketThrottle(BaseThrottle):
+    """
+    Throttle spending a token from the bucket of get_ident_key() in scope,
+    sized by THROTTLE_RATES[scope]. Throttled requests get 429 with a
+    Retry-After header from wait().
+    """
+
+    scope = None
+
+    def get_ident_key(self, request, view):
+        """Return who the bucket belongs to, or None to not throttle"""
+        raise NotImplementedError(".get_ident_key() must be overridden")
+
+    def allow_request(self, request, view):
+        self.wait_seconds = None
+        if not settings.THROTTLE:
+            return True
+        ident = self.get_ident_key(request, view)
+        if ident is None:
+            return True
+        capacity, period = parse_rate(settings.THROTTLE_RATES[self.scope])
+        self.wait_seconds = get_throttle_store().take(
+            f"{self.scope}:{ident}", capacity, period
+        )
+        return not self.wait_seconds
+
+    def wait(self):
+        return self.wait_seconds
+
+
+class IPRateThrottle(TokenBucketThrottle):
+    """One bucket per client IP"""
+
+    def get_ident_key(self, request, view):
+        return self.get_ident(request)
+
+
+class UserRateThrottle(TokenBucketThrottle):
+    """One bucket per user, or per client IP for anonymous requests"""
+
+    def get_ident_key(self, request, view):
+        if request.user and request.user.is_authenticated:
+            return f"user-{request.user.pk}"
+        return f"ip-{self.get_ident(request)}"
+
+
+class LoginRateThrottle(IPRateThrottle):
+    scope = "login"
+
+
+class LoginAccountRateThrottle(TokenBucketThrottle):
+    """
+    One bucket per email logged in to, so guessing one account's password
+    from many IPs is throttled too
+    """
+
+    scope = "login-account"
+
+    def get_ident_key(self, request, view):
+        # Bodies that aren't an object are rejected by the view; throttle
+        # them by IP so they can't dodge the account bucket for free
+        data = request.data
+        email = data.get("email") if isinstance(data, Mapping) else None
+        if not isinstance(email, str) or not email:
+            return f"ip-{self.get_ident(request)}"
+        return f"email-{email.strip().lower()}"
+
+
+class SignupRateThrottle(IPRateThrottle):
+    scope = "signup"
+
+
+class WriteRateThrottle(UserRateThrottle):
+    """Throttle unsafe methods only, leaving reads alone"""
+
+    scope = "write"
+
+    def get_ident_key(self, request, view):
+        if request.method in SAFE_METHODS:
+            return None
+        return super().get_ident_key(request, view)
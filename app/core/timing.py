@@ -0,0 +1,113 @@
+"""
+Per-request timing collected for the Server-Timing header
+"""
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+from rest_framework import serializers
+
+MAX_STATEMENTS = 100
+
+_current = ContextVar("request_timing", default=None)
+
+
+class RequestTiming:
+    """Durations of the parts of one request, in seconds"""
+
+    def __init__(self):
+        self.durations = {}
+        self.query_count = 0
+        self.query_time = 0.0
+        self.statements = []
+        self.descriptions = {}
+
+    def add(self, name, duration):
+        self.durations[name] = self.durations.get(name, 0.0) + duration
+
+    def record_query(self, execute, sql, params, many, context):
+        """Time a query run through record_query()"""
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duration = time.perf_counter() - start
+            self.query_count += 1
+            self.query_time += duration
+            if len(self.statements) < MAX_STATEMENTS:
+                self.statements.append((sql, duration))
+
+    def metrics(self, total):
+        """Return (name, milliseconds, description) for each metric"""
+        metrics = [
+            ("total", total, None),
+            ("sql", self.query_time, f"{self.query_count} queries"),
+        ]
+        metrics.extend(
+            (name, duration, self.descriptions.get(name))
+            for name, duration in self.durations.items()
+        )
+        return [(name, duration * 1000, desc) for name, duration, desc in metrics]
+
+    @contextmanager
+    def activate(self):
+        token = _current.set(self)
+        try:
+            yield self
+        finally:
+            _current.reset(token)
+
+
+def record_query(execute, sql, params, many, context):
+    """
+    Execute wrapper of every connection, timing the queries of the timed
+    request. Async views run their queries on connections of other threads
+    with a copy of the context, so this finds their timing too.
+    """
+    timing = _current.get()
+    if timing is None:
+        return execute(sql, params, many, context)
+    return timing.record_query(execute, sql, params, many, context)
+
+
+@receiver(connection_created)
+def install_query_timer(connection, **kwargs):
+    # Fired again when a connection reconnects
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+@contextmanager
+def timed(name):
+    """Add the time spent in the enclosed block to the current request"""
+    timing = _current.get()
+    if timing is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timing.add(name, time.perf_counter() - start)
+
+
+def describe(name, text):
+    """Describe a metric of the current request, such as a cache hit"""
+    timing = _current.get()
+    if timing is not None:
+        timing.descriptions[name] = text
+
+
+class TimedSerializerMixin:
+    """Count building a serializer's data as the serialize metric"""
+
+    @property
+    def data(self):
+        with timed("serialize"):
+            return super().data
+
+
+class TimedListSerializer(TimedSerializerMixin, serializers.ListSerializer):
+    pass
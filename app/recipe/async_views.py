@@ -0,0 +1,148 @@
+"""
+Async versions of the recipe and tag read views and the change event
+stream, served natively under ASGI
+"""
+import asyncio
+from functools import wraps
+
+import orjson
+from core.authentication import CachedTokenAuthentication
+from core.events import OVERFLOW, get_broker
+from core.models import Recipe, Tag
+from core.renderers import ORJSONRenderer
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseBase, StreamingHttpResponse
+from django.views.decorators.http import require_GET
+from rest_framework import exceptions
+from rest_framework.request import Request
+
+from .pagination import RecipeCursorPagination, TagCursorPagination
+from .serializers import aserialize_recipe_rows, recipe_values
+from .views import filter_recipes, get_recipe_fields
+
+renderer = ORJSONRenderer()
+
+
+def json_response(data, status=200, headers=None):
+    return HttpResponse(
+        renderer.render(data),
+        status=status,
+        content_type=renderer.media_type,
+        headers=headers,
+    )
+
+
+def async_api_view(view):
+    """
+    Run an async GET view behind the cached token authentication, handing
+    it a DRF Request and turning API exceptions into JSON errors. Views
+    return data to render as JSON, or a response to send as it is.
+    """
+    authentication = CachedTokenAuthentication()
+
+    @require_GET
+    @wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        try:
+            auth = await authentication.aauthenticate(request)
+            if auth is None:
+                raise exceptions.NotAuthenticated()
+            drf_request = Request(request)
+            drf_request.user, drf_request.auth = auth
+            data = await view(drf_request, *args, **kwargs)
+            if isinstance(data, HttpResponseBase):
+                return data
+            return json_response(data)
+        except exceptions.APIException as exc:
+            headers = {}
+            if isinstance(
+                exc, (exceptions.NotAuthenticated, exceptions.AuthenticationFailed)
+            ):
+                headers["WWW-Authenticate"] = authentication.authenticate_header(
+                    request
+                )
+            data = exc.detail
+            if not isinstance(data, (list, dict)):
+                data = {"detail": data}
+            return json_response(data, status=exc.status_code, headers=headers)
+
+    return wrapper
+
+
+@async_api_view
+async def recipe_list(request):
+    fields = get_recipe_fields(request.query_params)
+    queryset = filter_recipes(
+        Recipe.objects.filter(user=request.user), request.query_params
+    )
+    paginator = RecipeCursorPagination()
+    rows = await paginator.apaginate_queryset(recipe_values(queryset, fields), request)
+    data = await aserialize_recipe_rows(rows, fields)
+    return paginator.get_paginated_response(data).data
+
+
+@async_api_view
+async def recipe_detail(request, pk):
+    fields = get_recipe_fields(request.query_params)
+    queryset = recipe_values(Recipe.objects.filter(user=request.user), fields)
+    try:
+        row = await queryset.aget(pk=pk)
+    except Recipe.DoesNotExist:
+        raise exceptions.NotFound("No Recipe matches the given query.")
+    return (await aserialize_recipe_rows([row], fields))[0]
+
+
+@async_api_view
+async def tag_list(request):
+    paginator = TagCursorPagination()
+    tags = await paginator.apaginate_queryset(
+        Tag.objects.filter(user=request.user).values("id", "name", "recipe_count"),
+        request,
+    )
+    return paginator.get_paginated_response(tags).data
+
+
+def sse(event, data):
+    return b"event: %s\ndata: %s\n\n" % (event.encode(), orjson.dumps(data))
+
+
+class EventStream:
+    """
+    Send a subscription's events, with a comment line as heartbeat when
+    idle. A client that falls behind gets an overflow event and the stream
+    ends; it should catch up through the sync endpoint and reconnect.
+    The response closes the subscription once the client goes away.
+    """
+
+    def __init__(self, subscription):
+        self.subscription = subscription
+
+    def close(self):
+        self.subscription.close()
+
+    async def __aiter__(self):
+        yield b"retry: 5000\n\n"
+        while True:
+            try:
+                event = await asyncio.wait_for(
+                    self.subscription.get(), settings.EVENTS_HEARTBEAT_SECONDS
+                )
+            except asyncio.TimeoutError:
+                yield b": heartbeat\n\n"
+                continue
+            if event is OVERFLOW:
+                yield sse("overflow", {})
+                return
+            data = {key: value for key, value in event.items() if key != "type"}
+            yield sse(event["type"], data)
+
+
+@async_api_view
+async def events(request):
+    """Stream the user's recipe and tag changes as Server-Sent Events"""
+    subscription = get_broker().subscribe(request.user.pk)
+    return StreamingHttpResponse(
+        EventStream(subscription),
+        content_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
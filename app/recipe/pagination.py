@@ -0,0 +1,189 @@
+import json
+
+from django.conf import settings
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Q
+from rest_framework import pagination
+from rest_framework.exceptions import NotFound, ValidationError
+
+
+class CursorPagination(pagination.CursorPagination):
+    """
+    Keyset pagination with an opaque cursor and a capped page size.
+
+    The cursor holds the values of every ordering field of the last item,
+    not just the first one, so orderings ending in a unique field never
+    fall back to an OFFSET past items sharing the leading value.
+
+    DRF's paginate_queryset is split around the one query that reads the
+    page, so async views can read it with async for and share the rest.
+    """
+
+    page_size_query_param = "page_size"
+
+    def __init__(self):
+        self.page_size = settings.PAGE_SIZE
+        self.max_page_size = settings.MAX_PAGE_SIZE
+
+    def paginate_queryset(self, queryset, request, view=None):
+        queryset = self.get_page_queryset(queryset, request, view)
+        if queryset is None:
+            return None
+        return self.set_page(list(queryset))
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        queryset = self.get_page_queryset(queryset, request, view)
+        if queryset is None:
+            return None
+        return self.set_page([item async for item in queryset])
+
+    def get_page_queryset(self, queryset, request, view=None):
+        """Return the query for the requested page plus one more item"""
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        if not self.page_size:
+            return None
+
+        self.base_url = request.build_absolute_uri()
+        self.ordering = self.get_ordering(request, queryset, view)
+
+        self.cursor = self.decode_cursor(request)
+        (
+            self.cursor_offset,
+            self.cursor_reverse,
+            self.cursor_position,
+        ) = self.cursor or (0, False, None)
+
+        if self.cursor_reverse:
+            queryset = queryset.order_by(*pagination._reverse_ordering(self.ordering))
+        else:
+            queryset = queryset.order_by(*self.ordering)
+
+        if self.cursor_position is not None:
+            queryset = queryset.filter(self.get_keyset_filter(queryset))
+
+        # One extra item tells whether there's a following page
+        end = self.cursor_offset + self.page_size + 1
+        return queryset[self.cursor_offset:end]
+
+    def get_keyset_filter(self, queryset):
+        """
+        Return the filter for the items after the cursor position: the
+        leading field past its value, or equal to it and the next field
+        past its value, and so on. The leading field is also bounded on
+        its own so the database can range-scan its index.
+        """
+        try:
+            values = json.loads(self.cursor_position)
+        except ValueError:
+            values = None
+        if not isinstance(values, list) or len(values) != len(self.ordering):
+            raise NotFound(self.invalid_cursor_message)
+
+        fields = []
+        for order, value in zip(self.ordering, values):
+            name = order.lstrip("-")
+            # The cursor comes from the client, so check each value fits
+            # its field before it reaches the query
+            try:
+                value = self.get_field(queryset, name).to_python(value)
+            except (TypeError, ValueError, DjangoValidationError):
+                raise NotFound(self.invalid_cursor_message)
+            if value is None:
+                raise NotFound(self.invalid_cursor_message)
+            # (cursor reversed) XOR (field reversed)
+            lookup = "lt" if self.cursor_reverse != order.startswith("-") else "gt"
+            fields.append((name, lookup, value))
+
+        after = None
+        for name, lookup, value in reversed(fields):
+            past = Q(**{f"{name}__{lookup}": value})
+            after = past if after is None else past | Q(**{name: value}) & after
+        name, lookup, value = fields[0]
+        return Q(**{f"{name}__{lookup}e": value}) & after
+
+    def get_field(self, queryset, name):
+        """Return the model field or annotation ordered by name"""
+        if name in queryset.query.annotations:
+            return queryset.query.annotations[name].output_field
+        return queryset.model._meta.get_field(name)
+
+    def _get_position_from_instance(self, instance, ordering):
+        values = []
+        for order in ordering:
+            name = order.lstrip("-")
+            if isinstance(instance, dict):
+                values.append(instance[name])
+            else:
+                values.append(getattr(instance, name))
+        return json.dumps(values, cls=DjangoJSONEncoder)
+
+    def set_page(self, results):
+        """Work out the page and its cursors from the fetched results"""
+        offset = self.cursor_offset
+        reverse = self.cursor_reverse
+        current_position = self.cursor_position
+        self.page = list(results[: self.page_size])
+
+        if len(results) > len(self.page):
+            has_following_position = True
+            following_position = self._get_position_from_instance(
+                results[-1], self.ordering
+            )
+        else:
+            has_following_position = False
+            following_position = None
+
+        if reverse:
+            self.page = list(reversed(self.page))
+            self.has_next = (current_position is not None) or (offset > 0)
+            self.has_previous = has_following_position
+            if self.has_next:
+                self.next_position = current_position
+            if self.has_previous:
+                self.previous_position = following_position
+        else:
+            self.has_next = has_following_position
+            self.has_previous = (current_position is not None) or (offset > 0)
+            if self.has_next:
+                self.next_position = following_position
+            if self.has_previous:
+                self.previous_position = current_position
+
+        if (self.has_previous or self.has_next) and self.template is not None:
+            self.display_page_controls = True
+
+        return self.page
+
+
+class RecipeCursorPagination(CursorPagination):
+    ordering = "-id"
+
+    def get_ordering(self, request, queryset, view):
+        # Ranked search results page by relevance first. Many results
+        # share a rank, so the cursor carries (rank, id) and ties are
+        # paged by keyset like everything else
+        if "rank" in queryset.query.annotations:
+            return ("-rank", "-id")
+        return super().get_ordering(request, queryset, view)
+
+
+class TagCursorPagination(CursorPagination):
+    ordering = ("-name", "-id")
+    ordering_param = "ordering"
+    orderings = {
+        "-name": ("-name", "-id"),
+        "-recipe_count": ("-recipe_count", "-id"),
+    }
+
+    def get_ordering(self, request, queryset, view):
+        # ?ordering=-recipe_count lists the most used tags first
+        ordering = request.query_params.get(self.ordering_param)
+        if ordering is None:
+            return self.ordering
+        if ordering not in self.orderings:
+            raise ValidationError(
+                {self.ordering_param: [f"Expected one of {', '.join(self.orderings)}"]}
+            )
+        return self.orderings[ordering]
@@ -1,42 +1,175 @@
-from core.models import Recipe, Tag
+from collections import Counter, defaultdict
+from functools import reduce
+from operator import or_
+
+from core.events import publish_change
+from core.models import Recipe, Tag, Tombstone
+from core.read_cache import invalidate_user
+from core.timing import TimedListSerializer, TimedSerializerMixin, timed
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
 from rest_framework import serializers
 
 
-class TagSerializer(serializers.ModelSerializer):
+def set_tags(user, recipe_tags, created=()):
+    """
+    Link recipes to tags by name in one batch, creating the missing tags
+    and writing only the links that changed. recipe_tags maps recipes to
+    tag names; recipes in created are new and have no links yet.
+    """
+    tags = Tag.objects.get_or_create_many(
+        user, [name for names in recipe_tags.values() for name in names]
+    )
+    created = {recipe.pk for recipe in created}
+    RecipeTag = Recipe.tags.through
+    removed = []
+    added = []
+    # The through model is written directly, without m2m_changed, so the
+    # recipe counts are adjusted here
+    counts = Counter()
+    for recipe, names in recipe_tags.items():
+        tag_ids = {tags[name].id for name in names}
+        current_ids = set()
+        if recipe.pk not in created:
+            current_ids = {tag.id for tag in recipe.tags.all()}
+        if current_ids - tag_ids:
+            removed.append(Q(recipe=recipe, tag_id__in=current_ids - tag_ids))
+            counts.subtract(current_ids - tag_ids)
+        for tag_id in dict.fromkeys(tags[name].id for name in names):
+            if tag_id not in current_ids:
+                added.append(RecipeTag(recipe=recipe, tag_id=tag_id))
+                counts[tag_id] += 1
+    if removed:
+        RecipeTag.objects.filter(reduce(or_, removed)).delete()
+    RecipeTag.objects.bulk_create(added)
+    Tag.objects.adjust_recipe_counts(counts)
+
+
+def recipe_values(queryset, fields=None):
+    """Return the recipes queryset as .values() rows for serialize_recipe_rows"""
+    if fields is None:
+        fields = RecipeSerializer.Meta.fields
+    # The id is always read, the pagination cursor and the tags need it
+    names = ["id"] + [name for name in fields if name not in ("id", "tags")]
+    if "rank" in queryset.query.annotations:
+        # Keep the rank in the rows for the pagination cursor
+        names.append("rank")
+    return queryset.prefetch_related(None).values(*names)
+
+
+def _recipe_tag_links(rows):
+    RecipeTag = Recipe.tags.through
+    return (
+        RecipeTag.objects.filter(recipe_id__in=[row["id"] for row in rows])
+        .order_by("tag_id")
+        .values_list("recipe_id", "tag_id", "tag__name")
+    )
+
+
+def _build_recipe_rows(rows, fields, links):
+    with timed("serialize"):
+        return _build_rows(rows, fields, links)
+
+
+def _build_rows(rows, fields, links):
+    names = [name for name in fields if name != "tags"]
+    data = [{name: row[name] for name in names} for row in rows]
+    if "price" in names:
+        price = RecipeSerializer().fields["price"].to_representation
+        for item in data:
+            item["price"] = price(item["price"])
+    if "tags" in fields:
+        tags = defaultdict(list)
+        for recipe_id, tag_id, name in links:
+            tags[recipe_id].append({"id": tag_id, "name": name})
+        for item, row in zip(data, rows):
+            item["tags"] = tags[row["id"]]
+    return data
+
+
+def serialize_recipe_rows(rows, fields=None):
+    """
+    Return the RecipeSerializer output for recipe_values() rows, reading
+    the tags of all of them with one query instead of going through the
+    serializer fields for every recipe and tag.
+    """
+    if fields is None:
+        fields = RecipeSerializer.Meta.fields
+    rows = list(rows)
+    links = ()
+    if "tags" in fields and rows:
+        links = _recipe_tag_links(rows)
+    return _build_recipe_rows(rows, fields, links)
+
+
+async def aserialize_recipe_rows(rows, fields=None):
+    """serialize_recipe_rows for async views"""
+    if fields is None:
+        fields = RecipeSerializer.Meta.fields
+    links = ()
+    if "tags" in fields and rows:
+        links = [link async for link in _recipe_tag_links(rows)]
+    return _build_recipe_rows(rows, fields, links)
+
+
+class TagSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     class Meta:
         model = Tag
         fields = ["id", "name"]
         read_only_fields = ["id"]
+        list_serializer_class = TimedListSerializer
+
+
+class TagDetailsSerializer(TagSerializer):
+    class Meta(TagSerializer.Meta):
+        fields = TagSerializer.Meta.fields + ["recipe_count"]
+        read_only_fields = TagSerializer.Meta.read_only_fields + ["recipe_count"]
+
+    def validate_name(self, value):
+        tags = Tag.objects.filter(user=self.context["request"].user)
+        if self.instance is not None:
+            tags = tags.exclude(pk=self.instance.pk)
+        if tags.filter(name__iexact=value).exists():
+            raise serializers.ValidationError("A tag with this name already exists.")
+        return value
 
 
-class RecipeSerializer(serializers.ModelSerializer):
+class RecipeSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     tags = TagSerializer(many=True, required=False)
 
+    def __init__(self, *args, fields=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        if fields is not None:
+            for name in set(self.fields) - set(fields):
+                self.fields.pop(name)
+
     class Meta:
         model = Recipe
         fields = ["id", "title", "description", "price", "time_minutes", "tags"]
         read_only_fields = ["id"]
+        list_serializer_class = TimedListSerializer
 
-    def _get_or_create_tags(self, tags, recipe):
-        auth_user = self.context["request"].user
-        for tag in tags:
-            tag_obj, created = Tag.objects.get_or_create(user=auth_user, **tag)
-            recipe.tags.add(tag_obj)
-
+    @transaction.atomic
     def create(self, validated_data):
         tags = validated_data.pop("tags", [])
         recipe = Recipe.objects.create(**validated_data)
-        auth_user = self.context["request"].user
-        for tag in tags:
-            tag_obj, created = Tag.objects.get_or_create(user=auth_user, **tag)
-            recipe.tags.add(tag_obj)
+        if tags:
+            set_tags(
+                self.context["request"].user,
+                {recipe: [tag["name"] for tag in tags]},
+                created=[recipe],
+            )
         return recipe
 
+    @transaction.atomic
     def update(self, instance, validated_data):
         tags = validated_data.pop("tags", None)
         if tags is not None:
-            instance.tags.clear()
-            self._get_or_create_tags(tags, instance)
+            set_tags(
+                self.context["request"].user,
+                {instance: [tag["name"] for tag in tags]},
+            )
 
         for attr, value in validated_data.items():
             setattr(instance, attr, value)
@@ -45,6 +178,182 @@ class RecipeSerializer(serializers.ModelSerializer):
         return instance
 
 
+class RecipeBulkListSerializer(serializers.ListSerializer):
+    """Validate and apply a batch of recipe operations in one transaction"""
+
+    def validate(self, attrs):
+        user = self.context["request"].user
+        ids = [item["id"] for item in attrs if "id" in item]
+        owned = set(
+            Recipe.objects.filter(user=user, id__in=ids).values_list("id", flat=True)
+        )
+        errors = []
+        seen = set()
+        for item in attrs:
+            error = {}
+            if "id" in item:
+                if item["id"] not in owned:
+                    error["id"] = ["Not found."]
+                elif item["id"] in seen:
+                    error["id"] = ["Recipe appears in more than one operation."]
+                seen.add(item["id"])
+            errors.append(error)
+        if any(errors):
+            raise serializers.ValidationError(errors)
+        return attrs
+
+    @transaction.atomic
+    def create(self, validated_data):
+        user = self.context["request"].user
+        creates = [item for item in validated_data if item["op"] == "create"]
+        updates = [item for item in validated_data if item["op"] == "update"]
+        delete_ids = [item["id"] for item in validated_data if item["op"] == "delete"]
+
+        if delete_ids:
+            Tombstone.objects.record(user, Tombstone.RECIPE, delete_ids)
+            Recipe.objects.filter(user=user, id__in=delete_ids).delete()
+
+        new_recipes = Recipe.objects.bulk_create(
+            Recipe(
+                user=user,
+                **{k: v for k, v in item["data"].items() if k != "tags"},
+            )
+            for item in creates
+        )
+        for item, recipe in zip(creates, new_recipes):
+            item["id"] = recipe.id
+
+        recipes = Recipe.objects.filter(
+            user=user, id__in=[item["id"] for item in updates]
+        ).prefetch_related("tags")
+        recipes = {recipe.id: recipe for recipe in recipes}
+        fields = {"updated_at"}
+        now = timezone.now()
+        for item in updates:
+            recipe = recipes[item["id"]]
+            for attr, value in item["data"].items():
+                if attr != "tags":
+                    setattr(recipe, attr, value)
+                    fields.add(attr)
+            recipe.updated_at = now
+        Recipe.objects.bulk_update(recipes.values(), sorted(fields))
+
+        recipe_tags = {}
+        for item, recipe in zip(creates, new_recipes):
+            if item["data"].get("tags"):
+                recipe_tags[recipe] = item["data"]["tags"]
+        for item in updates:
+            if "tags" in item["data"]:
+                recipe_tags[recipes[item["id"]]] = item["data"]["tags"]
+        if recipe_tags:
+            set_tags(
+                user,
+                {
+                    recipe: [tag["name"] for tag in tags]
+                    for recipe, tags in recipe_tags.items()
+                },
+                created=new_recipes,
+            )
+
+        # bulk_create and bulk_update don't send post_save
+        invalidate_user(user.id)
+        for recipe in new_recipes:
+            publish_change(user.id, "recipe", "created", recipe.id)
+        for recipe in recipes.values():
+            publish_change(user.id, "recipe", "updated", recipe.id)
+
+        return [{"op": item["op"], "id": item["id"]} for item in validated_data]
+
+
+class RecipeBulkSerializer(serializers.Serializer):
+    """One create, update or delete in a bulk request"""
+
+    op = serializers.ChoiceField(choices=["create", "update", "delete"])
+    id = serializers.IntegerField(required=False)
+    data = serializers.DictField(required=False)
+
+    class Meta:
+        list_serializer_class = RecipeBulkListSerializer
+
+    def validate(self, attrs):
+        op = attrs["op"]
+        if op == "create":
+            attrs.pop("id", None)
+        elif "id" not in attrs:
+            raise serializers.ValidationError({"id": ["This field is required."]})
+        if op == "delete":
+            attrs.pop("data", None)
+            return attrs
+        recipe = RecipeSerializer(
+            data=attrs.get("data", {}), partial=op == "update", context=self.context
+        )
+        if not recipe.is_valid():
+            raise serializers.ValidationError({"data": recipe.errors})
+        attrs["data"] = recipe.validated_data
+        return attrs
+
+
+class RecipeFilterSerializer(serializers.Serializer):
+    """Query parameters accepted by the recipe list"""
+
+    q = serializers.CharField(
+        required=False, help_text="Search recipe titles and descriptions"
+    )
+    tags = serializers.CharField(
+        required=False, help_text="Comma separated tag ids, any of which must match"
+    )
+    price_min = serializers.DecimalField(
+        max_digits=None, decimal_places=None, required=False
+    )
+    price_max = serializers.DecimalField(
+        max_digits=None, decimal_places=None, required=False
+    )
+    time_max = serializers.IntegerField(required=False)
+
+    def validate_tags(self, value):
+        try:
+            return [int(tag_id) for tag_id in value.split(",")]
+        except ValueError:
+            raise serializers.ValidationError("Expected comma separated tag ids")
+
+
+class RecipeFieldsSerializer(serializers.Serializer):
+    """Query parameters selecting the recipe fields in a response"""
+
+    fields = serializers.CharField(
+        required=False, help_text="Comma separated fields to include"
+    )
+    exclude = serializers.CharField(
+        required=False, help_text="Comma separated fields to leave out"
+    )
+
+    def _parse(self, value):
+        names = [name for name in value.split(",") if name]
+        unknown = set(names) - set(RecipeSerializer.Meta.fields)
+        if unknown:
+            raise serializers.ValidationError(
+                f"Unknown fields: {', '.join(sorted(unknown))}"
+            )
+        return names
+
+    def validate_fields(self, value):
+        return self._parse(value)
+
+    def validate_exclude(self, value):
+        return self._parse(value)
+
+    def validate(self, attrs):
+        fields = attrs.get("fields") or RecipeSerializer.Meta.fields
+        exclude = attrs.get("exclude", [])
+        return {
+            "fields": [
+                name
+                for name in RecipeSerializer.Meta.fields
+                if name in fields and name not in exclude
+            ]
+        }
+
+
 class RecipeDetailsSerializer(RecipeSerializer):
     class Meta(RecipeSerializer.Meta):
         fields = RecipeSerializer.Meta.fields + []
@@ -0,0 +1,137 @@
+"""
+Delta sync of a user's recipes and tags for offline clients
+"""
+from collections import namedtuple
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from core.models import Recipe, Tag, Tombstone
+from django.conf import settings
+from django.utils import timezone
+from django.utils.http import urlsafe_base64_decode, urlsafe_base64_encode
+from rest_framework import serializers, status
+from rest_framework.exceptions import APIException
+
+from .serializers import RecipeSerializer, TagDetailsSerializer
+
+EPOCH = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+
+
+class SyncTokenExpired(APIException):
+    status_code = status.HTTP_410_GONE
+    default_detail = "Sync token expired, sync again without since."
+    default_code = "sync_token_expired"
+
+
+# Where a sync request picks up: the changes after since, or everything
+# if it's None. Later pages of one sync skip the recipe and tag ids up to
+# the last ones already sent, and end with a token for the until of the
+# first page.
+SyncPosition = namedtuple(
+    "SyncPosition",
+    ["since", "until", "recipe_after", "tag_after"],
+    defaults=[None, 0, 0],
+)
+
+
+def _micros(moment):
+    return (moment - EPOCH) // timedelta(microseconds=1)
+
+
+def encode_token(moment, position=None):
+    """
+    Return the opaque sync token for a point in time, or with a position
+    the token of the next page of an unfinished sync ending at that time
+    """
+    values = [_micros(moment)]
+    if position is not None:
+        since = "" if position.since is None else _micros(position.since)
+        values += [since, position.recipe_after, position.tag_after]
+    return urlsafe_base64_encode(".".join(map(str, values)).encode())
+
+
+def decode_token(token):
+    """Return the SyncPosition of a sync token, raise ValueError if invalid"""
+    try:
+        values = urlsafe_base64_decode(token).decode().split(".")
+        moment = EPOCH + timedelta(microseconds=int(values[0]))
+        if len(values) == 1:
+            return SyncPosition(moment)
+        since, recipe_after, tag_after = values[1:]
+        if since:
+            since = EPOCH + timedelta(microseconds=int(since))
+        return SyncPosition(
+            since or None, moment, int(recipe_after), int(tag_after)
+        )
+    except (TypeError, ValueError, UnicodeDecodeError):
+        raise ValueError("Invalid sync token.")
+
+
+class SyncParamsSerializer(serializers.Serializer):
+    """Query parameters of the sync endpoint"""
+
+    since = serializers.CharField(
+        required=False,
+        help_text="Token returned by the previous sync; omit for a full sync",
+    )
+
+    def validate_since(self, value):
+        try:
+            return decode_token(value)
+        except ValueError as exc:
+            raise serializers.ValidationError(str(exc))
+
+
+class SyncSerializer(serializers.Serializer):
+    """Response of the sync endpoint"""
+
+    recipes = RecipeSerializer(many=True)
+    tags = TagDetailsSerializer(many=True)
+    deleted_recipes = serializers.ListField(child=serializers.IntegerField())
+    deleted_tags = serializers.ListField(child=serializers.IntegerField())
+    token = serializers.CharField(help_text="Pass as since to the next sync")
+    has_more = serializers.BooleanField(
+        help_text="The changes didn't fit in one page; sync again with the "
+        "token right away for the next one"
+    )
+
+
+def get_changes(user, position=None):
+    """
+    Return the querysets of the user's recipes and tags changed since a
+    sync position's time, ordered by id past the ids of earlier pages, the
+    ids deleted since then and the time for the token ending the sync.
+
+    updated_at is stamped before a write commits, so a change committed
+    after a sync may carry an earlier time. Each sync re-reads the last
+    SYNC_OVERLAP_SECONDS to pick those up; clients apply changes as
+    upserts, so the repeats are harmless. The same goes for changes made
+    while a sync is paged: they are sent again by the next sync.
+    """
+    if position is None:
+        position = SyncPosition(None)
+    now = timezone.now()
+    since = position.since
+    recipes = Recipe.objects.filter(
+        user=user, id__gt=position.recipe_after
+    ).order_by("id")
+    tags = Tag.objects.filter(user=user, id__gt=position.tag_after).order_by("id")
+    deleted = {Tombstone.RECIPE: [], Tombstone.TAG: []}
+    if since is None:
+        return recipes, tags, deleted, position.until or now
+
+    if since < now - timedelta(days=settings.SYNC_TOMBSTONE_DAYS):
+        # Tombstones this old may have been compacted
+        raise SyncTokenExpired()
+    changed_after = since - timedelta(seconds=settings.SYNC_OVERLAP_SECONDS)
+    recipes = recipes.filter(updated_at__gte=changed_after)
+    tags = tags.filter(updated_at__gte=changed_after)
+    if position.until is not None:
+        # The first page of the sync sent the deleted ids
+        return recipes, tags, deleted, position.until
+    tombstones = Tombstone.objects.filter(
+        user=user, deleted_at__gte=changed_after
+    ).values_list("kind", "object_id").order_by("object_id")
+    for kind, object_id in tombstones:
+        deleted[kind].append(object_id)
+    # Never hand out a token older than the one the client sent
+    return recipes, tags, deleted, max(now, since)
@@ -0,0 +1,188 @@
+from core.events import get_broker
+from core.models import Recipe
+from django.contrib.auth import get_user_model
+from django.test import AsyncClient, TestCase, override_settings
+from django.urls import reverse
+from recipe.tests.test_recipe_api import create_recipe, create_recipes_with_tags
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+ASYNC_RECIPES_URL = reverse("recipe:async-recipe-list")
+ASYNC_TAGS_URL = reverse("recipe:async-tag-list")
+EVENTS_URL = reverse("recipe:async-events")
+RECIPES_URL = reverse("recipe:recipe-list")
+TAGS_URL = reverse("recipe:tag-list")
+
+
+def async_detail_url(recipe_id):
+    return reverse("recipe:async-recipe-detail", args=[recipe_id])
+
+
+class AsyncViewTests(TestCase):
+    """Test the async recipe and tag views against their sync versions"""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            email="user@example.com", password="password123"
+        )
+        self.token = Token.objects.create(user=self.user)
+        self.headers = {"Authorization": f"Token {self.token.key}"}
+        self.async_client = AsyncClient()
+        self.client = APIClient(headers=self.headers)
+
+    async def test_requires_token(self):
+        """Test requests without a valid token are rejected"""
+        res = await AsyncClient().get(ASYNC_RECIPES_URL)
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertEqual(res["WWW-Authenticate"], "Token")
+
+        res = await AsyncClient().get(
+            ASYNC_RECIPES_URL, headers={"Authorization": "Token nope"}
+        )
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertEqual(res.json(), {"detail": "Invalid token."})
+
+    def test_recipe_list_matches_sync(self):
+        """Test every page of the async list matches the sync list"""
+        create_recipes_with_tags(self.user, 5)
+        other = get_user_model().objects.create_user(email="other@example.com")
+        create_recipe(other)
+
+        url = f"{RECIPES_URL}?page_size=2"
+        async_url = f"{ASYNC_RECIPES_URL}?page_size=2"
+        pages = 0
+        while url:
+            res = self.client.get(url)
+            async_res = self.client.get(async_url)
+            self.assertEqual(async_res.status_code, status.HTTP_200_OK)
+            data, async_data = res.json(), async_res.json()
+            self.assertEqual(async_data["results"], data["results"])
+            url, async_url = data["next"], async_data["next"]
+            pages += 1
+        self.assertIsNone(async_url)
+        self.assertEqual(pages, 3)
+
+    def test_recipe_list_filters_and_fields(self):
+        """Test the async list takes the same query parameters"""
+        create_recipe(self.user, title="Quick", time_minutes=5)
+        create_recipe(self.user, title="Slow", time_minutes=90)
+
+        res = self.client.get(ASYNC_RECIPES_URL, {"time_max": 10, "fields": "title"})
+        self.assertEqual(res.json()["results"], [{"title": "Quick"}])
+
+        res = self.client.get(ASYNC_RECIPES_URL, {"fields": "nope"})
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("fields", res.json())
+
+    def test_recipe_detail(self):
+        """Test the async detail matches the sync detail and 404s otherwise"""
+        recipe = create_recipes_with_tags(self.user, 1)[0]
+        other = create_recipe(
+            get_user_model().objects.create_user(email="other@example.com")
+        )
+
+        res = self.client.get(async_detail_url(recipe.id))
+        sync_res = self.client.get(reverse("recipe:recipe-detail", args=[recipe.id]))
+        self.assertEqual(res.json(), sync_res.json())
+
+        res = self.client.get(async_detail_url(other.id))
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_tag_list_matches_sync(self):
+        """Test the async tag list matches the sync tag list"""
+        create_recipes_with_tags(self.user, 1, tags_per_recipe=4)
+
+        res = self.client.get(ASYNC_TAGS_URL)
+
+        self.assertEqual(res.json(), self.client.get(TAGS_URL).json())
+
+    async def test_async_client(self):
+        """Test the views are served by the async request handler"""
+        recipe = await Recipe.objects.acreate(
+            user=self.user, title="Soup", time_minutes=5, price="1.00"
+        )
+
+        res = await self.async_client.get(
+            async_detail_url(recipe.id), headers=self.headers
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.json()["title"], "Soup")
+
+    def test_only_get(self):
+        """Test the async views are read only"""
+        res = self.client.post(ASYNC_RECIPES_URL, {})
+
+        self.assertEqual(res.status_code, status.HTTP_405_METHOD_NOT_ALLOWED)
+
+
+class EventStreamTests(TestCase):
+    """Test the Server-Sent Events stream of recipe and tag changes"""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            email="user@example.com", password="password123"
+        )
+        self.token = Token.objects.create(user=self.user)
+        self.headers = {"Authorization": f"Token {self.token.key}"}
+
+    async def open_stream(self):
+        res = await AsyncClient().get(EVENTS_URL, headers=self.headers)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res["Content-Type"], "text/event-stream")
+        stream = aiter(res.streaming_content)
+        self.assertEqual(await anext(stream), b"retry: 5000\n\n")
+        return stream
+
+    async def test_requires_token(self):
+        """Test the stream is only open to authenticated users"""
+        res = await AsyncClient().get(EVENTS_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    async def test_events(self):
+        """Test the user's events are streamed and others' are not"""
+        stream = await self.open_stream()
+        broker = get_broker()
+
+        broker.publish(self.user.id + 1, {"type": "recipe", "op": "created", "id": 1})
+        broker.publish(self.user.id, {"type": "recipe", "op": "created", "id": 2})
+        broker.publish(self.user.id, {"type": "tag", "op": "deleted", "id": 3})
+        broker.publish(self.user.id, {"type": "recipe", "op": "updated", "ids": [4]})
+
+        self.assertEqual(
+            await anext(stream), b'event: recipe\ndata: {"op":"created","id":2}\n\n'
+        )
+        self.assertEqual(
+            await anext(stream), b'event: tag\ndata: {"op":"deleted","id":3}\n\n'
+        )
+        self.assertEqual(
+            await anext(stream),
+            b'event: recipe\ndata: {"op":"updated","ids":[4]}\n\n',
+        )
+        await stream.aclose()
+
+    @override_settings(EVENTS_HEARTBEAT_SECONDS=0.01)
+    async def test_heartbeat(self):
+        """Test idle streams send heartbeats"""
+        stream = await self.open_stream()
+
+        self.assertEqual(await anext(stream), b": heartbeat\n\n")
+        await stream.aclose()
+
+    @override_settings(EVENTS_QUEUE_SIZE=2)
+    async def test_overflow(self):
+        """Test a stream that falls behind is told to resync and ends"""
+        stream = await self.open_stream()
+
+        for recipe_id in range(3):
+            get_broker().publish(
+                self.user.id, {"type": "recipe", "op": "updated", "id": recipe_id}
+            )
+
+        self.assertEqual(await anext(stream), b"event: overflow\ndata: {}\n\n")
+        with self.assertRaises(StopAsyncIteration):
+            await anext(stream)
+        # Closing the response ended the subscription
+        self.assertEqual(get_broker().subscriber_count(), 0)
@@ -0,0 +1,111 @@
+from core import read_cache
+from core.models import Recipe, Tag
+from core.throttling import get_throttle_store
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from recipe.tests.test_recipe_api import create_recipe
+from rest_framework import status
+from rest_framework.test import APIClient
+
+TAGS_URL = reverse("recipe:tag-list")
+
+
+def detail_url(recipe_id):
+    return reverse("recipe:recipe-detail", args=[recipe_id])
+
+
+@override_settings(READ_CACHE=True)
+class ReadCacheTests(TestCase):
+    """Tests for the read-through cache of recipe details and tag lists"""
+
+    def setUp(self):
+        get_throttle_store().clear()
+        self.user = get_user_model().objects.create_user(
+            email="user@example.com", password="password123"
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.recipe = create_recipe(self.user, title="Soup")
+        read_cache.stats.reset()
+
+    @override_settings(SERVER_TIMING=True)
+    def test_recipe_detail_cached(self):
+        """Test a repeated detail request is served without queries"""
+        res = self.client.get(detail_url(self.recipe.id))
+
+        with self.assertNumQueries(0):
+            cached = self.client.get(detail_url(self.recipe.id))
+
+        self.assertEqual(cached.status_code, status.HTTP_200_OK)
+        self.assertEqual(cached.json(), res.json())
+        self.assertIn("cache;dur=", cached["Server-Timing"])
+        self.assertIn('desc="hit"', cached["Server-Timing"])
+        self.assertEqual(
+            read_cache.stats.as_dict(), {"hits": 1, "misses": 1, "hit_rate": 0.5}
+        )
+
+    def test_query_parameters_cached_apart(self):
+        """Test responses to different sparse fieldsets are cached apart"""
+        self.client.get(detail_url(self.recipe.id))
+
+        res = self.client.get(detail_url(self.recipe.id), {"fields": "title"})
+
+        self.assertEqual(res.json(), {"title": "Soup"})
+
+    def test_write_invalidates(self):
+        """Test edits and tag changes show up in the next read"""
+        self.client.get(detail_url(self.recipe.id))
+        self.client.get(TAGS_URL)
+
+        self.client.patch(detail_url(self.recipe.id), {"title": "Stew"})
+        tag = Tag.objects.create(user=self.user, name="Dinner")
+        self.recipe.tags.add(tag)
+
+        res = self.client.get(detail_url(self.recipe.id))
+        self.assertEqual(res.json()["title"], "Stew")
+        self.assertEqual(res.json()["tags"], [{"id": tag.id, "name": "Dinner"}])
+        res = self.client.get(TAGS_URL)
+        self.assertEqual(res.json()["results"][0]["recipe_count"], 1)
+
+    def test_tag_list_cached(self):
+        """Test a repeated tag list only runs the ETag query"""
+        Tag.objects.create(user=self.user, name="Dinner")
+        res = self.client.get(TAGS_URL)
+
+        with self.assertNumQueries(1):
+            cached = self.client.get(TAGS_URL)
+
+        self.assertEqual(cached.json(), res.json())
+
+    def test_cached_per_user(self):
+        """Test users never get each other's cached responses"""
+        Tag.objects.create(user=self.user, name="Dinner")
+        self.client.get(TAGS_URL)
+        other = get_user_model().objects.create_user(email="other@example.com")
+        self.client.force_authenticate(other)
+
+        res = self.client.get(TAGS_URL)
+
+        self.assertEqual(res.json()["results"], [])
+
+    def test_not_found_not_cached(self):
+        """Test failed reads are not cached"""
+        url = detail_url(self.recipe.id + 1)
+        self.client.get(url)
+        # bulk_create sends no signals, so nothing invalidates the cache
+        Recipe.objects.bulk_create(
+            [Recipe(id=self.recipe.id + 1, user=self.user, time_minutes=1, price=1)]
+        )
+
+        res = self.client.get(url)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+    @override_settings(READ_CACHE=False)
+    def test_disabled(self):
+        """Test READ_CACHE=0 turns the cache off"""
+        self.client.get(detail_url(self.recipe.id))
+
+        with self.assertNumQueries(2):
+            self.client.get(detail_url(self.recipe.id))
@@ -0,0 +1,197 @@
+from datetime import timedelta
+from decimal import Decimal
+
+from core.models import Recipe, Tag, Tombstone
+from core.throttling import get_throttle_store
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from recipe.sync import encode_token
+from rest_framework import status
+from rest_framework.test import APIClient
+
+SYNC_URL = reverse("recipe:sync")
+BULK_URL = reverse("recipe:recipe-bulk")
+
+
+def create_recipe(user, title="Soup"):
+    return Recipe.objects.create(
+        user=user, title=title, time_minutes=10, price=Decimal("2.00")
+    )
+
+
+class PublicSyncApiTests(TestCase):
+    """Test unauthenticated sync requests"""
+
+    def test_auth_required(self):
+        """Test authentication is required to sync"""
+        res = APIClient().get(SYNC_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+@override_settings(SYNC_OVERLAP_SECONDS=0)
+class PrivateSyncApiTests(TestCase):
+    """Test delta sync of recipes and tags"""
+
+    def setUp(self):
+        get_throttle_store().clear()
+        self.user = get_user_model().objects.create_user(
+            email="user@example.com", password="password123"
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def backdate(self, hours=1):
+        """Make everything so far look changed an hour ago"""
+        past = timezone.now() - timedelta(hours=hours)
+        Recipe.objects.update(updated_at=past)
+        Tag.objects.update(updated_at=past)
+
+    def test_full_sync(self):
+        """Test a sync without since returns all the user's data"""
+        recipe = create_recipe(self.user)
+        tag = Tag.objects.create(user=self.user, name="Dinner")
+        recipe.tags.add(tag)
+        create_recipe(get_user_model().objects.create_user(email="other@example.com"))
+
+        res = self.client.get(SYNC_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual([item["id"] for item in res.data["recipes"]], [recipe.id])
+        self.assertEqual(
+            res.data["recipes"][0]["tags"], [{"id": tag.id, "name": "Dinner"}]
+        )
+        self.assertEqual(
+            res.data["tags"], [{"id": tag.id, "name": "Dinner", "recipe_count": 1}]
+        )
+        self.assertEqual(res.data["deleted_recipes"], [])
+        self.assertTrue(res.data["token"])
+
+    def test_delta_sync(self):
+        """Test a sync with since returns only the later changes"""
+        unchanged = create_recipe(self.user, "Unchanged")
+        edited = create_recipe(self.user, "Edited")
+        deleted = create_recipe(self.user, "Deleted")
+        tag = Tag.objects.create(user=self.user, name="Old")
+        self.backdate()
+        token = self.client.get(SYNC_URL).data["token"]
+
+        self.client.patch(
+            reverse("recipe:recipe-detail", args=[edited.id]), {"title": "New"}
+        )
+        self.client.delete(reverse("recipe:recipe-detail", args=[deleted.id]))
+        self.client.delete(reverse("recipe:tag-detail", args=[tag.id]))
+        res = self.client.get(SYNC_URL, {"since": token})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual([item["id"] for item in res.data["recipes"]], [edited.id])
+        self.assertNotIn(unchanged.id, res.data["deleted_recipes"])
+        self.assertEqual(res.data["deleted_recipes"], [deleted.id])
+        self.assertEqual(res.data["deleted_tags"], [tag.id])
+        self.assertEqual(res.data["tags"], [])
+
+        res = self.client.get(SYNC_URL, {"since": res.data["token"]})
+
+        self.assertEqual(res.data["recipes"], [])
+        self.assertEqual(res.data["deleted_recipes"], [])
+
+    @override_settings(SYNC_PAGE_SIZE=2)
+    def test_full_sync_paged(self):
+        """Test a large sync is returned page by page until has_more is off"""
+        recipes = [create_recipe(self.user, f"Recipe {number}") for number in range(5)]
+        tags = [Tag.objects.create(user=self.user, name=name) for name in "ABC"]
+
+        pages = []
+        res = self.client.get(SYNC_URL)
+        pages.append(res.data)
+        while res.data["has_more"]:
+            res = self.client.get(SYNC_URL, {"since": res.data["token"]})
+            self.assertEqual(res.status_code, status.HTTP_200_OK)
+            pages.append(res.data)
+
+        self.assertEqual(
+            [[item["id"] for item in page["recipes"]] for page in pages],
+            [[recipe.id for recipe in recipes[n:n + 2]] for n in (0, 2, 4)],
+        )
+        self.assertEqual(
+            [item["id"] for page in pages for item in page["tags"]],
+            [tag.id for tag in tags],
+        )
+        self.assertEqual([page["has_more"] for page in pages], [True, True, False])
+
+    @override_settings(SYNC_PAGE_SIZE=1)
+    def test_delta_sync_paged(self):
+        """Test changes made while paging are sent by the next sync"""
+        first = create_recipe(self.user, "First")
+        second = create_recipe(self.user, "Second")
+        deleted = create_recipe(self.user, "Deleted")
+        self.backdate()
+        # Nothing changed since now, so this sync fits in one page
+        res = self.client.get(SYNC_URL, {"since": encode_token(timezone.now())})
+        token = res.data["token"]
+        for recipe in (first, second):
+            self.client.patch(
+                reverse("recipe:recipe-detail", args=[recipe.id]), {"title": "New"}
+            )
+        self.client.delete(reverse("recipe:recipe-detail", args=[deleted.id]))
+
+        res = self.client.get(SYNC_URL, {"since": token})
+        self.assertEqual([item["id"] for item in res.data["recipes"]], [first.id])
+        self.assertEqual(res.data["deleted_recipes"], [deleted.id])
+        self.assertTrue(res.data["has_more"])
+        self.client.patch(
+            reverse("recipe:recipe-detail", args=[first.id]), {"title": "Newer"}
+        )
+
+        res = self.client.get(SYNC_URL, {"since": res.data["token"]})
+        self.assertEqual([item["id"] for item in res.data["recipes"]], [second.id])
+        self.assertEqual(res.data["deleted_recipes"], [])
+        self.assertFalse(res.data["has_more"])
+
+        res = self.client.get(SYNC_URL, {"since": res.data["token"]})
+        self.assertEqual(res.data["recipes"][0]["title"], "Newer")
+
+    def test_bulk_delete_tombstones(self):
+        """Test recipes deleted in bulk are reported as deleted"""
+        recipe = create_recipe(self.user)
+        token = self.client.get(SYNC_URL).data["token"]
+
+        self.client.post(BULK_URL, [{"op": "delete", "id": recipe.id}], format="json")
+        res = self.client.get(SYNC_URL, {"since": token})
+
+        self.assertEqual(res.data["deleted_recipes"], [recipe.id])
+
+    def test_other_users_tombstones(self):
+        """Test deletions by other users are not reported"""
+        other = get_user_model().objects.create_user(email="other@example.com")
+        token = self.client.get(SYNC_URL).data["token"]
+        Tombstone.objects.record(other, Tombstone.RECIPE, [123])
+
+        res = self.client.get(SYNC_URL, {"since": token})
+
+        self.assertEqual(res.data["deleted_recipes"], [])
+
+    def test_token_is_monotonic(self):
+        """Test a token from a fast clock is never moved back"""
+        future = timezone.now() + timedelta(minutes=5)
+
+        res = self.client.get(SYNC_URL, {"since": encode_token(future)})
+
+        self.assertEqual(res.data["token"], encode_token(future))
+
+    @override_settings(SYNC_TOMBSTONE_DAYS=30)
+    def test_expired_token(self):
+        """Test tokens older than the tombstones kept must sync in full"""
+        since = encode_token(timezone.now() - timedelta(days=31))
+
+        res = self.client.get(SYNC_URL, {"since": since})
+
+        self.assertEqual(res.status_code, status.HTTP_410_GONE)
+
+    def test_invalid_token(self):
+        """Test a malformed token is rejected"""
+        res = self.client.get(SYNC_URL, {"since": "not a token"})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
@@ -1,12 +1,24 @@
+import json
+from base64 import b64encode
+from urllib.parse import urlencode
+
 from core.models import Tag
+from core.throttling import get_throttle_store
 from django.contrib.auth import get_user_model
-from django.test import TestCase
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
-from recipe.serializers import TagSerializer
+from recipe.serializers import TagDetailsSerializer
 from rest_framework import status
 from rest_framework.test import APIClient
 
 TAGS_URL = reverse("recipe:tag-list")
+RECIPES_URL = reverse("recipe:recipe-list")
+
+
+def recipe_details_url(recipe_id):
+    return reverse("recipe:recipe-detail", args=[recipe_id])
 
 
 def details_url(tag_id):
@@ -45,6 +57,7 @@ class PrivateTagApiTests(TestCase):
     """Test authenticated api requests"""
 
     def setUp(self):
+        get_throttle_store().clear()
         self.client = APIClient()
         self.user = create_user()
         self.client.force_authenticate(user=self.user)
@@ -55,10 +68,10 @@ class PrivateTagApiTests(TestCase):
         Tag.objects.create(user=self.user, name="Carnists")
 
         res = self.client.get(TAGS_URL)
-        tags = Tag.objects.all().order_by("-name")
-        serializer = TagSerializer(tags, many=True)
+        tags = Tag.objects.all().order_by("-name", "-id")
+        serializer = TagDetailsSerializer(tags, many=True)
         self.assertEqual(res.status_code, status.HTTP_200_OK)
-        self.assertEqual(res.data, serializer.data)
+        self.assertEqual(res.data["results"], serializer.data)
 
     def test_retrieve_only_users_tags(self):
         """Test getting only tags that belong to the user"""
@@ -67,10 +80,10 @@ class PrivateTagApiTests(TestCase):
         Tag.objects.create(user=new_user, name="Desert")
 
         res = self.client.get(TAGS_URL)
-        serializer = TagSerializer(tag, many=False)
+        serializer = TagDetailsSerializer(tag, many=False)
         self.assertEqual(res.status_code, status.HTTP_200_OK)
-        self.assertIn(serializer.data, res.data)
-        self.assertNotIn("Desert", res.data)
+        self.assertIn(serializer.data, res.data["results"])
+        self.assertNotIn("Desert", res.data["results"])
 
     def test_update_tag(self):
         """Test updating a tag"""
@@ -93,3 +106,148 @@ class PrivateTagApiTests(TestCase):
         self.assertEqual(res.status_code, status.HTTP_204_NO_CONTENT)
 
         self.assertFalse(tag_exists)
+
+    @override_settings(PAGE_SIZE=2)
+    def test_list_tags_cursor_pagination(self):
+        """Test tags are paged by name then id, descending"""
+        for name in ["Vegan", "Brunch", "Vegetarian", "Dinner", "Asian"]:
+            Tag.objects.create(user=self.user, name=name)
+        expected = list(
+            Tag.objects.filter(user=self.user)
+            .order_by("-name", "-id")
+            .values_list("id", flat=True)
+        )
+
+        ids = []
+        url = TAGS_URL
+        while url:
+            res = self.client.get(url)
+            self.assertEqual(res.status_code, status.HTTP_200_OK)
+            ids.extend(tag["id"] for tag in res.data["results"])
+            url = res.data["next"]
+
+        self.assertEqual(ids, expected)
+
+    def test_list_tags_not_modified(self):
+        """Test an unchanged tag list answers 304 until a tag changes"""
+        tag = Tag.objects.create(user=self.user, name="Vegan")
+        etag = self.client.get(TAGS_URL)["ETag"]
+
+        with self.assertNumQueries(1):
+            res = self.client.get(TAGS_URL, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(res.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        self.client.patch(details_url(tag.id), {"name": "Vegetarian"})
+        res = self.client.get(TAGS_URL, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(res["ETag"], etag)
+
+    def test_tag_recipe_counts(self):
+        """Test the tag list shows recipe counts kept up to date by the api"""
+        payload = {
+            "title": "Curry",
+            "time_minutes": 30,
+            "price": "5.50",
+            "tags": [{"name": "Dinner"}, {"name": "Spicy"}],
+        }
+        recipe = self.client.post(RECIPES_URL, payload, format="json").data
+        payload["tags"] = [{"name": "Dinner"}]
+        self.client.post(RECIPES_URL, payload, format="json")
+
+        def counts():
+            res = self.client.get(TAGS_URL)
+            return {tag["name"]: tag["recipe_count"] for tag in res.data["results"]}
+
+        self.assertEqual(counts(), {"Dinner": 2, "Spicy": 1})
+        self.client.patch(
+            recipe_details_url(recipe["id"]),
+            {"tags": [{"name": "Spicy"}, {"name": "Vegan"}]},
+            format="json",
+        )
+        self.assertEqual(counts(), {"Dinner": 1, "Spicy": 1, "Vegan": 1})
+        self.client.delete(recipe_details_url(recipe["id"]))
+        self.assertEqual(counts(), {"Dinner": 1, "Spicy": 0, "Vegan": 0})
+
+    def test_update_tag_name_taken(self):
+        """Test renaming a tag to another tag's name is rejected"""
+        Tag.objects.create(user=self.user, name="Vegan")
+        tag = Tag.objects.create(user=self.user, name="Dinner")
+
+        res = self.client.patch(details_url(tag.id), {"name": "vegan"})
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        res = self.client.patch(details_url(tag.id), {"name": "DINNER"})
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+    def test_list_tags_by_usage(self):
+        """Test ?ordering=-recipe_count lists the most used tags first"""
+        tags = [Tag.objects.create(user=self.user, name=name) for name in "ABC"]
+        Tag.objects.filter(id=tags[0].id).update(recipe_count=3)
+        Tag.objects.filter(id=tags[2].id).update(recipe_count=5)
+
+        res = self.client.get(TAGS_URL, {"ordering": "-recipe_count"})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual([tag["name"] for tag in res.data["results"]], ["C", "A", "B"])
+
+    @override_settings(PAGE_SIZE=2)
+    def test_list_tags_by_usage_paged_through_ties(self):
+        """Test tags sharing a recipe count are paged by keyset, not offset"""
+        for number in range(7):
+            Tag.objects.create(user=self.user, name=f"Tag {number}", recipe_count=1)
+        Tag.objects.filter(name="Tag 3").update(recipe_count=2)
+        expected = list(
+            Tag.objects.filter(user=self.user)
+            .order_by("-recipe_count", "-id")
+            .values_list("id", flat=True)
+        )
+
+        ids = []
+        url = f"{TAGS_URL}?ordering=-recipe_count"
+        while url:
+            with CaptureQueriesContext(connection) as queries:
+                res = self.client.get(url)
+            self.assertEqual(res.status_code, status.HTTP_200_OK)
+            for query in queries:
+                self.assertNotIn("OFFSET", query["sql"])
+            ids.extend(tag["id"] for tag in res.data["results"])
+            url = res.data["next"]
+        self.assertEqual(ids, expected)
+
+        ids = []
+        url = res.data["previous"]
+        while url:
+            res = self.client.get(url)
+            ids[:0] = [tag["id"] for tag in res.data["results"]]
+            url = res.data["previous"]
+        self.assertEqual(ids, expected[:-1])
+
+    def test_list_tags_invalid_cursor(self):
+        """Test a cursor that doesn't hold a position is rejected"""
+        res = self.client.get(TAGS_URL, {"cursor": "cD01"})
+
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_list_tags_tampered_cursor(self):
+        """Test cursors with values of the wrong type or null are rejected"""
+        for ordering, position in [
+            ("-name", ["t1", "zz"]),
+            ("-recipe_count", ["many", 1]),
+            ("-name", ["t1", None]),
+        ]:
+            with self.subTest(position=position):
+                cursor = b64encode(
+                    urlencode({"p": json.dumps(position)}).encode()
+                ).decode()
+
+                res = self.client.get(
+                    TAGS_URL, {"ordering": ordering, "cursor": cursor}
+                )
+
+                self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_list_tags_invalid_ordering(self):
+        """Test sorting by anything else is rejected"""
+        res = self.client.get(TAGS_URL, {"ordering": "user"})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
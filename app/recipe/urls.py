@@ -1,11 +1,23 @@
 from django.urls import include, path
 from rest_framework.routers import DefaultRouter
 
-from .views import *
+from . import async_views
+from .views import RecipeViewSet, SyncView, TagViewSet
 
 router = DefaultRouter()
 router.register("recipes", RecipeViewSet)
 router.register("tags", TagViewSet)
 app_name = "recipe"
 
-urlpatterns = [path("", include(router.urls))]
+urlpatterns = [
+    path("", include(router.urls)),
+    path("sync/", SyncView.as_view(), name="sync"),
+    path("async/recipes/", async_views.recipe_list, name="async-recipe-list"),
+    path(
+        "async/recipes/<int:pk>/",
+        async_views.recipe_detail,
+        name="async-recipe-detail",
+    ),
+    path("async/tags/", async_views.tag_list, name="async-tag-list"),
+    path("async/events/", async_views.events, name="async-events"),
+]
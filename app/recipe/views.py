@@ -1,39 +1,371 @@
-from core.models import Recipe, Tag
-from rest_framework import mixins, viewsets
-from rest_framework.authentication import TokenAuthentication
+import hashlib
+import json
+from functools import cached_property
+from itertools import islice
+
+from core.authentication import CachedTokenAuthentication
+from core import read_cache
+from core.models import Recipe, Tag, Tombstone
+from core.routers import replica_reads
+from core.throttling import WriteRateThrottle
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Exists, Max, OuterRef, Prefetch
+from django.http import StreamingHttpResponse
+from django.utils.cache import get_conditional_response, quote_etag
+from django.utils.http import urlencode
+from drf_spectacular.utils import OpenApiParameter, extend_schema, extend_schema_view
+from rest_framework import mixins, status, viewsets
+from rest_framework.decorators import action
+from rest_framework.generics import get_object_or_404
 from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+from rest_framework.utils.encoders import JSONEncoder
+from rest_framework.views import APIView
+
+from .pagination import RecipeCursorPagination, TagCursorPagination
+from .serializers import (
+    RecipeBulkSerializer,
+    RecipeDetailsSerializer,
+    RecipeFieldsSerializer,
+    RecipeFilterSerializer,
+    RecipeSerializer,
+    TagDetailsSerializer,
+    recipe_values,
+    serialize_recipe_rows,
+)
+from .sync import (
+    SyncParamsSerializer,
+    SyncPosition,
+    SyncSerializer,
+    encode_token,
+    get_changes,
+)
+
+
+def filter_recipes(queryset, query_params):
+    """Apply the recipe list query parameters as part of the recipes query"""
+    filters = RecipeFilterSerializer(data=query_params)
+    filters.is_valid(raise_exception=True)
+    params = filters.validated_data
+    if "tags" in params:
+        RecipeTag = Recipe.tags.through
+        queryset = queryset.filter(
+            Exists(
+                RecipeTag.objects.filter(
+                    recipe=OuterRef("pk"), tag_id__in=params["tags"]
+                )
+            )
+        )
+    if "price_min" in params:
+        queryset = queryset.filter(price__gte=params["price_min"])
+    if "price_max" in params:
+        queryset = queryset.filter(price__lte=params["price_max"])
+    if "time_max" in params:
+        queryset = queryset.filter(time_minutes__lte=params["time_max"])
+    if params.get("q"):
+        queryset = queryset.search(params["q"])
+    return queryset
+
+
+def recipe_tags_prefetch():
+    return Prefetch("tags", queryset=Tag.objects.only("id", "name").order_by("id"))
+
+
+def get_recipe_fields(query_params):
+    """Return the recipe fields picked with ?fields= and ?exclude="""
+    params = RecipeFieldsSerializer(data=query_params)
+    params.is_valid(raise_exception=True)
+    return params.validated_data["fields"]
+
+
+class ConditionalListMixin:
+    """
+    Tag list responses with an ETag and answer a matching If-None-Match
+    with 304 Not Modified before the list is queried or serialized.
+    """
+
+    def get_list_version(self):
+        """Return a cheap value that changes whenever the list changes"""
+        raise NotImplementedError
+
+    def get_list_etag(self, request):
+        version = self.get_list_version()
+        key = "|".join(
+            [
+                str(request.user.pk),
+                str(version),
+                request.get_full_path(),
+                request.META.get("HTTP_ACCEPT", ""),
+            ]
+        )
+        return quote_etag(hashlib.md5(key.encode()).hexdigest())
 
-from .serializers import RecipeDetailsSerializer, RecipeSerializer, TagSerializer
+    def list(self, request, *args, **kwargs):
+        etag = self.get_list_etag(request)
+        response = get_conditional_response(request, etag=etag)
+        if response is None:
+            response = super().list(request, *args, **kwargs)
+            response["ETag"] = etag
+        return response
 
 
-class RecipeViewSet(viewsets.ModelViewSet):
+class ReadCacheMixin:
+    """
+    Serve the read_cache_actions from the per-user read-through cache,
+    keyed by the path and query. The cache holds response data, so every
+    renderer can serve a hit, and any write by the user invalidates it.
+    Misses are read from the primary, as data from a lagging replica
+    would stay cached until the user's next write.
+    """
+
+    read_cache_actions = ()
+
+    def list(self, request, *args, **kwargs):
+        return self.read_through(super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.read_through(super().retrieve, request, *args, **kwargs)
+
+    def read_through(self, view, request, *args, **kwargs):
+        if not settings.READ_CACHE or self.action not in self.read_cache_actions:
+            return view(request, *args, **kwargs)
+        query = urlencode(sorted(request.query_params.lists()), doseq=True)
+        key, data = read_cache.lookup(request.user.pk, f"{request.path}?{query}")
+        if data is not None:
+            return Response(data)
+        with replica_reads(False):
+            response = view(request, *args, **kwargs)
+        if response.status_code == status.HTTP_200_OK:
+            read_cache.store(key, response.data)
+        return response
+
+
+class RecipeRowsMixin:
+    """
+    Serve recipe reads from .values() rows when RECIPE_FAST_READS is on,
+    skipping the serializer field machinery with byte-identical output.
+    """
+
+    def list(self, request, *args, **kwargs):
+        if not settings.RECIPE_FAST_READS:
+            return super().list(request, *args, **kwargs)
+        fields = self.recipe_fields
+        rows = recipe_values(self.filter_queryset(self.get_queryset()), fields)
+        page = self.paginate_queryset(rows)
+        if page is not None:
+            return self.get_paginated_response(serialize_recipe_rows(page, fields))
+        return Response(serialize_recipe_rows(rows, fields))
+
+    def retrieve(self, request, *args, **kwargs):
+        if not settings.RECIPE_FAST_READS:
+            return super().retrieve(request, *args, **kwargs)
+        fields = self.recipe_fields
+        rows = recipe_values(self.filter_queryset(self.get_queryset()), fields)
+        row = get_object_or_404(rows, pk=self.kwargs[self.lookup_field])
+        self.check_object_permissions(request, row)
+        return Response(serialize_recipe_rows([row], fields)[0])
+
+
+@extend_schema_view(
+    list=extend_schema(parameters=[RecipeFilterSerializer, RecipeFieldsSerializer]),
+    retrieve=extend_schema(parameters=[RecipeFieldsSerializer]),
+    export=extend_schema(parameters=[RecipeFieldsSerializer]),
+)
+class RecipeViewSet(
+    ConditionalListMixin, ReadCacheMixin, RecipeRowsMixin, viewsets.ModelViewSet
+):
     queryset = Recipe.objects.all()
     serializer_class = RecipeDetailsSerializer
     permission_classes = [IsAuthenticated]
-    authentication_classes = [TokenAuthentication]
+    authentication_classes = [CachedTokenAuthentication]
+    throttle_classes = [WriteRateThrottle]
+    pagination_class = RecipeCursorPagination
+    export_chunk_size = 2000
+    read_cache_actions = ("retrieve",)
+
+    @cached_property
+    def recipe_fields(self):
+        """Fields picked with ?fields= and ?exclude= on reads, None for all"""
+        if self.action not in ("list", "retrieve", "export"):
+            return None
+        return get_recipe_fields(self.request.query_params)
 
     def get_queryset(self):
-        return Recipe.objects.filter(user=self.request.user).order_by("-id")
+        fields = self.recipe_fields
+        queryset = Recipe.objects.filter(user=self.request.user).order_by("-id")
+        if fields is None:
+            queryset = queryset.defer("search_vector")
+        else:
+            # Leave unrequested columns such as description unread
+            queryset = queryset.only(
+                "id", *(name for name in fields if name != "tags")
+            )
+        if fields is None or "tags" in fields:
+            queryset = queryset.prefetch_related(recipe_tags_prefetch())
+        if self.action == "list":
+            queryset = filter_recipes(queryset, self.request.query_params)
+        return queryset
+
+    def get_list_version(self):
+        # Tag edits and deletes touch their recipes, so this also covers
+        # the nested tags
+        return Recipe.objects.filter(user=self.request.user).aggregate(
+            Max("updated_at"), Count("id")
+        )
+
+    def get_serializer(self, *args, **kwargs):
+        if self.recipe_fields is not None:
+            kwargs.setdefault("fields", self.recipe_fields)
+        return super().get_serializer(*args, **kwargs)
 
     def get_serializer_class(self):
-        if self.action == "list":
+        if self.action in ("list", "export"):
             return RecipeSerializer
         return RecipeDetailsSerializer
 
     def perform_create(self, serializer):
         serializer.save(user=self.request.user)
 
+    @transaction.atomic
+    def perform_destroy(self, instance):
+        Tombstone.objects.record(self.request.user, Tombstone.RECIPE, [instance.id])
+        instance.delete()
+
+    @extend_schema(
+        request=RecipeBulkSerializer(many=True, max_length=settings.RECIPE_BULK_MAX)
+    )
+    @action(detail=False, methods=["post"])
+    def bulk(self, request):
+        """Apply a list of recipe creates, updates and deletes atomically"""
+        serializer = RecipeBulkSerializer(
+            data=request.data,
+            many=True,
+            max_length=settings.RECIPE_BULK_MAX,
+            context=self.get_serializer_context(),
+        )
+        serializer.is_valid(raise_exception=True)
+        return Response(serializer.save(), status=status.HTTP_200_OK)
+
+    @extend_schema(responses={(200, "application/x-ndjson"): RecipeSerializer})
+    @action(detail=False)
+    def export(self, request):
+        """Stream all of the user's recipes as newline delimited JSON"""
+        chunk_size = self.export_chunk_size
+        fields = self.recipe_fields
+        if settings.RECIPE_FAST_READS:
+            recipes = recipe_values(self.get_queryset(), fields)
+
+            def serialize(chunk):
+                return serialize_recipe_rows(chunk, fields)
+
+        else:
+            recipes = self.get_queryset()
+            serializer_class = self.get_serializer_class()
+
+            def serialize(chunk):
+                return serializer_class(chunk, many=True, fields=fields).data
+
+        recipes = recipes.iterator(chunk_size=chunk_size)
+
+        def lines():
+            while chunk := list(islice(recipes, chunk_size)):
+                data = serialize(chunk)
+                yield "".join(json.dumps(item, cls=JSONEncoder) + "\n" for item in data)
 
+        return StreamingHttpResponse(lines(), content_type="application/x-ndjson")
+
+
+@extend_schema_view(
+    list=extend_schema(
+        parameters=[
+            OpenApiParameter(
+                "ordering",
+                enum=list(TagCursorPagination.orderings),
+                description="Sort by name (default) or by number of recipes",
+            )
+        ]
+    )
+)
 class TagViewSet(
+    ConditionalListMixin,
+    ReadCacheMixin,
     mixins.DestroyModelMixin,
     mixins.UpdateModelMixin,
     mixins.ListModelMixin,
     viewsets.GenericViewSet,
 ):
     queryset = Tag.objects.all()
-    serializer_class = TagSerializer
+    serializer_class = TagDetailsSerializer
     permission_classes = [IsAuthenticated]
-    authentication_classes = [TokenAuthentication]
+    authentication_classes = [CachedTokenAuthentication]
+    throttle_classes = [WriteRateThrottle]
+    pagination_class = TagCursorPagination
+    read_cache_actions = ("list",)
 
     def get_queryset(self):
-        return Tag.objects.filter(user=self.request.user).order_by("-name")
+        return Tag.objects.filter(user=self.request.user).order_by("-name", "-id")
+
+    @transaction.atomic
+    def perform_destroy(self, instance):
+        Tombstone.objects.record(self.request.user, Tombstone.TAG, [instance.id])
+        instance.delete()
+
+    def get_list_version(self):
+        return Tag.objects.filter(user=self.request.user).aggregate(
+            Max("updated_at"), Count("id")
+        )
+
+
+class SyncView(APIView):
+    """
+    Changes to the user's recipes and tags since the token of the previous
+    sync, with the ids deleted since then. Without since, everything is
+    returned. Either way the response has the token for the next sync.
+
+    At most SYNC_PAGE_SIZE recipes and tags are returned at once. When
+    more are waiting, has_more is set and the token picks up the next page.
+    """
+
+    permission_classes = [IsAuthenticated]
+    authentication_classes = [CachedTokenAuthentication]
+
+    @extend_schema(parameters=[SyncParamsSerializer], responses=SyncSerializer)
+    def get(self, request):
+        params = SyncParamsSerializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+        position = params.validated_data.get("since") or SyncPosition(None)
+        recipes, tags, deleted, until = get_changes(request.user, position)
+        # One extra row of each tells whether there's another page
+        size = settings.SYNC_PAGE_SIZE
+        recipes = recipes.defer("search_vector")[: size + 1]
+        if settings.RECIPE_FAST_READS:
+            recipe_data = serialize_recipe_rows(recipe_values(recipes))
+        else:
+            recipe_data = RecipeSerializer(
+                recipes.prefetch_related(recipe_tags_prefetch()), many=True
+            ).data
+        tag_data = TagDetailsSerializer(tags[: size + 1], many=True).data
+        has_more = len(recipe_data) > size or len(tag_data) > size
+        recipe_data, tag_data = recipe_data[:size], tag_data[:size]
+
+        if has_more:
+            position = SyncPosition(
+                position.since,
+                until,
+                recipe_data[-1]["id"] if recipe_data else position.recipe_after,
+                tag_data[-1]["id"] if tag_data else position.tag_after,
+            )
+            token = encode_token(until, position)
+        else:
+            token = encode_token(until)
+        return Response(
+            {
+                "recipes": recipe_data,
+                "tags": tag_data,
+                "deleted_recipes": deleted[Tombstone.RECIPE],
+                "deleted_tags": deleted[Tombstone.TAG],
+                "token": token,
+                "has_more": has_more,
+            }
+        )
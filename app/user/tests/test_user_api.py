@@ -8,6 +8,8 @@ from django.contrib.auth import get_user_model
 from rest_framework import status
 from rest_framework.test import APIClient
 
+from core.throttling import get_throttle_store
+
 CREATE_USER_URL = reverse("user:create")
 USER_TOKEN_URL = reverse("user:token")
 ME_URL = reverse("user:me")
@@ -19,7 +21,8 @@ def create_user(**params):
     return get_user_model().objects.create_user(**params)
 
 class PublicUserApiTests(TestCase):
-    def setUP(self):
+    def setUp(self):
+        get_throttle_store().clear()
         self.client = APIClient()
     
     def test_create_user_is_success(self):
@@ -123,6 +126,7 @@ class PublicUserApiTests(TestCase):
 
 class PrivateUserApiTests(TestCase):
     def setUp(self):
+        get_throttle_store().clear()
         self.user = create_user(
             name='test user',
             email='testuser@example.com',
@@ -3,19 +3,30 @@ from rest_framework import generics, authentication, permissions
 from .serializers import UserSerializers, AuthTokenSerializer
 from rest_framework.authtoken.views import ObtainAuthToken
 from rest_framework.settings import api_settings
+from core.authentication import CachedTokenAuthentication
+from core.throttling import (
+    LoginAccountRateThrottle,
+    LoginRateThrottle,
+    SignupRateThrottle,
+    WriteRateThrottle,
+)
 class CreateUserView(generics.CreateAPIView):
     serializer_class = UserSerializers
+    throttle_classes = [SignupRateThrottle]
 
 class CreateTokenView(ObtainAuthToken):
     '''Create a new auth token for the user'''
     serializer_class = AuthTokenSerializer
     renderer_classes = api_settings.DEFAULT_RENDERER_CLASSES
+    parser_classes = api_settings.DEFAULT_PARSER_CLASSES
+    throttle_classes = [LoginRateThrottle, LoginAccountRateThrottle]
 
 
 class ManageUserView(generics.RetrieveUpdateAPIView):
     serializer_class = UserSerializers
-    authentication_classes = [authentication.TokenAuthentication, authentication.SessionAuthentication]
+    authentication_classes = [CachedTokenAuthentication, authentication.SessionAuthentication]
     permission_classes = [permissions.IsAuthenticated]
+    throttle_classes = [WriteRateThrottle]
 
     def get_object(self):
         return self.request.user